@@ -22,8 +22,32 @@ click_point = None
 # 取得目前腳本所在的資料夾路徑 (關鍵修正)
 BASE_DIR = Path(__file__).resolve().parent
 
+# 讓這支小工具也能用專案裡的 ADB 客戶端 (直接走 socket，不開 adb.exe)
+sys.path.insert(0, str(BASE_DIR.parent))
+try:
+    from core.adb_client import AdbClient
+except ImportError:
+    AdbClient = None
+
+def get_screenshot_socket():
+    """ 透過 ADB server 的 socket 協定截圖 (exec-out 不會竄改換行，不用 replace) """
+    client = AdbClient(serial=DEVICE_ID, adb_path=ADB_PATH)
+    screenshot_bytes = client.exec_out("screencap -p")
+    if len(screenshot_bytes) < 100:
+        return None
+    image_array = np.frombuffer(screenshot_bytes, np.uint8)
+    return cv2.imdecode(image_array, cv2.IMREAD_COLOR)
+
 def get_screenshot():
     """ 透過 ADB 獲取當前畫面 """
+    if AdbClient is not None:
+        try:
+            screen = get_screenshot_socket()
+            if screen is not None:
+                return screen
+        except Exception as e:
+            print(f"socket 截圖失敗，改用 adb.exe: {e}")
+
     cmd = [ADB_PATH, "-s", DEVICE_ID, "shell", "screencap", "-p"]
     try:
         # 使用 list 格式傳入 cmd，避免 shell=True 的一些轉義問題
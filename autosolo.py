@@ -41,7 +41,31 @@ import traceback
 from core import config
 from core.bot_logic import GameBot
 
+def main_multi():
+    """ 多開模式：config.json 有 instances 時，一台裝置一個子行程 """
+    from core.orchestrator import Supervisor
+
+    print("=================================")
+    print(f"🤖 自動化腳本啟動 (多開模式 x{len(config.INSTANCES)})")
+    for inst in config.INSTANCES:
+        print(f"📱 目標裝置: {inst.get('device_ID')} (index {inst.get('emulator_index')})")
+    print("=================================")
+
+    try:
+        Supervisor(config.INSTANCES).run()
+        print("\n✅ 所有裝置都已結束，程式即將結束。")
+    except KeyboardInterrupt:
+        print("\n👋 使用者強制停止腳本")
+    except Exception as e:
+        print("\n❌ 發生未預期錯誤:")
+        traceback.print_exc()
+    finally:
+        input("按 Enter 鍵結束程式...")
+
 def main():
+    if config.INSTANCES:
+        return main_multi()
+
     print("=================================")
     print(f"🤖 自動化腳本啟動 (單次任務版)")
     print(f"📱 目標裝置: {config.DEVICE_ID}")
@@ -0,0 +1,349 @@
+# core/adb_client.py
+"""
+[純 Python ADB 客戶端] 直接跟本機的 ADB server (預設 127.0.0.1:5037) 講話
+不用每次都開一個 adb.exe 行程
+
+協定重點 (跟 adb 原始碼的 SERVICES.TXT / SYNC.TXT 一致):
+- 請求: 4 碼十六進位長度 + 內容，例如 b"000chost:version"
+- 回應: b"OKAY" 或 b"FAIL" + 4 碼長度 + 錯誤訊息
+- 要對某台裝置下指令，要先送 host:transport:<serial>，同一條 socket 再送 shell: / exec: / sync:
+- sync: 模式下每個封包是 4 bytes ID + little-endian uint32 長度
+"""
+import io
+import itertools
+import queue
+import socket
+import struct
+import subprocess
+import threading
+import time
+
+SYNC_CHUNK = 64 * 1024
+
+
+class AdbError(Exception):
+    """ ADB server 回傳 FAIL 或通訊異常 """
+
+
+class AdbConnection:
+    """ 一條到 ADB server 的 socket (一條 socket 只能用一個 service) """
+
+    def __init__(self, host, port, timeout):
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    # --- 基本收送 ---
+    def send_request(self, payload):
+        data = payload.encode("utf-8")
+        self.sock.sendall(b"%04x" % len(data) + data)
+        self.check_okay()
+
+    def check_okay(self):
+        status = self.read_exact(4)
+        if status == b"OKAY":
+            return
+        if status == b"FAIL":
+            raise AdbError(self.read_length_prefixed().decode("utf-8", errors="ignore"))
+        raise AdbError(f"未預期的回應: {status!r}")
+
+    def read_length_prefixed(self):
+        length = int(self.read_exact(4), 16)
+        return self.read_exact(length)
+
+    def read_exact(self, size):
+        buf = bytearray(size)
+        view = memoryview(buf)
+        got = 0
+        while got < size:
+            n = self.sock.recv_into(view[got:], size - got)
+            if n == 0:
+                raise AdbError("ADB 連線被中斷")
+            got += n
+        return bytes(buf)
+
+    def read_all(self, size_hint=0):
+        """ 一路讀到對方關閉，直接收進同一塊 buffer (截圖這種大資料不會被切成一堆小 bytes) """
+        buf = bytearray(max(size_hint, SYNC_CHUNK))
+        view = memoryview(buf)
+        got = 0
+        while True:
+            if got == len(buf):
+                view.release()  # bytearray 有 view 掛著時不能改大小
+                buf.extend(bytes(len(buf)))  # 容量翻倍
+                view = memoryview(buf)
+            n = self.sock.recv_into(view[got:])
+            if n == 0:
+                break
+            got += n
+        view.release()
+        del buf[got:]
+        return buf
+
+    def close(self):
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+
+class AdbClient:
+    """
+    [ADB 客戶端] 提供 shell / exec-out / pull / push / connect
+    - sync 連線會重複使用 (同一條 socket 可以連續 pull/push)
+    - shell_session() 會開一條不斷線的 shell，給大量 input 指令共用
+    """
+
+    def __init__(self, serial=None, host="127.0.0.1", port=5037, timeout=15, adb_path=None):
+        self.serial = serial
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.adb_path = adb_path  # 有給的話，server 沒開時會幫忙 start-server
+        self._sync = None
+        self._sync_lock = threading.Lock()
+
+    # --- 連線 ---
+    def _connect(self):
+        try:
+            return AdbConnection(self.host, self.port, self.timeout)
+        except ConnectionRefusedError:
+            if not self.adb_path:
+                raise
+            # server 還沒啟動 -> 請 adb.exe 開一個，然後再連一次
+            subprocess.run([self.adb_path, "start-server"],
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=15)
+            return AdbConnection(self.host, self.port, self.timeout)
+
+    def _open_service(self, service):
+        """ 切到指定裝置後開啟 service，回傳可直接讀寫的連線 """
+        conn = self._connect()
+        try:
+            if self.serial:
+                conn.send_request(f"host:transport:{self.serial}")
+            else:
+                conn.send_request("host:transport-any")
+            conn.send_request(service)
+            return conn
+        except Exception:
+            conn.close()
+            raise
+
+    # --- host 服務 ---
+    def host_command(self, service):
+        """ host:xxx 類指令 (不需要指定裝置)，回傳 server 給的字串 """
+        conn = self._connect()
+        try:
+            conn.send_request(service)
+            return conn.read_length_prefixed().decode("utf-8", errors="ignore")
+        finally:
+            conn.close()
+
+    def connect(self, address=None):
+        """ 等同 adb connect 127.0.0.1:16480 """
+        return self.host_command(f"host:connect:{address or self.serial}")
+
+    def devices(self):
+        return self.host_command("host:devices")
+
+    # --- 裝置服務 ---
+    def shell(self, command):
+        """ 等同 adb shell <command>，回傳字串 (已去頭尾空白) """
+        conn = self._open_service(f"shell:{command}")
+        try:
+            return conn.read_all().decode("utf-8", errors="ignore").strip()
+        finally:
+            conn.close()
+
+    def exec_out(self, command, size_hint=0):
+        """ 等同 adb exec-out <command>，回傳原始 bytes (不經過 pty，不會被改換行) """
+        conn = self._open_service(f"exec:{command}")
+        try:
+            return conn.read_all(size_hint)
+        finally:
+            conn.close()
+
+    def shell_session(self):
+        return AdbSocketShell(self)
+
+    # --- sync 服務 ---
+    def _sync_conn(self):
+        if self._sync is None:
+            self._sync = self._open_service("sync:")
+        return self._sync
+
+    def _drop_sync(self):
+        if self._sync is not None:
+            self._sync.close()
+            self._sync = None
+
+    @staticmethod
+    def _sync_packet(cmd, data):
+        return cmd + struct.pack("<I", len(data)) + data
+
+    def pull(self, remote_path, dest=None):
+        """
+        [下載] 等同 adb pull
+        :param dest: 檔案路徑、已開啟的檔案物件，或 None (回傳 bytes)
+        """
+        with self._sync_lock:
+            try:
+                return self._pull(remote_path, dest)
+            except Exception:
+                self._drop_sync()
+                raise
+
+    def _pull(self, remote_path, dest):
+        conn = self._sync_conn()
+        conn.sock.sendall(self._sync_packet(b"RECV", remote_path.encode("utf-8")))
+
+        own_file = isinstance(dest, (str, bytes)) or hasattr(dest, "__fspath__")
+        out = open(dest, "wb") if own_file else (dest if dest is not None else io.BytesIO())
+        try:
+            while True:
+                header = conn.read_exact(8)
+                cmd, length = header[:4], struct.unpack("<I", header[4:])[0]
+                if cmd == b"DATA":
+                    out.write(conn.read_exact(length))
+                elif cmd == b"DONE":
+                    break
+                elif cmd == b"FAIL":
+                    raise AdbError(conn.read_exact(length).decode("utf-8", errors="ignore"))
+                else:
+                    raise AdbError(f"sync 回應異常: {cmd!r}")
+        finally:
+            if own_file:
+                out.close()
+
+        if dest is None:
+            return out.getvalue()
+        return dest
+
+    def push(self, src, remote_path, mode=0o644, mtime=None):
+        """
+        [上傳] 等同 adb push
+        :param src: 檔案路徑、bytes 或已開啟的檔案物件
+        """
+        with self._sync_lock:
+            try:
+                self._push(src, remote_path, mode, mtime)
+            except Exception:
+                self._drop_sync()
+                raise
+
+    def _push(self, src, remote_path, mode, mtime):
+        conn = self._sync_conn()
+        header = f"{remote_path},{mode | 0o100000}".encode("utf-8")
+        conn.sock.sendall(self._sync_packet(b"SEND", header))
+
+        if isinstance(src, (bytes, bytearray, memoryview)):
+            stream, own_file = io.BytesIO(src), False
+        elif isinstance(src, str) or hasattr(src, "__fspath__"):
+            stream, own_file = open(src, "rb"), True
+        else:
+            stream, own_file = src, False
+
+        try:
+            while True:
+                chunk = stream.read(SYNC_CHUNK)
+                if not chunk:
+                    break
+                conn.sock.sendall(self._sync_packet(b"DATA", chunk))
+        finally:
+            if own_file:
+                stream.close()
+
+        stamp = int(time.time() if mtime is None else mtime)
+        conn.sock.sendall(b"DONE" + struct.pack("<I", stamp))
+
+        header = conn.read_exact(8)
+        cmd, length = header[:4], struct.unpack("<I", header[4:])[0]
+        if cmd == b"FAIL":
+            raise AdbError(conn.read_exact(length).decode("utf-8", errors="ignore"))
+        if cmd != b"OKAY":
+            raise AdbError(f"sync 回應異常: {cmd!r}")
+
+    def close(self):
+        with self._sync_lock:
+            if self._sync is not None:
+                try:
+                    self._sync.sock.sendall(self._sync_packet(b"QUIT", b""))
+                except OSError:
+                    pass
+            self._drop_sync()
+
+
+class AdbSocketShell:
+    """
+    [長駐 Shell - socket 版] 跟 AdbShellSession 同樣的 run() 介面
+    只是通道從 adb.exe 的 stdin/stdout 換成直接連 ADB server 的 socket
+    """
+
+    def __init__(self, client: AdbClient, timeout=None):
+        self.client = client
+        self.device_id = client.serial
+        self.timeout = client.timeout if timeout is None else timeout
+        self.last_exit_code = None
+        self._conn = None
+        self._lines = None
+        self._lock = threading.Lock()
+        self._seq = itertools.count()
+
+    def is_alive(self):
+        return self._conn is not None
+
+    def _open(self):
+        self._conn = self.client._open_service("shell:")
+        self._conn.sock.settimeout(None)  # 讀取交給背景執行緒，逾時由 queue 控制
+        self._lines = queue.Queue()
+        threading.Thread(target=self._pump, args=(self._conn, self._lines), daemon=True).start()
+
+    @staticmethod
+    def _pump(conn, lines):
+        reader = conn.sock.makefile("rb")
+        try:
+            for raw in iter(reader.readline, b""):
+                lines.put(raw.decode("utf-8", errors="ignore").rstrip("\r\n"))
+        except OSError:
+            pass
+        lines.put(None)
+
+    def close(self):
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            conn.close()
+
+    def _run_once(self, command, timeout):
+        if not self.is_alive():
+            self._open()
+
+        marker = f"__ADB_DONE_{next(self._seq)}__"
+        # 標記前面先換行：指令輸出最後沒有換行時，標記也會在新的一行開頭
+        self._conn.sock.sendall(f"{command}; printf '\\n%s %d\\n' {marker} $?\n".encode("utf-8"))
+
+        output = []
+        while True:
+            got = self._lines.get(timeout=timeout)
+            if got is None:
+                raise ConnectionError("adb shell 通道已關閉")
+            # 互動式 shell 會把我們送的指令回顯一次，這行也含有 marker，要跳過
+            if got.startswith(marker):
+                code = got[len(marker):].strip()
+                self.last_exit_code = int(code) if code.lstrip("-").isdigit() else None
+                return "\n".join(output)
+            if marker in got:
+                continue
+            output.append(got)
+
+    def run(self, command, timeout=None):
+        timeout = self.timeout if timeout is None else timeout
+        with self._lock:
+            for attempt in range(2):
+                try:
+                    return self._run_once(command, timeout).strip()
+                except (OSError, AdbError):
+                    self.close()
+                    if attempt == 1:
+                        raise
+                except queue.Empty:
+                    self.close()
+                    raise
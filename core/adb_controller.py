@@ -1,22 +1,105 @@
 import subprocess
 import numpy as np
-import random
 import cv2
 import os
 import time
+import queue
+import shlex
+import contextlib
 from . import config # 匯入設定檔
+from .adb_shell import AdbShellSession
+from .adb_client import AdbClient
+from .input_script import InputScript, tap_command
+from .metrics import METRICS
+from .tracing import span
 
 class AdbController:
     def __init__(self, adb_path, device_id, target_app_package):
         self.adb_path = adb_path
         self.device_id = device_id
         self.target_app_package = target_app_package
+        self.capture_mode = config.CAPTURE_MODE
+        self._raw_failures = 0 # raw 截圖連續幾張大小對不上
+        self._shell = None # 長駐 shell (第一次用到才開)
+        self._client = None # socket 模式用的 ADB 客戶端
+        self.boot_gate = None # 多開時由主控台注入 (限制同時開機的台數)
+
+    @property
+    def use_socket(self):
+        return config.ADB_BACKEND == "socket"
+
+    def _get_client(self):
+        """ [socket 模式] 直接跟 ADB server 溝通的客戶端；裝置換了就重建 """
+        if self._client is None or self._client.serial != config.DEVICE_ID:
+            if self._client is not None:
+                self._client.close()
+            self._client = AdbClient(serial=config.DEVICE_ID, port=config.ADB_SERVER_PORT,
+                                     adb_path=config.ADB_PATH)
+        return self._client
+
+    def _get_shell(self):
+        """ 每台裝置一條長駐 shell；裝置換了就重開 """
+        if self._shell is None or self._shell.device_id != config.DEVICE_ID:
+            if self._shell is not None:
+                self._shell.close()
+            if self.use_socket:
+                self._shell = self._get_client().shell_session()
+            else:
+                self._shell = AdbShellSession(config.ADB_PATH, config.DEVICE_ID)
+        return self._shell
+
+    def _run_host_cmd(self, clean_cmd, command):
+        """ [socket 模式] pull / connect 這類不走 shell 的指令 """
+        try:
+            args = shlex.split(clean_cmd, posix=(os.name != 'nt'))
+            args = [a.strip('"') for a in args]
+            client = self._get_client()
+            if args[0] == "pull":
+                client.pull(args[1], args[2])
+                return f"{args[1]}: 1 file pulled."
+            return client.connect(args[1] if len(args) > 1 else None)
+        except Exception as e:
+            print(f"❌ 指令執行失敗: {command} | {e}")
+            return ""
+
+    def adb_connect(self, timeout=3):
+        """ 等同 adb connect <device> """
+        if self.use_socket:
+            return self._run_host_cmd(f"connect {config.DEVICE_ID}", "connect")
+        connect_cmd = f'"{config.ADB_PATH}" connect {config.DEVICE_ID}'
+        subprocess.run(
+            connect_cmd, 
+            shell=True, 
+            stdout=subprocess.DEVNULL, 
+            stderr=subprocess.DEVNULL,
+            timeout=timeout
+        )
+        return ""
+
+    def _run_in_shell(self, shell_cmd, command):
+        try:
+            return self._get_shell().run(shell_cmd)
+        except queue.Empty:
+            print(f"❌ ADB 指令逾時: {command}")
+            return ""
+        except Exception as e:
+            print(f"❌ 指令執行失敗: {command} | {e}")
+            return ""
 
     def run_cmd(self, command):
         """ 
         [智慧相容版] 執行 ADB 指令 
         會自動偵測輸入的指令是否已經包含 'shell'，避免重複
         """
+        words = command.split()
+        if words and words[0] == "shell":
+            words = words[1:]
+        op = " ".join(words[:2]) if words[:1] == ["input"] else (words[0] if words else "")
+        METRICS.inc("ptcg_adb_commands_total", op=op)
+        with METRICS.timer("ptcg_adb_command_seconds", op=op), span(f"adb:{op}", "adb"):
+            return self._dispatch_cmd(command)
+
+    def _dispatch_cmd(self, command):
         # 0. 先把指令的前後空白清乾淨
         clean_cmd = command.strip()
 
@@ -28,7 +111,18 @@ class AdbController:
         else:
             # 2. 如果沒寫 shell (例如原本的 "input tap...") -> 幫忙補上
             full_cmd = f'"{config.ADB_PATH}" -s {config.DEVICE_ID} shell {clean_cmd}'
-        
+
+        # 3. socket 模式：pull / connect 直接走 ADB 協定
+        if self.use_socket and (clean_cmd.startswith("pull") or clean_cmd.startswith("connect")):
+            return self._run_host_cmd(clean_cmd, command)
+
+        # 4. 裝置端指令 (input / am / monkey ...) 走長駐 shell，省掉每次開新 adb 行程
+        if config.PERSISTENT_SHELL or self.use_socket:
+            if clean_cmd.startswith("shell "):
+                return self._run_in_shell(clean_cmd[len("shell "):], command)
+            if not (clean_cmd.startswith("pull") or clean_cmd.startswith("connect")):
+                return self._run_in_shell(clean_cmd, command)
+
         try:
             result = subprocess.run(
                 full_cmd, 
@@ -49,39 +143,176 @@ class AdbController:
             print(f"❌ 指令執行失敗: {command} | {e}")
             return ""
 
+    # screencap 原始格式 -> (每像素 bytes, 轉成 BGR 的 cvtColor 代碼)
+    # 1=RGBA_8888, 2=RGBX_8888, 3=RGB_888, 5=BGRA_8888
+    RAW_FORMATS = {
+        1: (4, cv2.COLOR_RGBA2BGR),
+        2: (4, cv2.COLOR_RGBA2BGR),
+        3: (3, cv2.COLOR_RGB2BGR),
+        5: (4, cv2.COLOR_BGRA2BGR),
+    }
+    # 格式認得但大小連續對不上幾次，才當成這台不支援 (偶爾一張被截斷是斷線造成的)
+    RAW_FAILURE_LIMIT = 3
+
+    def _exec_out(self, *args, timeout=10):
+        """ exec-out 是直接傳 binary，不經過 pty，所以不會有換行符號被竄改的問題 """
+        if self.use_socket:
+            # 直接收進一整塊 buffer，後面用 np.frombuffer 包起來不用再複製
+            return self._get_client().exec_out(" ".join(args))
+
+        cmd = [self.adb_path, "-s", self.device_id, "exec-out", *args]
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        try:
+            data, _ = process.communicate(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.communicate()
+            raise
+        return data
+
+    @classmethod
+    def parse_raw_screencap(cls, data):
+        """
+        [工具] 解析 screencap (不加 -p) 的輸出
+        格式: width, height, format (+ Android 9 以後多一個 colorspace)，全部是 little-endian uint32
+        像素部分直接包成 numpy view，不複製
+        :return: (h, w, c) 的 view 與轉 BGR 用的代碼；格式不認得就回傳 (None, None)
+        """
+        if len(data) < 12:
+            return None, None
+
+        header = np.frombuffer(data, dtype="<u4", count=3)
+        width, height, fmt = (int(v) for v in header)
+        if fmt not in cls.RAW_FORMATS or width == 0 or height == 0:
+            return None, None
+
+        bpp, code = cls.RAW_FORMATS[fmt]
+        pixel_bytes = width * height * bpp
+        header_size = len(data) - pixel_bytes
+        if header_size not in (12, 16):
+            return None, None
+
+        pixels = np.frombuffer(data, dtype=np.uint8, count=pixel_bytes, offset=header_size)
+        return pixels.reshape(height, width, bpp), code
+
+    def _get_screenshot_raw(self):
+        """ :return: (畫面, 格式是否支援) """
+        data = self._exec_out("screencap")
+        if len(data) < 12:
+            return None, True  # 沒拿到資料 (斷線之類)，不代表格式不支援
+
+        fmt = int(np.frombuffer(data, dtype="<u4", count=3)[2])
+        if fmt not in self.RAW_FORMATS:
+            return None, False
+
+        pixels, code = self.parse_raw_screencap(data)
+        if pixels is None:
+            # 格式認得但大小不對：多半是傳到一半斷掉，這張丟掉讓呼叫的人重拍
+            self._raw_failures += 1
+            print(f"⚠️ raw 截圖資料不完整 ({len(data)} bytes，連續 {self._raw_failures} 次)")
+            return None, self._raw_failures < self.RAW_FAILURE_LIMIT
+        self._raw_failures = 0
+        # 比對用的模板都是 BGR，這裡一次轉好 (這是唯一一次像素複製)
+        return cv2.cvtColor(pixels, code), True
+
+    def _get_screenshot_png(self):
+        data = self._exec_out("screencap", "-p")
+        if len(data) < 100: return None
+
+        image_array = np.frombuffer(data, np.uint8)
+        return cv2.imdecode(image_array, cv2.IMREAD_COLOR)
+
     def get_screenshot(self):
-        """ 獲取畫面轉為 OpenCV 格式 """
-        full_cmd = f'"{self.adb_path}" -s {self.device_id} shell screencap -p'
+        """ 獲取畫面轉為 OpenCV 格式 (raw 模式失敗會自動退回 png) """
+        mode = self.capture_mode
+        with METRICS.timer("ptcg_screenshot_seconds", mode=mode), span("screencap", "adb", mode=mode):
+            screen = self._capture()
+        if screen is None:
+            METRICS.inc("ptcg_screenshot_failures_total", mode=mode)
+        return screen
+
+    def _capture(self):
         try:
-            process = subprocess.Popen(
-                full_cmd, shell=True, 
-                stdout=subprocess.PIPE, stderr=subprocess.PIPE
-            )
-            data, _ = process.communicate(timeout=10)
-            
-            # Windows 換行符號處理
-            if os.name == 'nt':
-                data = data.replace(b'\r\n', b'\n')
-            
-            if len(data) < 100: return None
+            if self.capture_mode == "raw":
+                screen, supported = self._get_screenshot_raw()
+                if supported:
+                    return screen
+                print("⚠️ 裝置不支援 raw 截圖格式 (或連續讀不完整)，改用 PNG 模式")
+                self.capture_mode = "png"
 
-            image_array = np.frombuffer(data, np.uint8)
-            return cv2.imdecode(image_array, cv2.IMREAD_COLOR)
+            return self._get_screenshot_png()
         except Exception as e:
             print(f"❌ 截圖失敗: {e}")
             return None
 
     def tap(self, x, y, max_offset=5):
-        dx = random.randint(-max_offset, max_offset)
-        dy = random.randint(-max_offset, max_offset)
-        
-        final_x = x + dx
-        final_y = y + dy
-        self.run_cmd(f"input swipe {x} {y} {final_x} {final_y} {10}")
+        self.run_cmd(tap_command(x, y, max_offset))
 
     def swipe(self, sx, sy, ex, ey, duration=300):
         self.run_cmd(f"input swipe {sx} {sy} {ex} {ey} {duration}")
 
+    def run_script(self, script: InputScript, timeout=None):
+        """
+        [批次輸入] 整串手勢一次送到裝置端執行 (只跑一趟 adb)，全部做完才回傳
+        :param timeout: 預設 = 預計時間 + 15 秒
+        :return: 每個動作實際的執行時間 (EventTiming 清單，裝置端量的)
+        """
+        if not script.events:
+            return []
+        scale = config.TIME_SCALE
+        body = script.render(scale)
+        if timeout is None:
+            timeout = script.expected_seconds(scale) + 15
+
+        op = "input script"
+        METRICS.inc("ptcg_adb_commands_total", op=op)
+        with METRICS.timer("ptcg_adb_command_seconds", op=op), \
+                span(f"adb:{op}", "adb", events=len(script.events)):
+            output = self._run_script_body(body, timeout)
+
+        timings = script.parse(output, scale)
+        for t in timings:
+            METRICS.observe("ptcg_input_event_seconds", t.duration, kind=t.kind)
+            METRICS.observe("ptcg_input_event_lag_seconds", max(0.0, t.lag), kind=t.kind)
+        if config.WAIT_TRACE:
+            for t in timings:
+                print(f"   ⏱️ [Input] #{t.index} {t.kind}: +{t.start:.2f}s (預計 +{t.planned:.2f}s) 耗時 {t.duration:.2f}s")
+        return timings
+
+    def _run_script_body(self, body, timeout):
+        if config.PERSISTENT_SHELL or self.use_socket:
+            try:
+                return self._get_shell().run(body, timeout=timeout)
+            except queue.Empty:
+                print(f"❌ ADB 批次輸入逾時 ({timeout:.0f}s)")
+                return ""
+            except Exception as e:
+                print(f"❌ 批次輸入失敗: {e}")
+                return ""
+
+        # 不經過本機 shell (腳本裡的 ; 和 $(...) 要留給裝置端解讀)
+        try:
+            result = subprocess.run(
+                [config.ADB_PATH, "-s", str(config.DEVICE_ID), "shell", body],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True,
+                encoding='utf-8',
+                errors='ignore',
+                timeout=timeout,
+            )
+            return result.stdout
+        except subprocess.TimeoutExpired:
+            print(f"❌ ADB 批次輸入逾時 ({timeout:.0f}s)")
+            return ""
+        except Exception as e:
+            print(f"❌ 批次輸入失敗: {e}")
+            return ""
+
+    def key_back(self):
+        """ 按 Android 返回鍵 """
+        self.run_cmd("input keyevent 4")
+
     def stop_app(self, package_name = config.target_app_package):
         cmd = f"am force-stop {package_name}"
         self.run_cmd(cmd)
@@ -95,7 +326,7 @@ class AdbController:
         """ [系統] 快速重啟 (殺掉 -> 打開) """
         print(f"📱 [ADB] 正在重啟 APP: {package_name}")
         self.stop_app(package_name)
-        time.sleep(3.0) # 系統反應時間
+        time.sleep(3.0 * config.TIME_SCALE) # 系統反應時間
         self.start_app(package_name)
 
     # ==========================================
@@ -107,14 +338,7 @@ class AdbController:
         start = time.time()
         while time.time() - start < timeout:
             try:
-                connect_cmd = f'"{config.ADB_PATH}" connect {config.DEVICE_ID}'
-                subprocess.run(
-                    connect_cmd, 
-                    shell=True, 
-                    stdout=subprocess.DEVNULL, 
-                    stderr=subprocess.DEVNULL,
-                    timeout=3
-                )
+                self.adb_connect(timeout=3)
                 res = self.run_cmd("shell echo ok")
                 if "ok" in res.strip():
                     print("   ✅ 模擬器已連線！")
@@ -218,24 +442,26 @@ class AdbController:
             self._force_kill_emulator_process()
 
             # === 3. 重新啟動 ===
-            print(f"   🚀 正在啟動模擬器...")
-            cmd_open = ""
-            if etype == "mumu":
-                cmd_open = f'"{manager}" control -i {idx} -c launch'
-            elif etype == "ldplayer":
-                cmd_open = f'"{manager}" launch --index {idx}'
+            # 多開時要先拿到「開機名額」，避免好幾台同時開機把硬碟塞爆
+            with self.boot_gate or contextlib.nullcontext():
+                print(f"   🚀 正在啟動模擬器...")
+                cmd_open = ""
+                if etype == "mumu":
+                    cmd_open = f'"{manager}" control -i {idx} -c launch'
+                elif etype == "ldplayer":
+                    cmd_open = f'"{manager}" launch --index {idx}'
 
-            subprocess.run(
-                cmd_open, 
-                shell=True, 
-                check=True,
-                env=env,
-                stdout=subprocess.DEVNULL, 
-                stderr=subprocess.DEVNULL
-            )
+                subprocess.run(
+                    cmd_open, 
+                    shell=True, 
+                    check=True,
+                    env=env,
+                    stdout=subprocess.DEVNULL, 
+                    stderr=subprocess.DEVNULL
+                )
             
-            # 4. 等待 ADB 連線
-            self.wait_for_device_boot()
+                # 4. 等待 ADB 連線
+                self.wait_for_device_boot()
 
         except Exception as e:
             print(f"❌ 模擬器重啟失敗: {e}")
\ No newline at end of file
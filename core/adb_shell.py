@@ -0,0 +1,106 @@
+# core/adb_shell.py
+import itertools
+import queue
+import subprocess
+import threading
+
+
+class AdbShellSession:
+    """
+    [長駐 Shell] 對同一台裝置只開一次 adb shell，之後的指令都寫進同一個 stdin
+    每條指令後面接一個標記 (自己一行)，讀到標記就代表指令跑完了 (順便拿到 exit code)
+    通道斷掉時會自動重連
+    """
+
+    def __init__(self, adb_path, device_id, timeout=15):
+        self.adb_path = adb_path
+        self.device_id = device_id
+        self.timeout = timeout
+        self.last_exit_code = None
+        self._proc = None
+        self._lines = None
+        self._lock = threading.Lock()
+        self._seq = itertools.count()
+
+    # --- 連線管理 ---
+    def is_alive(self):
+        return self._proc is not None and self._proc.poll() is None
+
+    def _open(self):
+        cmd = [self.adb_path]
+        if self.device_id:
+            cmd += ["-s", str(self.device_id)]
+        cmd.append("shell")
+
+        self._proc = subprocess.Popen(
+            cmd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            bufsize=0,
+        )
+        # 另開一條執行緒專門讀 stdout，主執行緒才能用 timeout 等結果
+        self._lines = queue.Queue()
+        threading.Thread(target=self._pump, args=(self._proc, self._lines), daemon=True).start()
+
+    @staticmethod
+    def _pump(proc, lines):
+        for raw in iter(proc.stdout.readline, b""):
+            lines.put(raw.decode("utf-8", errors="ignore").rstrip("\r\n"))
+        lines.put(None)  # EOF：通道已關閉
+
+    def close(self):
+        proc, self._proc = self._proc, None
+        if proc is None:
+            return
+        try:
+            proc.stdin.close()
+        except Exception:
+            pass
+        try:
+            proc.kill()
+            proc.wait(timeout=2)
+        except Exception:
+            pass
+
+    # --- 執行指令 ---
+    def _run_once(self, command, timeout):
+        if not self.is_alive():
+            self._open()
+
+        marker = f"__ADB_DONE_{next(self._seq)}__"
+        # 標記前面先換行：指令輸出最後沒有換行時，標記也會在新的一行開頭，不會黏在輸出後面
+        line = f"{command}; printf '\\n%s %d\\n' {marker} $?\n"
+        self._proc.stdin.write(line.encode("utf-8"))
+        self._proc.stdin.flush()
+
+        output = []
+        while True:
+            got = self._lines.get(timeout=timeout)
+            if got is None:
+                raise ConnectionError("adb shell 通道已關閉")
+            if got.startswith(marker):
+                code = got[len(marker):].strip()
+                self.last_exit_code = int(code) if code.lstrip("-").isdigit() else None
+                return "\n".join(output)
+            output.append(got)
+
+    def run(self, command, timeout=None):
+        """
+        送出一條指令並等它跑完
+        :return: 指令的輸出 (已去頭尾空白)；逾時會丟出 queue.Empty
+        """
+        timeout = self.timeout if timeout is None else timeout
+        with self._lock:
+            for attempt in range(2):
+                try:
+                    return self._run_once(command, timeout).strip()
+                except (BrokenPipeError, OSError, ConnectionError):
+                    # 通道死了 -> 重開一次再試
+                    self.close()
+                    if attempt == 1:
+                        raise
+                except queue.Empty:
+                    # 逾時的話通道狀態未知，直接丟掉，下次重開
+                    self.close()
+                    raise
@@ -0,0 +1,192 @@
+# core/async_ops.py
+import asyncio
+import time
+from typing import Dict, Optional
+from . import config
+from .metrics import METRICS
+from .tracing import span
+
+
+class WaitTimeout(Exception):
+    """ wait_any / wait_all 超過期限 """
+
+
+class AsyncGameOps:
+    """
+    [非同步操作層] 把 GameOps 的截圖 / 找圖 / 點擊包成 awaitable
+    重點是可以「同時」盯好幾個結果 (勝 / 敗 / 平手 / 突發事件)：
+    - 所有 watch 共用同一張截圖 (frame() 會合併同時間的請求)，不會因為多盯一個就多截一次
+    - 等待都是 asyncio.sleep，可以被取消，不會卡住
+    """
+
+    def __init__(self, ops):
+        self.ops = ops
+        self.finder = ops.finder
+        self.adb = ops.adb
+        self.scheduler = ops.scheduler
+        self._latest = None          # (screen, timestamp)
+        self._inflight = None        # 正在進行中的截圖 (asyncio.Task)
+
+    # --- 基本動作 ---
+    async def frame(self, since=None):
+        """
+        取得一張比 since 新的截圖 (time.monotonic)
+        同一時間有好幾個 watch 在要畫面時，只會真的截一次
+        """
+        since = time.monotonic() if since is None else since
+        while True:
+            if self._latest is not None and self._latest[1] > since:
+                return self._latest
+
+            # 已經有人在截圖就一起等那一張，沒有才開新的
+            if self._inflight is None or self._inflight.done():
+                self._inflight = asyncio.ensure_future(asyncio.to_thread(self.ops.next_screen, since))
+            screen, stamp = await asyncio.shield(self._inflight)
+            if screen is None:
+                return None, since
+            self._latest = (screen, stamp)
+
+    async def match(self, screen, targets, text_mode=False):
+        return await asyncio.to_thread(self.finder.find_many, screen, targets, text_mode)
+
+    async def tap(self, x, y):
+        await asyncio.to_thread(self.adb.tap, x, y)
+
+    async def click_target(self, img_name, **kwargs):
+        return await asyncio.to_thread(self.ops.click_target, img_name, **kwargs)
+
+    async def pause(self, name, seconds):
+        """ 可以被取消的停頓 """
+        with span(f"sleep:{name}", "sleep"):
+            await asyncio.sleep(seconds * config.TIME_SCALE)
+        METRICS.observe("ptcg_pause_seconds", seconds, site=name)
+        if self.scheduler.trace:
+            print(f"   ⏱️ [Pause] {name}: {seconds:.1f}s")
+
+    # --- 條件 ---
+    async def watch(self, name, targets, text_mode=False, base=1.0):
+        """
+        一直看到 targets 其中一張出現為止
+        :return: (命中的 MatchResult, 那一張截圖)
+        """
+        since = time.monotonic()
+        with self.scheduler.begin(name, base=base) as wait:
+            while True:
+                self.ops.state.check_stop()
+                screen, since = await self.frame(since)
+                if screen is not None:
+                    hits = await self.match(screen, targets, text_mode)
+                    if hits:
+                        wait.done()
+                        return hits[0], screen
+                wait.polls += 1
+                await asyncio.sleep(wait.next_interval() * config.TIME_SCALE)
+
+    # --- 組合 ---
+    @staticmethod
+    async def wait_any(conditions: Dict[str, "asyncio.Future"], timeout: Optional[float] = None):
+        """
+        同時等好幾個條件，第一個完成的就贏，其餘自動取消
+        :param conditions: {"win": coroutine, "lose": coroutine, ...}
+        :return: (勝出的名字, 它的結果)；逾時丟出 WaitTimeout
+        """
+        tasks = {asyncio.ensure_future(coro): label for label, coro in conditions.items()}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                raise WaitTimeout(f"wait_any 超時 ({timeout}s): {list(conditions)}")
+            task = done.pop()
+            return tasks[task], task.result()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    @staticmethod
+    async def wait_all(conditions: Dict[str, "asyncio.Future"], timeout: Optional[float] = None):
+        """
+        同時等好幾個條件，全部完成才回傳 {名字: 結果}
+        任何一個出錯就丟出那個錯誤；逾時丟出 WaitTimeout；兩種情況其餘的都會被取消
+        """
+        tasks = {label: asyncio.ensure_future(coro) for label, coro in conditions.items()}
+        try:
+            done, pending = await asyncio.wait(tasks.values(), timeout=timeout,
+                                               return_when=asyncio.FIRST_EXCEPTION)
+            for task in done:
+                if not task.cancelled() and task.exception() is not None:
+                    raise task.exception()
+            if pending:
+                waiting = [label for label, task in tasks.items() if task in pending]
+                raise WaitTimeout(f"wait_all 超時 ({timeout}s): {waiting}")
+            return {label: task.result() for label, task in tasks.items()}
+        finally:
+            pending = [task for task in tasks.values() if not task.done()]
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    # --- 流程 ---
+    def _event_triggers(self):
+        return {e.trigger_img: 0.5 for e in self.ops.CRITICAL_EVENTS}
+
+    async def handle_event(self, screen):
+        return await asyncio.to_thread(self.ops.handle_critical_events, screen)
+
+    async def battle_result(self, win_img, lose_img, draw_img, timeout=1200, win_confidence=0.6, lose_confidence=0.6):
+        """
+        [戰鬥監測] 同時盯 勝 / 敗(平手) / 突發事件
+        :return: "win" / "lose" / None (超時)
+        """
+        deadline = time.monotonic() + timeout
+        while (remain := deadline - time.monotonic()) > 0:
+            try:
+                label, (hit, screen) = await self.wait_any({
+                    "win": self.watch("battle_result", {win_img: win_confidence}, base=5.0),
+                    "lose": self.watch("battle_result", {lose_img: lose_confidence, draw_img: lose_confidence}, base=5.0),
+                    "event": self.watch("battle_event", self._event_triggers(), base=5.0),
+                }, timeout=remain)
+            except WaitTimeout:
+                break
+
+            if label == "win":
+                await self.tap(*hit.pos)
+                print(f"🎉 偵測到勝利 ({win_img})！")
+                await self.pause("win_tap", 1.0)
+                return "win"
+            if label == "lose":
+                print(f"💀 偵測到失敗 ({hit.name}) -> 僅記錄，不點擊")
+                return "lose"
+
+            # 突發事件：處理完繼續盯
+            await self.handle_event(screen)
+
+        print("⚠️ 戰鬥監測超時")
+        return None
+
+    async def enter_lobby(self, wait_limit=120):
+        """
+        [回大廳] 同時盯大廳按鈕 (battle_1) 與突發事件，誰先出現就處理誰
+        :return: True (進入戰鬥選單) / False (超時)
+        """
+        deadline = time.monotonic() + wait_limit
+        while (remain := deadline - time.monotonic()) > 0:
+            print("正在尋找大廳...")
+            try:
+                label, (hit, screen) = await self.wait_any({
+                    "lobby": self.watch("lobby", {"battle_1.png": 0.7}, text_mode=True),
+                    "event": self.watch("lobby_event", self._event_triggers()),
+                }, timeout=remain)
+            except WaitTimeout:
+                break
+
+            if label == "event":
+                await self.handle_event(screen)
+                continue
+
+            await self.tap(*hit.pos)
+            if await self.click_target("battle_2.png", timeout=5):
+                await self.pause("battle_2_tap", 1.0)
+                await self.click_target("battle_3.png", timeout=5)
+                return True
+
+        return False
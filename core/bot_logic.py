@@ -1,98 +1,113 @@
 # core/bot_logic.py
 import time
+import asyncio
 import keyboard  # <--- 1. 匯入 keyboard
 import sys       # 用來強制結束
 from . import config
 from .adb_controller import AdbController
 from .image_finder import ImageFinder
 from .game_ops import GameOps 
+from .async_ops import AsyncGameOps
 from .state_manager import StateManager
 from .debugger import CrashReporter
 from .run_state import RunState
+from .frame_bus import FrameBus
+from .poll_scheduler import PollScheduler
+from .work_queue import WorkQueue
+from .recovery import RecoveryEngine
+from .metrics import METRICS, MetricsExporter
+from .tracing import TRACER, span, traced
 
 class GameBot:
-    def __init__(self):
+    def __init__(self, finder:ImageFinder=None, events=None):
+        """
+        :param finder: 多開時由主控台傳入 (掛著共用模板)，單機模式自己建
+        :param events: 多開時的回報佇列 (multiprocessing.Queue)，單機模式為 None
+        """
 
         self.adb = AdbController(adb_path=config.ADB_PATH,
             device_id=config.DEVICE_ID, 
             target_app_package=config.target_app_package)
 
-        self.finder = ImageFinder()
+        self.finder = finder if finder is not None else ImageFinder()
+        self.events = events
+        self.current_unit = None # 目前正在做的工作單位
         self.lose_times = 0
         
         # 初始化操作庫 (把手眼交給它)
         self.state_mgr = StateManager()
         self.state=RunState(self.state_mgr)
-        self.ops = GameOps(self.adb, self.finder, self.state)
+        # 共用畫面：背景持續截圖，大家都從這裡拿，不重複截
+        self.frames = FrameBus(self.adb)
+        if config.CAPTURE_FPS > 0:
+            self.frames.start()
+        self.scheduler = PollScheduler()
+        self.ops = GameOps(self.adb, self.finder, self.state, self.frames, self.scheduler)
+        self.recovery = RecoveryEngine(self.ops)
+        # 錯誤蒐證：平常截到的畫面順便留一份在記憶體，出錯時存下「出錯前」的經過
         self.reporter = CrashReporter(self.adb)
+        self.frames.subscribe(self.reporter.on_frame)
+        # 統計輸出 (config 沒設 METRICS_PORT / METRICS_FILE 就不會啟動)
+        METRICS.const_labels["device"] = str(config.DEVICE_ID)
+        self.metrics = MetricsExporter()
+        if self.metrics.enabled:
+            self.metrics.start()
+        # 時間軸追蹤 (config 沒設 TRACE_FILE 就是關閉，幾乎沒有成本)
+        if config.TRACE_FILE:
+            TRACER.start(config.TRACE_FILE)
     
+    def report(self, kind, **info):
+        """ [多開] 把進度回報給主控台 (單機模式什麼都不做) """
+        if self.events is None:
+            return
+        try:
+            self.events.put({"kind": kind, "device": config.DEVICE_ID, "time": time.time(), **info})
+        except Exception:
+            pass
+
+    def print_wait_summary(self, n=8):
+        """ [統計] 印出總耗時最多的等待點 / 停頓點，看時間都花到哪去了 """
+        print("\n⏱️ ===== 時間花費 (前幾名) =====")
+        # 同一個地點會因為 result 等其他標籤分成好幾列，依地點加總後再排
+        for metric, title, by in (("ptcg_wait_seconds", "等待", "site"), ("ptcg_pause_seconds", "停頓", "site"),
+                                  ("ptcg_match_seconds", "比對", "template"),
+                                  ("ptcg_recovery_tier_seconds", "救援", "tier")):
+            for labels, total, count in METRICS.top(metric, n, by=by):
+                print(f"   [{title}] {labels[by]}: 共 {total / 60:.1f} 分 / {count} 次 (平均 {total / count:.2f}s)")
+        print("================================\n")
+
+    @traced()
     def recover_game_state(self, max_retries=5):
         """ 
-        [SOP] 執行完整的錯誤恢復流程 (包含重試機制)
-        :param max_retries: 最大重試次數，預設 5 次
+        [SOP] 執行錯誤恢復流程 (分級：關彈窗 -> 返回 -> 導航 -> 重開 APP -> 重開模擬器)
+        :param max_retries: 最多重開幾次，預設 5 次 (最後一次是重開模擬器)
         """
-        print(f"\n🚑 啟動緊急救援 SOP (最大嘗試次數: {max_retries})")
-
-        for i in range(max_retries):
-            current_attempt = i + 1
-            print(f"   🔄 [救援嘗試 {current_attempt}/{max_retries}] 執行中...")
-
-            try:
-                # 步驟 1: 強制殺掉並重啟 APP (ADB層)
-                # (注意：這裡不需要 try-except，因為如果連 ADB 都掛了，通常重試也沒用)
-                if current_attempt < max_retries:
-                    self.adb.restart_app()
-                else:
-                    self.adb.restart_emulator()
-                    self.adb.restart_app()
-
-                # 步驟 2: 等待遊戲啟動 (Bot層決定時間)
-                wait_time = 30
-                print(f"      ⏳ 等待遊戲載入 ({wait_time}秒)...")
-                time.sleep(float(wait_time))
-
-                # 步驟 3: 嘗試導航回大廳 (Ops層)
-                # navigate_back_to_lobby 應該要回傳 True(成功) 或 False(失敗)
-                if self.ops.navigate_back_to_lobby():
-                    print(f"   ✨ [救援成功] 在第 {current_attempt} 次嘗試成功回到大廳！")
-                    return True  # ✅ 成功救回來了，結束這個函式
-                else:
-                    print(f"      ❌ [失敗] 導航回大廳失敗 (找不到圖或超時)")
-                    # 這裡不 return，讓迴圈跑下一次 (也就是再重開一次遊戲)
-
-            except Exception as e:
-                # 捕捉所有「預期外」的錯誤 (例如截圖失敗、記憶體不足...)
-                print(f"      ⚠️ [異常] 救援過程發生未預期錯誤: {e}")
-                # 也不 return，讓迴圈跑下一次
-
-            # 如果還沒達到最後一次，就稍微冷靜一下再重試
-            if current_attempt < max_retries:
-                print("      ♻️ 準備進行下一次重啟嘗試...")
-                time.sleep(5.0)
-
-        # === 如果跑完 for 迴圈都沒有 return True ===
-        # 代表救了 3 次都失敗，這時候才真的拋出絕望的錯誤
-        print(f"💀 [救援失敗] 已重試 {max_retries} 次仍無法恢復，程式終止。")
-
-
-        raise Exception("Fatal Error: Game Recovery Failed")
+        return self.recovery.recover(max_retries)
 
 
 
     # ============================
     # 🎵 第一部分：主旋律
     # ============================
+    @traced()
     def solve_unclear_mission(self):
         """ [單次任務邏輯] """
         # 使用 self.ops 來執行動作
         # 1. 滑到底
         self.ops.swipe_to_bottom(count=5)
         
-        # 2. 找圖
-        screen = self.adb.get_screenshot()
-        in_lobby, _ = self.finder.find_and_get_pos(screen, "change.png")
-        if not in_lobby:
-            raise Exception("沒有回到關卡選擇畫面")      
+        # 2. 先確認在關卡畫面 (不在就直接丟出去，不用等找圖逾時)
+        screen, _ = self.ops.next_screen()
+        guess = self.ops.where_am_i(screen)
+        if guess.scene == "error_dialog":
+            self.ops.handle_critical_events(screen)
+            screen, _ = self.ops.next_screen()
+            guess = self.ops.where_am_i(screen)
+        if guess.scene != "stage":
+            # 場景判斷不是關卡畫面時，用原解析度的 change.png 再確認一次才下結論
+            in_lobby, _ = self.finder.find_and_get_pos(screen, "change.png")
+            if not in_lobby:
+                raise Exception(f"沒有回到關卡選擇畫面 (目前在 {guess.scene})")
         found, pos = self.finder.find_and_get_pos(screen, "unclear.png", threshold = 0.5)
         
         if found:
@@ -100,6 +115,7 @@ class GameBot:
             return True
         return False
 
+    @traced()
     def run_main_theme(self):
         print("\n🎶 [主旋律] 開始演奏...")
         has_played = False
@@ -116,15 +132,17 @@ class GameBot:
             
             has_played = True
             print("   ⚔️ 進入戰鬥流程...")
-            time.sleep(5)
+            self.scheduler.pause("battle_enter", 5.0)
 
             # 2. 戰鬥設定 (呼叫 ops)
             self.ops.click_target("Auto_off.png")
-            time.sleep(1.0)
+            self.scheduler.pause("auto_toggle", 1.0)
             self.ops.click_target("Auto_on.png", off_x=-231, off_y=-133)
 
             # 3. 戰鬥監測 (呼叫 ops)
-            result = self.ops.wait_for_battle_result("win.png", "lose.png", "draw.png", win_CONFIDENCE=0.4)
+            # 同時盯 勝 / 敗 / 平手 / 突發事件 (共用同一張截圖)
+            result = asyncio.run(AsyncGameOps(self.ops).battle_result(
+                "win.png", "lose.png", "draw.png", win_confidence=0.4, lose_confidence=config.CONFIDENCE))
 
             # 4. 結算 (呼叫 ops)
             if result == "win":
@@ -145,7 +163,7 @@ class GameBot:
             else:
                 raise Exception("Battle Timeout")
             
-            time.sleep(3)
+            self.scheduler.pause("main_theme_loop", 3.0)
 
         return has_played
 
@@ -153,6 +171,7 @@ class GameBot:
     # ==========================================
     # 🎹 第二部分：間奏 (接收 n 作為參數)
     # ==========================================
+    @traced()
     def run_interlude(self, n):
         """
         間奏：根據次數 n 執行不同動作
@@ -165,7 +184,7 @@ class GameBot:
         if not self.ops.click_target("change.png", timeout=5, threshold=0.4):
             raise Exception("⚠️ 找不到 change 按鈕，跳過間奏")
 
-        time.sleep(2.0) # 等待切換介面
+        self.scheduler.pause("interlude_change", 2.0) # 等待切換介面
 
         if n >= 12:
             if self.ops.click_target("B.png"):
@@ -175,35 +194,21 @@ class GameBot:
                 print("成功切換至A卡包")
 
 
-        time.sleep(1.0)
+        self.scheduler.pause("interlude_pack", 1.0)
 
-        # (進階版寫法：邊滑邊找，而不是滑到底才找)
+        # 捲動搜尋：位置表記得上次在哪就直接捲過去，不然邊滑邊找 (最多 7 頁)
         target_img = f"A{n}.png"
-        
-        # 使用我們之前討論過的「捲動搜尋」邏輯
-        # 假設 game_ops 裡有 scroll_and_find_click
-        # 或者直接在這裡寫一個小迴圈
-        found = False
-        for _ in range(7): # 最多滑 5 頁
-
-            if self.ops.click_target(target_img, timeout = 3):
-                found = True
-                print(f"   ✅ 成功點選 {target_img}")
-                break
-            
-            # 沒找到，滑一下
-            self.adb.swipe(500, 800, 500, 400, duration=500)
-            time.sleep(3.0)
-            
-        if not found:
-            raise Exception("❌ 滑了 5 頁還是沒看到 {target_img}")
+        if not self.ops.find_in_list("package", target_img, max_pages=7, timeout=3, settle=3.0):
+            raise Exception(f"❌ 滑了 7 頁還是沒看到 {target_img}")
+        print(f"   ✅ 成功點選 {target_img}")
         
         print("🎹 間奏結束，準備回到主旋律。\n")
-        time.sleep(3.0)
+        self.scheduler.pause("interlude_end", 3.0)
     
     # ==========================================
     # 間章
     # =========================================
+    @traced()
     def switch_difficulty(self, diff_img):
         """ [動作] 切換難度 """
         print(f"🔄 正在切換難度目標: {diff_img}")
@@ -213,104 +218,140 @@ class GameBot:
         target_img = diff_img
 
         strict_threshold = 0.8
-        
-        found = False
-        for _ in range(5): # 最多滑 5 頁
-            self.state.check_stop()
-            if self.ops.click_target(target_img, timeout = 5,  threshold = strict_threshold):
-                found = True
-                break
-            
-            # 沒找到，滑一下
-            self.adb.swipe(500, 800, 500, 400, duration=500)
-            time.sleep(5.0)
-            
-        if not found:
-            raise Exception("❌ 滑了 5 頁還是沒看到 {target_img}")
+
+        # 最多滑 5 頁 (位置表有紀錄就一次捲到位)
+        if not self.ops.find_in_list("difficulty", target_img, max_pages=5, timeout=5,
+                                     threshold=strict_threshold, settle=5.0):
+            raise Exception(f"❌ 滑了 5 頁還是沒看到 {target_img}")
         
     # ==========================================
     # 🎼 總指揮
     # ==========================================
-    def routine_main(self):
-        # 1. 讀取上次進度
+    def _local_queue(self):
+        """ 單機模式的工作佇列：進度資料庫有紀錄就接著做，沒有就從上次存的進度開始 """
         state = self.state_mgr.load_state()
-        start_diff_idx = state["diff_index"]
-        start_pkg_n = state["package_n"]
+        return WorkQueue.open(
+            config.PROGRESS_DB,
+            difficulty_count=len(config.DIFFICULTY_LIST),
+            total_packages=config.TOTAL_PACKAGES,
+            done_before=(state["diff_index"], state["package_n"]),
+            legacy_file=config.WORK_QUEUE_FILE,
+        )
+
+    def _enter_difficulty(self, diff_img):
+        try:
+            self.switch_difficulty(diff_img)
+
+        except Exception as e:
+            print(f"⚠️ 難度切換失敗 ({e})，嘗試救援...")
+            self.recover_game_state()     # 重開並回到大廳
+            self.switch_difficulty(diff_img) # 再試一次切換
+
+    @traced()
+    def routine_main(self, work_queue=None):
+        """
+        :param work_queue: 多開時由主控台傳入的共用佇列；單機模式自己建
+        """
+        queue = work_queue if work_queue is not None else self._local_queue()
+        owner = str(config.DEVICE_ID)
 
         self.adb.wait_for_device_boot()
 
-        print(f"📂 讀取存檔: 從 [難度 {start_diff_idx+1}] 的 [第 {start_pkg_n+1} 關] 開始")
-        
-        # 直接讀取 config 裡的數字來跑迴圈
-        for d_idx, diff_img in enumerate(config.DIFFICULTY_LIST):
+        print(f"📂 工作佇列: {queue.stats()}")
 
-            if d_idx < start_diff_idx:
-                continue
+        current_diff = None
+        while True:
+            self.state.check_stop()
 
-            print(f"\n📢 ===========================")
-            print(f"📢 進入難度 {d_idx + 1} / {len(config.DIFFICULTY_LIST)}")
-            print(f"📢 ===========================\n")
+            # 1. 領一個工作 (同難度優先，少切幾次難度)
+            unit = queue.lease(owner, prefer_diff=current_diff)
+            if unit is None:
+                break
 
-            try:
-                self.switch_difficulty(diff_img)
+            d_idx, n = unit.diff_index, unit.package_n
+            diff_img = config.DIFFICULTY_LIST[d_idx]
+            self.current_unit = unit
 
-            except Exception as e:
-                print(f"⚠️ 難度切換失敗 ({e})，嘗試救援...")
-                self.recover_game_state()     # 重開並回到大廳
-                self.switch_difficulty(diff_img) # 再試一次切換
+            # 2. 難度不同就先退回難度列表再切換
+            if d_idx != current_diff:
+                if current_diff is not None:
+                    self.ops.click_target("back.png")
 
-                #self.restart_game()
+                print(f"\n📢 ===========================")
+                print(f"📢 進入難度 {d_idx + 1} / {len(config.DIFFICULTY_LIST)}")
+                print(f"📢 ===========================\n")
 
-            
-            current_start_n = start_pkg_n + 1 if d_idx == start_diff_idx else 1
-
-            while current_start_n < config.TOTAL_PACKAGES + 1:
-                self.state.check_stop()
                 try:
-                    print(f"\n=== 執行第 {current_start_n} 號目標 ===")
+                    self._enter_difficulty(diff_img)
+                except Exception as e:
+                    queue.fail(unit.key, owner, e)
+                    raise
+                current_diff = d_idx
+
+            # 3. 執行這一包
+            try:
+                print(f"\n=== 執行第 {n} 號目標 (第 {unit.attempts + 1} 次嘗試) ===")
+                package_start = time.time()
+
+                with span(f"package {unit.key}", "package", attempt=unit.attempts + 1):
+                    self.run_interlude(n=n)
+                    queue.renew(unit.key, owner)
 
-                    self.run_interlude(n=current_start_n)
-                
                     self.run_main_theme()
-                
-                    self.state.check_stop()
 
-                    self.state_mgr.save_state(d_idx, current_start_n)
+                self.state.check_stop()
 
-                    current_start_n += 1
-                    
-                except Exception as e:
-                    # === 🔥 發生意外 (斷線、閃退、卡住) ===
-                    error_msg = str(e)
-
-                    # 錯誤 -> 啟動 SOP
-                    print(f"⚠️ 發生錯誤: {error_msg}")
-                    print("♻️ 執行救援 SOP...")
-                    self.reporter.save_report(e, context=f"Diff_{d_idx}_Level_{current_start_n}")
-                    # 步驟 1: 重開遊戲 + 回到大廳 (我們剛剛寫好的功能)
-                    self.recover_game_state()
-
-                    
-                    # 步驟 2: 確保難度正確
-                    # (因為重開後預設可能是別的難度，保險起見再切一次)
-                    try:
-                        self.switch_difficulty(diff_img)
-                    except:
-                        pass # 如果已經在該難度可能會報錯，忽略之
-
-                    print(f"🔄 狀態已恢復，準備重試第 {current_start_n} 關...")
-                    time.sleep(3)
-                    # 這裡沒有 n+=1，所以迴圈會自動重打這一關
+                duration = time.time() - package_start
+                METRICS.observe("ptcg_package_seconds", duration, difficulty=d_idx + 1)
+                METRICS.inc("ptcg_packages_total", result="done")
+                queue.complete(unit.key, owner, duration)
+                self.state_mgr.save_state(d_idx, n)
+                self.report("package_done", diff_index=d_idx, package_n=n, duration=duration)
 
-            self.ops.click_target("back.png")
-            
-            print(f"🎉 {config.TOTAL_PACKAGES} 包攻略完畢，切換難度！")
+            except Exception as e:
+                # === 🔥 發生意外 (斷線、閃退、卡住) ===
+                error_msg = str(e)
+                METRICS.inc("ptcg_packages_total", result="error")
+                queue.fail(unit.key, owner, error_msg)
+
+                # 錯誤 -> 啟動 SOP
+                print(f"⚠️ 發生錯誤: {error_msg}")
+                print("♻️ 執行救援 SOP...")
+                self.report("recovery", diff_index=d_idx, package_n=n, error=error_msg)
+                self.reporter.save_report(e, context=f"Diff_{d_idx}_Level_{n}")
+                # 步驟 1: 重開遊戲 + 回到大廳 (我們剛剛寫好的功能)
+                self.recover_game_state()
+
+                # 步驟 2: 確保難度正確
+                # (因為重開後預設可能是別的難度，保險起見再切一次)
+                try:
+                    self.switch_difficulty(diff_img)
+                except:
+                    pass # 如果已經在該難度可能會報錯，忽略之
 
-            # 重置存檔：準備進入「下一個難度，第 1 關」
-            # 這樣如果在這裡斷掉，下次會從下個難度開頭開始
-            if d_idx + 1 < len(config.DIFFICULTY_LIST):
-                self.state_mgr.save_state(d_idx + 1, 1)
+                print(f"🔄 狀態已恢復，工作 {unit.key} 已放回佇列重試...")
+                self.scheduler.pause("retry_level", 3.0)
+            finally:
+                self.current_unit = None
 
-        self.state_mgr.save_state(0, 1)
+        if current_diff is not None:
+            self.ops.click_target("back.png")
+
+        print(f"🎉 工作佇列已清空: {queue.stats()}")
+        self.print_wait_summary()
+        self.reporter.close()
+        self.metrics.stop()
+        TRACER.stop()
+
+        # 單機模式全部做完就重置，下次從頭開始 (多開時由主控台決定)
+        # 有放棄的工作就不重置，失敗紀錄留在資料庫裡，不然這幾包會被悄悄跳過
+        if work_queue is None:
+            failed = queue.failed_units()
+            if failed:
+                print(f"⚠️ 有 {len(failed)} 個工作失敗太多次被放棄，進度不重置 (紀錄保留在 {config.PROGRESS_DB}):")
+                for unit in failed:
+                    print(f"   - {unit.key} (試了 {unit.attempts} 次): {unit.last_error}")
+            else:
+                queue.reset()
+                self.state_mgr.save_state(0, 0)
         # 函式結束，程式就會自然停止
-   
\ No newline at end of file
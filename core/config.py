@@ -7,6 +7,25 @@ CONFIDENCE = 0.6
 SCROLL_WAIT = 2.0
 LOOP_DELAY = 1.0
 
+# --- 模板快取 ---
+TEMPLATE_CACHE_MB = 64      # 解碼後模板最多佔用的記憶體
+TEMPLATE_PRELOAD = True     # 啟動時一次讀完 assets
+
+# --- 截圖模式 ---
+# "raw" = 直接拉原始 framebuffer (不壓 PNG，快很多，不支援時自動退回 png)
+# "png" = 舊的 screencap -p
+CAPTURE_MODE = "raw"
+
+# --- 長駐 shell ---
+# True = input / am 等指令寫進同一條 adb shell (不用每次開新行程)
+PERSISTENT_SHELL = True
+
+# --- ADB 通訊方式 ---
+# "subprocess" = 每個操作都呼叫 adb.exe (舊做法)
+# "socket"     = 直接用 ADB 協定跟本機 ADB server 溝通 (不開新行程)
+ADB_BACKEND = "subprocess"
+ADB_SERVER_PORT = 5037
+
 # --- 路徑設定 (改用 Pathlib) ---
 # 1. 取得這隻檔案 (config.py) 的絕對路徑
 CURRENT_FILE = Path(__file__).resolve()
@@ -24,7 +43,54 @@ ASSETS_DIR = ROOT_DIR / "assets"
 TOTAL_PACKAGES=15
 
 DIFFICULTY_LIST = ["diff_1.png", "diff_2.png", "diff_3.png", "diff_4.png"]
-STATE_FILE = "bot_state.json"
+PROGRESS_DB = "progress.db" # 進度資料庫 (SQLite)：工作單位狀態 + 事件紀錄，多台共用
+STATE_FILE = "bot_state.json" # 舊版存檔，只在第一次執行時轉進 PROGRESS_DB
+WORK_QUEUE_FILE = "work_queue.json" # 同上 (舊版工作佇列檔)
+ROI_HISTORY_FILE = "roi_history.json" # 自動學到的模板搜尋範圍
+WAIT_HISTORY_FILE = "wait_history.json" # 每個等待點過去實際等了多久
+SCROLL_INDEX_FILE = "scroll_index.json" # 每個卡包 / 難度上次是捲到哪裡才找到
+
+# --- 比對模式 ---
+# "full"    = 原解析度直接 matchTemplate
+# "pyramid" = 先在縮小圖上找候選，再回原解析度細修 (可在 templates.json 逐張設定 "match")
+MATCH_MODE = "full"
+PYRAMID_SCALE = 0.5
+ROI_LEARN_CONFIDENCE = 0.85  # "auto" 範圍只從這個分數以上的全畫面命中學 (低分可能是誤判，會把範圍撐大)
+
+# --- 畫面沒變就不重比 ---
+SCREEN_CACHE = True
+SCREEN_DIFF_TOLERANCE = 8  # 縮圖上任一點灰階差超過這個值才算「有變」
+MOTION_THRESHOLD = 0.02    # 捲動判斷：超過這個比例的縮圖格子有變才算「還在動」(小動畫不算)
+
+# --- 場景判斷 (我現在在哪個畫面) ---
+SCENE_SCALE = 0.25      # 整張畫面縮到幾倍再比 (只縮一次，所有場景模板共用)
+SCENE_THRESHOLD = 0.7   # 最高分低於這個值就當作 "unknown"
+
+# --- 等待排程 ---
+CPU_BUDGET = 0.5   # 單一實例最多吃掉幾成的一顆 CPU (超過就拉長輪詢間隔，0 = 不限制)
+WAIT_TRACE = False # True = 印出每次等待的名稱與耗時
+
+# 模擬裝置測試用：所有固定停頓 / 輪詢間隔都乘上這個倍數 (正式執行請保持 1.0，不從 config.json 讀)
+TIME_SCALE = 1.0
+
+# --- 背景截圖 ---
+# 每秒截幾張給大家共用 (0 = 不開背景執行緒，要畫面時才同步截)
+CAPTURE_FPS = 2.0
+
+# --- 錯誤蒐證 ---
+# 平常截到的畫面壓縮後留在記憶體，出錯時把「出錯前」這段存下來 (不用再另外錄影)
+CRASH_BUFFER_SECONDS = 30.0  # 保留最近幾秒
+CRASH_BUFFER_MB = 16         # 記憶體上限 (超過就丟最舊的)
+CRASH_FRAME_SCALE = 0.5      # 存進暫存前先縮小
+CRASH_JPEG_QUALITY = 70
+
+
+
+# --- 統計 (各步驟耗時) ---
+METRICS_PORT = 0       # > 0 = 開本機 HTTP 端點 http://127.0.0.1:port/metrics (Prometheus 格式)
+METRICS_FILE = ""      # 非空 = 定期把統計寫進這個檔案
+METRICS_INTERVAL = 30.0
+TRACE_FILE = ""        # 非空 = 把每一步寫成 Chrome trace (chrome://tracing / ui.perfetto.dev 打開)
 
 
 
@@ -37,6 +103,13 @@ MANAGER_PATH = Path("")
 EMULATOR_TYPE = "ldplayer"
 EMULATOR_INDEX = "0"
 
+# --- 多開設定 ---
+# 每個元素是一台裝置: {"device_ID": "127.0.0.1:16480", "emulator_index": 0}
+# 空的 = 單機模式 (跟以前一樣只跑 DEVICE_ID)
+INSTANCES = []
+MAX_PARALLEL_BOOTS = 1  # 同一時間最多幾台模擬器在開機 (避免硬碟 I/O 塞爆)
+BOOT_STAGGER = 30.0     # 每台開機之間至少間隔幾秒
+
 CONFIG_FILE =  ROOT_DIR / "config.json"
 if CONFIG_FILE.exists():
     try:
@@ -51,6 +124,35 @@ if CONFIG_FILE.exists():
 
         EMULATOR_TYPE = data.get("emulator_type", "ldplayer").lower()
         EMULATOR_INDEX = str(data.get("emulator_index", 0))
+
+        TEMPLATE_CACHE_MB = data.get("template_cache_mb", TEMPLATE_CACHE_MB)
+        TEMPLATE_PRELOAD = data.get("template_preload", TEMPLATE_PRELOAD)
+        CAPTURE_MODE = str(data.get("capture_mode", CAPTURE_MODE)).lower()
+        MATCH_MODE = str(data.get("match_mode", MATCH_MODE)).lower()
+        PYRAMID_SCALE = float(data.get("pyramid_scale", PYRAMID_SCALE))
+        CAPTURE_FPS = float(data.get("capture_fps", CAPTURE_FPS))
+        CRASH_BUFFER_SECONDS = float(data.get("crash_buffer_seconds", CRASH_BUFFER_SECONDS))
+        CRASH_BUFFER_MB = float(data.get("crash_buffer_mb", CRASH_BUFFER_MB))
+        CPU_BUDGET = float(data.get("cpu_budget", CPU_BUDGET))
+        WAIT_TRACE = data.get("wait_trace", WAIT_TRACE)
+
+        INSTANCES = data.get("instances", INSTANCES)
+        MAX_PARALLEL_BOOTS = int(data.get("max_parallel_boots", MAX_PARALLEL_BOOTS))
+        BOOT_STAGGER = float(data.get("boot_stagger", BOOT_STAGGER))
+        PROGRESS_DB = data.get("progress_db", PROGRESS_DB)
+        METRICS_PORT = int(data.get("metrics_port", METRICS_PORT))
+        METRICS_FILE = data.get("metrics_file", METRICS_FILE)
+        METRICS_INTERVAL = float(data.get("metrics_interval", METRICS_INTERVAL))
+        TRACE_FILE = data.get("trace_file", TRACE_FILE)
+        SCREEN_CACHE = data.get("screen_cache", SCREEN_CACHE)
+        SCREEN_DIFF_TOLERANCE = data.get("screen_diff_tolerance", SCREEN_DIFF_TOLERANCE)
+        MOTION_THRESHOLD = float(data.get("motion_threshold", MOTION_THRESHOLD))
+        SCENE_SCALE = float(data.get("scene_scale", SCENE_SCALE))
+        SCENE_THRESHOLD = float(data.get("scene_threshold", SCENE_THRESHOLD))
+        ROI_LEARN_CONFIDENCE = float(data.get("roi_learn_confidence", ROI_LEARN_CONFIDENCE))
+        PERSISTENT_SHELL = data.get("persistent_shell", PERSISTENT_SHELL)
+        ADB_BACKEND = str(data.get("adb_backend", ADB_BACKEND)).lower()
+        ADB_SERVER_PORT = int(data.get("adb_server_port", ADB_SERVER_PORT))
         
         # 轉為 Path 物件以便操作
         if data.get("manager_path"):
@@ -65,6 +167,31 @@ else:
 
 
 
+def apply_instance(instance):
+    """
+    [多開用] 子行程啟動時，把這台裝置的設定蓋到全域設定上
+    存檔 / 等待紀錄 / 學到的搜尋範圍也改成每台一份，避免互相覆蓋 (工作佇列是大家共用的，不分開)
+    """
+    global DEVICE_ID, EMULATOR_INDEX, STATE_FILE, WAIT_HISTORY_FILE, ROI_HISTORY_FILE, SCROLL_INDEX_FILE, METRICS_PORT, METRICS_FILE, TRACE_FILE
+
+    DEVICE_ID = instance.get("device_ID", DEVICE_ID)
+    EMULATOR_INDEX = str(instance.get("emulator_index", EMULATOR_INDEX))
+
+    tag = str(DEVICE_ID).replace(":", "_").replace(".", "_")
+    STATE_FILE = instance.get("state_file", f"bot_state_{tag}.json")
+    WAIT_HISTORY_FILE = f"wait_history_{tag}.json"
+    ROI_HISTORY_FILE = f"roi_history_{tag}.json"
+    SCROLL_INDEX_FILE = f"scroll_index_{tag}.json"
+    # 每個行程的統計各自輸出：port 要每台自己指定，檔案自動加上裝置名
+    METRICS_PORT = int(instance.get("metrics_port", 0))
+    if METRICS_FILE:
+        path = Path(METRICS_FILE)
+        METRICS_FILE = str(path.with_name(f"{path.stem}_{tag}{path.suffix}"))
+    if TRACE_FILE:
+        path = Path(TRACE_FILE)
+        TRACE_FILE = str(path.with_name(f"{path.stem}_{tag}{path.suffix}"))
+
+
 def get_image_path(filename):
     """
     組合檔名並回傳字串路徑
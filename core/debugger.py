@@ -1,75 +1,187 @@
 # core/debugger.py
+import atexit
+import json
+import queue
+import threading
 import time
 import traceback
-import cv2
-from pathlib import Path
+from collections import deque
 from datetime import datetime
+from pathlib import Path
+
+import cv2
+from . import config
+from .metrics import METRICS
+from .tracing import TRACER, span
+
+
+class FrameRing:
+    """
+    [出錯前的畫面] 最近幾秒的截圖，壓成 JPEG 放在記憶體裡
+    - 由 FrameBus 的訂閱者餵畫面 (平常輪詢本來就在截圖，不會多截)
+    - 超過保留秒數或記憶體上限就丟掉最舊的
+    - 跟上一張一模一樣的畫面 (dHash 相同) 不重複存，讀取畫面時不會塞滿
+    """
+
+    def __init__(self, seconds=None, max_bytes=None, scale=None, quality=None):
+        self.seconds = config.CRASH_BUFFER_SECONDS if seconds is None else seconds
+        self.max_bytes = int(config.CRASH_BUFFER_MB * 1024 * 1024 if max_bytes is None else max_bytes)
+        self.scale = config.CRASH_FRAME_SCALE if scale is None else scale
+        self.quality = config.CRASH_JPEG_QUALITY if quality is None else quality
+        self._items = deque()  # (time.monotonic, time.time, jpeg bytes)
+        self._bytes = 0
+        self._last_hash = None
+        self._lock = threading.Lock()
+
+    def push(self, frame):
+        """ FrameBus.subscribe 用 (在截圖執行緒裡跑，只做縮小 + 壓縮) """
+        if self.seconds <= 0:
+            return
+        if frame.hash == self._last_hash:
+            return
+        small = frame.scaled(self.scale) if self.scale != 1 else frame.image
+        ok, buf = cv2.imencode(".jpg", small, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+        if not ok:
+            return
+        data = buf.tobytes()
+        wall = time.time() - (time.monotonic() - frame.timestamp)
+        with self._lock:
+            self._last_hash = frame.hash
+            self._items.append((frame.timestamp, wall, data))
+            self._bytes += len(data)
+            self._trim(frame.timestamp)
+
+    def _trim(self, now):
+        while self._items and (now - self._items[0][0] > self.seconds or self._bytes > self.max_bytes):
+            _, _, data = self._items.popleft()
+            self._bytes -= len(data)
+
+    def snapshot(self):
+        """ 目前保留的畫面 (複製一份清單，之後繼續截圖也不影響) """
+        with self._lock:
+            self._trim(time.monotonic())
+            return list(self._items)
+
+    @property
+    def nbytes(self):
+        return self._bytes
+
+    def __len__(self):
+        return len(self._items)
+
 
 class CrashReporter:
-    def __init__(self, adb, save_dir="crash_reports"):
+    """
+    [錯誤蒐證] 出錯時存下 Log + 出錯當下的畫面 + 出錯前幾秒的畫面
+    - save_report 只收集資料就回傳，寫檔交給背景執行緒，救援流程可以馬上開始
+    - 出錯前的畫面來自 FrameRing (取代以前出錯後才用 screenrecord 錄 10 秒)
+    """
+
+    def __init__(self, adb, save_dir="crash_reports", ring=None):
         self.adb = adb
         self.save_dir = Path(save_dir)
         self.save_dir.mkdir(parents=True, exist_ok=True)
+        self.ring = ring if ring is not None else FrameRing()
+        self._latest = None  # 最新一張原解析度畫面 (Frame)
+        self._jobs = queue.Queue()
+        self._worker = None
+        # 程式因為錯誤直接結束時，也要把還在排隊的報告寫完
+        atexit.register(self.flush, 10.0)
+
+    def on_frame(self, frame):
+        """ 給 FrameBus.subscribe 用 """
+        self._latest = frame
+        self.ring.push(frame)
 
     def save_report(self, exception_obj, context="unknown"):
-        """ [整合版] 儲存截圖 + Log + 10秒錄影 """
+        """ [整合版] 收集 Log + 截圖 + 出錯前的畫面，交給背景寫檔 (不會卡住呼叫的人) """
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         filename_base = f"{timestamp}_{context}"
-        
-        print(f"📸 [Debugger] 發生錯誤，正在蒐證... ({filename_base})")
-
-        # 1. 截圖 (瞬間畫面)
-        self._save_screenshot(filename_base)
-        
-        # 2. 寫 Log (錯誤細節)
-        self._save_log(filename_base, exception_obj, context)
-
-        # 3. 🔥 錄影 (錄製接下來 10 秒的畫面)
-        self._record_video(filename_base, duration=10)
-
-    def _save_screenshot(self, base_name):
-        try:
-            screen = self.adb.get_screenshot()
-            if screen is not None:
-                path = self.save_dir / f"{base_name}.png"
-                cv2.imwrite(str(path), screen)
-                print(f"   └─ [1/3] 截圖已儲存")
-        except: pass
-
-    def _save_log(self, base_name, exc, ctx):
-        try:
-            path = self.save_dir / f"{base_name}.txt"
-            with open(path, "w", encoding="utf-8") as f:
-                f.write(f"Context: {ctx}\nError: {exc}\n\n{traceback.format_exc()}")
-            print(f"   └─ [2/3] Log 已儲存")
-        except: pass
-
-    def _record_video(self, base_name, duration=10):
-        """ 🔥 新功能: 錄影 10 秒並取出 """
-        print(f"   └─ [3/3] 正在錄影 {duration} 秒 (請稍候)...")
-        
-        # 定義手機端與電腦端的路徑
-        # 注意: 檔名不能有特殊字元，這裡用 base_name 很安全
-        remote_path = f"/sdcard/crash_{base_name}.mp4"
-        local_path = self.save_dir / f"{base_name}.mp4"
-
-        try:
-            # A. 開始錄影 (利用 --time-limit 自動停止，這會暫停程式 duration 秒)
-            # 指令: screenrecord --time-limit 10 /sdcard/xxx.mp4
-            self.adb.run_cmd(f"shell screenrecord --time-limit {duration} {remote_path}")
-            
-            # B. 將影片拉回電腦
-            # 指令: adb pull /sdcard/xxx.mp4 ./crash_reports/xxx.mp4
-            # 注意: execute_cmd 的實作通常是 adb -s serial {cmd}，所以這裡不用加 shell
-            pull_msg = self.adb.run_cmd(f'pull {remote_path} "{local_path}"')
-            
-            # C. 清理手機上的暫存檔 (節省空間)
-            self.adb.run_cmd(f"shell rm {remote_path}")
-
-            if local_path.exists():
-                print(f"      ✅ 影片已存檔: {local_path.name}")
-            else:
-                print(f"      ❌ 影片下載失敗: {pull_msg}")
-
-        except Exception as e:
-            print(f"      ⚠️ 錄影功能異常: {e}")
\ No newline at end of file
+
+        # traceback 一定要在 except 區塊裡 (也就是現在) 拿，背景執行緒拿不到
+        job = {
+            "base": filename_base,
+            "context": context,
+            "error": str(exception_obj),
+            "traceback": traceback.format_exc(),
+            "time": time.time(),
+            "latest": self._latest,
+            "frames": self.ring.snapshot(),
+        }
+        print(f"📸 [Debugger] 發生錯誤，背景蒐證中... ({filename_base}, 出錯前 {len(job['frames'])} 張畫面)")
+        METRICS.inc("ptcg_crash_reports_total")
+        TRACER.flush()  # 出錯前的時間軸先寫進檔案，之後程式被砍掉也不會不見
+        self._ensure_worker()
+        self._jobs.put(job)
+
+    # --- 背景寫檔 ---
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._work, name="CrashReporter", daemon=True)
+            self._worker.start()
+
+    def _work(self):
+        while True:
+            job = self._jobs.get()
+            try:
+                if job is None:
+                    return
+                with METRICS.timer("ptcg_crash_report_seconds"), span(f"crash_report:{job['base']}", "debug"):
+                    self._write(job)
+            except Exception as e:
+                print(f"⚠️ [Debugger] 蒐證寫檔失敗: {e}")
+            finally:
+                self._jobs.task_done()
+
+    def _write(self, job):
+        base = job["base"]
+        self._save_log(base, job)
+        self._save_screenshot(base, job["latest"])
+        self._save_frames(base, job["frames"], job["time"])
+        print(f"   └─ [Debugger] 蒐證完成: {self.save_dir / base}")
+
+    def _save_log(self, base_name, job):
+        path = self.save_dir / f"{base_name}.txt"
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(f"Context: {job['context']}\nError: {job['error']}\n\n{job['traceback']}")
+
+    def _save_screenshot(self, base_name, frame):
+        """ 出錯當下最後一張畫面 (原解析度)；背景還沒截過圖才自己截一張 """
+        screen = frame.image if frame is not None else self.adb.get_screenshot()
+        if screen is not None:
+            ok, buf = cv2.imencode(".png", screen)
+            if ok:
+                buf.tofile(str(self.save_dir / f"{base_name}.png"))
+
+    def _save_frames(self, base_name, frames, crash_time):
+        """ 出錯前的畫面：JPEG 原樣寫出，檔名是距離出錯幾秒 (例如 -12.5s.jpg) """
+        if not frames:
+            return
+        folder = self.save_dir / f"{base_name}_frames"
+        folder.mkdir(exist_ok=True)
+        index = []
+        for _, wall, data in frames:
+            offset = wall - crash_time
+            name = f"{len(index):03d}_{offset:+.1f}s.jpg"
+            (folder / name).write_bytes(data)
+            index.append({"file": name, "offset": round(offset, 3),
+                          "time": datetime.fromtimestamp(wall).strftime("%H:%M:%S.%f")[:-3]})
+        (folder / "index.json").write_text(json.dumps(index, indent=1, ensure_ascii=False), encoding="utf-8")
+
+    def flush(self, timeout=None):
+        """ 等背景把目前排隊的報告都寫完 (程式結束前呼叫) """
+        if self._worker is None:
+            return True
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._jobs.unfinished_tasks:
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def close(self, timeout=30.0):
+        self.flush(timeout)
+        if self._worker is not None and self._worker.is_alive():
+            self._jobs.put(None)
+            self._worker.join(timeout=1.0)
+        self._worker = None
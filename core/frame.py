@@ -0,0 +1,104 @@
+# core/frame.py
+import time
+
+import cv2
+import numpy as np
+
+
+class Frame:
+    """
+    [一張畫面] 截圖本身 + 各種前處理結果 (灰階 / 二值化 / 縮小 / 指紋)
+    - 每種前處理第一次用到才算，之後同一張畫面直接拿，不會每比一張模板就重算一次
+    - 用 __slots__，背景截圖一秒好幾張也不會多吃記憶體
+    - ImageFinder 的方法都吃 Frame (也還是可以直接丟 ndarray，會自動包起來)
+    同一張畫面的前處理結果不會變，多個執行緒同時要頂多重算一次，不用上鎖
+    """
+
+    __slots__ = ("image", "timestamp", "seq", "_gray", "_binary", "_scaled", "_thumbs", "_hash")
+
+    def __init__(self, image: np.ndarray, timestamp=None, seq=0):
+        self.image = image
+        self.timestamp = time.monotonic() if timestamp is None else timestamp
+        self.seq = seq
+        self._gray = None
+        self._binary = {}
+        self._scaled = {}
+        self._thumbs = {}
+        self._hash = None
+
+    @classmethod
+    def wrap(cls, screen):
+        """ ndarray -> Frame (已經是 Frame 就原樣回傳，None 還是 None) """
+        if screen is None or isinstance(screen, Frame):
+            return screen
+        return cls(screen)
+
+    @property
+    def shape(self):
+        return self.image.shape
+
+    @property
+    def gray(self):
+        """ 灰階 """
+        if self._gray is None:
+            img = self.image
+            self._gray = img if img.ndim == 2 else cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        return self._gray
+
+    def binary(self, thresh=180):
+        """ 二值化 (跟 find_text_button 一樣用 THRESH_BINARY_INV：深色字變白、淺色背景變黑) """
+        img = self._binary.get(thresh)
+        if img is None:
+            _, img = cv2.threshold(self.gray, thresh, 255, cv2.THRESH_BINARY_INV)
+            self._binary[thresh] = img
+        return img
+
+    def view(self, kind):
+        """ kind = "bgr" (原圖) / "gray" / "bin" (門檻 180 的二值化) """
+        if kind == "bgr":
+            return self.image
+        if kind == "gray":
+            return self.gray
+        if kind == "bin":
+            return self.binary()
+        raise ValueError(f"不認得的畫面種類: {kind}")
+
+    def scaled(self, scale, kind="bgr"):
+        """ 縮小版 (金字塔比對 / 場景判斷用) """
+        key = (kind, scale)
+        img = self._scaled.get(key)
+        if img is None:
+            img = cv2.resize(self.view(kind), None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+            self._scaled[key] = img
+        return img
+
+    def thumb(self, scale=1 / 16):
+        """ 灰階小縮圖 (int16，相減不會溢位)，ScreenChangeCache 判斷畫面有沒有變用 """
+        img = self._thumbs.get(scale)
+        if img is None:
+            img = self.scaled(scale, "gray").astype(np.int16)
+            self._thumbs[scale] = img
+        return img
+
+    def motion(self, other, tolerance=8, scale=1 / 16):
+        """
+        跟另一張畫面比，有幾成的縮圖格子變了 (灰階差超過 tolerance)
+        0.0 = 完全沒動；捲動時幾乎整張都會變，小動畫只會動到一小塊
+        """
+        a, b = self.thumb(scale), Frame.wrap(other).thumb(scale)
+        if a.shape != b.shape:
+            return 1.0
+        return float(np.count_nonzero(np.abs(a - b) > tolerance)) / a.size
+
+    @property
+    def hash(self):
+        """ 64 位元的差異雜湊 (dHash)：兩張畫面看起來一樣，雜湊就一樣或只差幾個位元 """
+        if self._hash is None:
+            small = cv2.resize(self.gray, (9, 8), interpolation=cv2.INTER_AREA)
+            bits = small[:, 1:] > small[:, :-1]
+            self._hash = int.from_bytes(np.packbits(bits).tobytes(), "big")
+        return self._hash
+
+    def distance(self, other):
+        """ 跟另一張畫面的雜湊差幾個位元 (0 = 幾乎一樣) """
+        return bin(self.hash ^ Frame.wrap(other).hash).count("1")
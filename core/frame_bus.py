@@ -0,0 +1,123 @@
+# core/frame_bus.py
+import threading
+import time
+from typing import Optional
+
+from . import config
+from .frame import Frame
+
+
+class FrameBus:
+    """
+    [共用畫面] 背景執行緒固定頻率截圖，所有人都從這裡拿畫面
+    - get_frame(newer_than=t) : 等一張比 t 還新的畫面 (不會重複截同一張)
+    - 沒啟動背景執行緒時，get_frame 會直接同步截一張 (行為跟以前一樣)
+    - 沒人要畫面的時候背景執行緒會停下來等，不會白白截圖
+    """
+
+    def __init__(self, adb, fps=None, idle_timeout=5.0):
+        self.adb = adb
+        fps = config.CAPTURE_FPS if fps is None else fps
+        self.interval = 1.0 / fps if fps > 0 else 0.0
+        self.idle_timeout = idle_timeout  # 超過這麼久沒人要畫面就暫停截圖
+        self._latest: Optional[Frame] = None
+        self._seq = 0
+        self._cond = threading.Condition()
+        self._last_demand = 0.0
+        self._thread = None
+        self._running = False
+        self._subscribers = []
+
+    # --- 背景截圖 ---
+    def start(self):
+        if self._running:
+            return self
+        self._running = True
+        self._thread = threading.Thread(target=self._loop, name="FrameBus", daemon=True)
+        self._thread.start()
+        print(f"🎞️ [FrameBus] 背景截圖啟動 (每 {self.interval:.2f} 秒一張)")
+        return self
+
+    def stop(self):
+        self._running = False
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _wanted(self):
+        return time.monotonic() - self._last_demand < self.idle_timeout
+
+    def _loop(self):
+        while self._running:
+            with self._cond:
+                while self._running and not self._wanted():
+                    self._cond.wait(timeout=0.5)
+            if not self._running:
+                break
+
+            started = time.monotonic()
+            self._capture()
+            # 截圖本身就花時間，扣掉之後才睡剩下的
+            remain = self.interval - (time.monotonic() - started)
+            if remain > 0:
+                time.sleep(remain)
+
+    def _capture(self):
+        stamp = time.monotonic()
+        image = self.adb.get_screenshot()
+        if image is None:
+            return None
+        with self._cond:
+            self._seq += 1
+            frame = Frame(image, timestamp=stamp, seq=self._seq)
+            self._latest = frame
+            self._cond.notify_all()
+        for callback in list(self._subscribers):
+            try:
+                callback(frame)
+            except Exception as e:
+                print(f"⚠️ [FrameBus] 訂閱者處理失敗: {e}")
+        return frame
+
+    # --- 對外介面 ---
+    def subscribe(self, callback):
+        """ 每截到一張新畫面就呼叫 callback(frame) (在截圖執行緒裡執行，要快) """
+        self._subscribers.append(callback)
+
+    def latest(self) -> Optional[Frame]:
+        return self._latest
+
+    def get_frame(self, newer_than=None, timeout=10.0) -> Optional[Frame]:
+        """
+        取得一張比 newer_than 還新的畫面
+        :param newer_than: time.monotonic() 時間點；None = 現在 (也就是要一張「接下來」拍的)
+        :return: Frame；逾時回傳 None
+        """
+        if newer_than is None:
+            newer_than = time.monotonic()
+
+        if not self._running:
+            # 沒有背景執行緒 -> 同步截一張
+            frame = self._latest
+            if frame is not None and frame.timestamp > newer_than:
+                return frame
+            return self._capture()
+
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            self._last_demand = time.monotonic()
+            self._cond.notify_all()  # 叫醒閒置中的截圖執行緒
+            while self._latest is None or self._latest.timestamp <= newer_than:
+                remain = deadline - time.monotonic()
+                if remain <= 0:
+                    return None
+                self._cond.wait(timeout=remain)
+                self._last_demand = time.monotonic()
+            return self._latest
+
+    def get_screenshot(self, newer_than=None, timeout=10.0):
+        """ 跟 adb.get_screenshot() 一樣回傳 ndarray (方便直接替換舊呼叫) """
+        frame = self.get_frame(newer_than=newer_than, timeout=timeout)
+        return None if frame is None else frame.image
@@ -1,14 +1,21 @@
 # core/game_ops.py
 import time
+import asyncio
 import keyboard
 from dataclasses import dataclass
 from . import config
 from .image_finder import ImageFinder
 from .adb_controller import AdbController
 from .run_state import RunState
+from .frame_bus import FrameBus
+from .poll_scheduler import PollScheduler
+from .async_ops import AsyncGameOps
+from .scene_classifier import SceneClassifier, SceneGuess
+from .scroll_index import ScrollIndex
+from .input_script import InputScript
+from .metrics import METRICS
+from .tracing import span, traced
 from typing import Optional, Tuple
-import contextlib
-import io
 
 @dataclass
 class CriticalEvent:
@@ -17,11 +24,20 @@ class CriticalEvent:
     desc: str
 
 class GameOps:
-    def __init__(self, adb:AdbController, finder:ImageFinder, run_state:RunState):
+    def __init__(self, adb:AdbController, finder:ImageFinder, run_state:RunState, frames:FrameBus=None,
+                 scheduler:PollScheduler=None):
         # 接收外部傳進來的手和眼
         self.adb = adb
         self.finder = finder
         self.state = run_state
+        # 共用畫面 (沒給的話就是不開背景執行緒的版本，每次要畫面才同步截圖)
+        self.frames = frames if frames is not None else FrameBus(adb)
+        # 所有等待都交給排程器 (依歷史紀錄決定輪詢間隔)
+        self.scheduler = scheduler if scheduler is not None else PollScheduler()
+        # 場景判斷：一次比完所有場景模板，回答「現在在哪個畫面」
+        self.scenes = SceneClassifier(finder)
+        # 捲動位置表：卡包 / 難度上次捲到哪裡找到，下次直接捲過去
+        self.scroll_index = ScrollIndex()
 
 
 
@@ -38,28 +54,197 @@ class GameOps:
             ),
         ]
 
+    # 清單捲動：每次往下拖曳幾像素 / 單次拖曳最多幾像素 (再多就超出螢幕)
+    SCROLL_STEP = 400
+    MAX_DRAG = 1000
+
     # --- 基礎工具 ---
-    def swipe_to_bottom(self, count=5):
+    def next_screen(self, since=None):
+        """
+        [工具] 從共用畫面拿一張比 since 還新的截圖 (不自己呼叫 adb 截圖)
+        :param since: time.monotonic() 時間點，None = 現在
+        :return: (screen, 這張的時間戳)；screen 是 Frame (灰階 / 二值化等前處理跟著它走，
+                 同一張拿去比好幾張模板只會算一次)，拿不到時是 None
+        """
+        with METRICS.timer("ptcg_frame_wait_seconds"), span("frame_wait", "capture"):
+            frame = self.frames.get_frame(newer_than=since)
+        if frame is None:
+            return None, since
+        return frame, frame.timestamp
+
+    def where_am_i(self, screen=None) -> SceneGuess:
+        """
+        [工具] 判斷目前在哪個畫面 (title / lobby / stage / difficulty_list / error_dialog ...)
+        :param screen: 已經有截圖就直接用，None = 拿一張新的
+        """
+        if screen is None:
+            screen, _ = self.next_screen()
+        guess = self.scenes.classify(screen)
+        print(f"   🧭 [Scene] {guess}")
+        return guess
+
+    def on_difficulty_list(self, screen):
         """
-        [工具] 快速連續往下滑動 (模擬手指快速撥動)
-        :param count: 滑動次數 (預設 5 次，通常夠滑到底了)
+        [工具] 用原解析度確認真的在難度列表
+        看得到第一個難度，而且看不到關卡畫面才有的 change / back (關卡畫面上方也有難度標題)
+        """
+        if screen is None or not self.finder.find_and_get_pos(screen, config.DIFFICULTY_LIST[0])[0]:
+            return False
+        return not any(self.finder.find_and_get_pos(screen, name)[0] for name in ("change.png", "back.png"))
+
+    def wait_for_scene(self, scenes, timeout=30, name="scene"):
+        """
+        [工具] 等到畫面變成 scenes 其中之一
+        :return: 等到的 SceneGuess；超時回傳 None
+        """
+        last_seen = time.monotonic()
+        with self.scheduler.begin(f"scene:{name}", base=1.0, timeout=timeout) as wait:
+            while wait.elapsed < timeout:
+                self.state.check_stop()
+                screen, last_seen = self.next_screen(last_seen)
+                guess = self.scenes.classify(screen)
+                if guess.scene in scenes:
+                    wait.done()
+                    return guess
+                wait.sleep()
+        print(f"   ⚠️ 等待畫面 {'/'.join(scenes)} 超時 ({timeout}s)")
+        return None
+
+    def wait_until_still(self, name, timeout=3.0, since=None):
+        """
+        [工具] 等畫面停止移動 (連續兩張新畫面幾乎一樣) 就回傳
+        小動畫不算在動 (變動的格子要超過 MOTION_THRESHOLD 的比例)
+        :param since: 這個時間點之後拍的畫面才算 (預設 = 現在，也就是手勢剛送完)
+        :return: 靜止的畫面 (Frame)；超時回傳最後看到的那張
+        """
+        last_seen = time.monotonic() if since is None else since
+        prev = None
+        with self.scheduler.begin(f"still:{name}", base=0.2, timeout=timeout) as wait:
+            while wait.elapsed < timeout:
+                frame, last_seen = self.next_screen(last_seen)
+                if frame is not None:
+                    if prev is not None and not self._moved(prev, frame):
+                        wait.done()
+                        return frame
+                    prev = frame
+                wait.sleep()
+        print(f"   ⚠️ 畫面 {timeout}s 內沒有靜止 ({name})")
+        return prev
+
+    @staticmethod
+    def _moved(before, after):
+        """ 兩張畫面之間有沒有捲動 (不知道就當作有) """
+        if before is None or after is None:
+            return True
+        return after.motion(before, config.SCREEN_DIFF_TOLERANCE) > config.MOTION_THRESHOLD
+
+    def _frame_before_gesture(self):
+        """ 手勢送出前的畫面 (背景已經有就直接用，不用再等一張) """
+        frame = self.frames.latest()
+        if frame is None:
+            frame, _ = self.next_screen()
+        return frame
+
+    def scroll_until_stable(self, pixels, name="scroll", timeout=3.0):
+        """
+        [技能] 捲動清單，畫面一靜止就回傳 (不再固定睡 3~5 秒)
+        :return: (靜止後的畫面, 有沒有捲動)；跟捲之前一樣 = 已經到底 (或到頂) 了
+        """
+        before = self._frame_before_gesture()
+        self.scroll_by(pixels)
+        after = self.wait_until_still(name, timeout)
+        return after, self._moved(before, after)
+
+    @traced()
+    def swipe_to_bottom(self, count=5, burst=2):
+        """
+        [工具] 往下撥動直到清單到底 (畫面撥了也不會動)
+        每輪把 burst 下撥動打包成一個批次送出 (一趟 adb)，再等畫面靜止 (有慣性)，靜止後的截圖才不會模糊
+        :param count: 最多撥幾次 (預設 5 次，通常夠滑到底了)
         """
         
-        for _ in range(count):
+        done = 0
+        while done < count:
             # (500, 900) -> (500, 200)
-            # 手指從下往上滑 = 畫面往下捲
-            # duration=150 = 快速撥動 (會有慣性)
+            # 手指從下往上滑 = 畫面往下捲 (快速撥動，會有慣性)
             self.state.check_stop()
-            self.adb.swipe(500, 900, 500, 200, duration=500)
-            
-            # ⚠️ 重要：短暫休息，避免指令連發導致失效
-            time.sleep(0.5) 
-        
-        # 滑完後，因為有慣性，畫面可能還在動
-        # 多等一下讓畫面完全靜止，這樣接下來的截圖才不會模糊
-        print("   🛑 等待畫面靜止...")
-        time.sleep(1.5)
+            before = self._frame_before_gesture()
+            n = min(burst, count - done)
+            script = InputScript()
+            for i in range(n):
+                # 撥動之間留一點間隔，避免指令連發導致失效 (最後一下不用等)
+                script.swipe(500, 900, 500, 200, duration=500, gap=0.3 if i < n - 1 else 0.0)
+            self.adb.run_script(script)
+            done += n
+
+            after = self.wait_until_still("swipe_settle", timeout=3.0)
+            if not self._moved(before, after):
+                print("   🛑 已經滑到底了")
+                break
+
+
+    def scroll_by(self, pixels, x=500, top=400):
+        """
+        [工具] 把清單往下捲 pixels 像素 (負數 = 往上)
+        用慢速拖曳 (每像素 1.25ms，至少 500ms)，幾乎沒有慣性，捲的距離才算得準
+        超過 MAX_DRAG 就拆成好幾次，一起打包成一個批次送出
+        """
+        script = InputScript()
+        remaining = int(pixels)
+        while remaining:
+            step = max(-self.MAX_DRAG, min(self.MAX_DRAG, remaining))
+            duration = max(500, int(abs(step) * 1.25))
+            if step > 0:
+                # 手指從下往上拖 = 畫面往下捲
+                script.swipe(x, top + step, x, top, duration=duration)
+            else:
+                script.swipe(x, top, x, top - step, duration=duration)
+            remaining -= step
 
+        self.adb.run_script(script)
+
+    @traced()
+    def find_in_list(self, list_name, target_img, max_pages=5, timeout=3, threshold=0.8, settle=3.0):
+        """
+        [技能] 在會捲動的清單裡找到目標並點下去
+        1. 捲動位置表有紀錄 -> 一次捲到上次找到的位置，確認一下就點
+        2. 沒紀錄 / 確認失敗 (版面改了) -> 捲回原位，一頁一頁往下掃，找到順便記下位置
+        :param list_name: 清單名稱 ("package" / "difficulty")，也是等待點名稱的前綴
+        :param settle: 每次捲動後最多等幾秒讓畫面靜止
+        :return: True (找到並點了) / False
+        """
+        offset = self.scroll_index.offset(list_name, target_img)
+        if offset is not None:
+            print(f"   🗺️ [{list_name}] {target_img} 上次在 {offset}px，直接捲過去")
+            if offset:
+                self.scroll_until_stable(offset, f"{list_name}_jump", settle)
+            if self.click_target(target_img, timeout=timeout, threshold=threshold):
+                METRICS.inc("ptcg_scroll_index_total", list=list_name, result="hit")
+                self.scroll_index.record(list_name, target_img, offset)
+                return True
+
+            print(f"   🗺️ [{list_name}] 位置表不準 (版面可能改了)，改回逐頁掃描")
+            METRICS.inc("ptcg_scroll_index_total", list=list_name, result="miss")
+            self.scroll_index.forget(list_name, target_img)
+            if offset:
+                self.scroll_until_stable(-offset, f"{list_name}_jump", settle)
+        else:
+            METRICS.inc("ptcg_scroll_index_total", list=list_name, result="unknown")
+
+        offset = 0
+        for _ in range(max_pages):
+            self.state.check_stop()
+            if self.click_target(target_img, timeout=timeout, threshold=threshold):
+                self.scroll_index.record(list_name, target_img, offset)
+                return True
+
+            # 沒找到，往下捲一頁 (畫面一靜止就繼續；捲不動代表到底了)
+            _, moved = self.scroll_until_stable(self.SCROLL_STEP, f"{list_name}_scroll", settle)
+            if not moved:
+                print(f"   🛑 [{list_name}] 清單已經到底，沒看到 {target_img}")
+                break
+            offset += self.SCROLL_STEP
+        return False
 
     def click_target(self, img_name, off_x=0, off_y=0, timeout=30, threshold=0.8):  #等待並點擊
         """
@@ -72,39 +257,46 @@ class GameOps:
         """
         self.state.check_stop()
 
+        with METRICS.timer("ptcg_op_seconds", op="click_target", template=img_name), \
+                span(f"click_target:{img_name}", "ops", timeout=timeout):
+            return self._click_target(img_name, off_x, off_y, timeout, threshold)
+
+    def _click_target(self, img_name, off_x, off_y, timeout, threshold):
         print(f"🔍 尋找目標 {img_name}...")
         
-        start_time = time.time() # 紀錄開始時間
+        last_seen = time.monotonic()
 
-        while True:
-            # 1. 截圖
-            screen = self.adb.get_screenshot()
-            
-            if screen is not None:
-                # 2. 找圖
-                found, pos = self.finder.find_and_get_pos(screen, img_name, threshold=threshold)
+        with self.scheduler.begin(f"click:{img_name}", base=1.0, timeout=timeout) as wait:
+            while True:
+                # 1. 截圖 (拿一張比上次看過的還新的)
+                screen, last_seen = self.next_screen(last_seen)
                 
-                if found:
-                    cx, cy = pos
-                    final_x = cx + off_x
-                    final_y = cy + off_y
+                if screen is not None:
+                    # 2. 找圖
+                    found, pos = self.finder.find_and_get_pos(screen, img_name, threshold=threshold)
                     
-                    print(f"   ✅ 發現目標！")
-                    self.adb.tap(final_x, final_y)
-                    return True # 任務完成，跳出
-
-            # 3. 檢查是否超時
-            elapsed_time = time.time() - start_time
-            if elapsed_time > timeout:
-                # 時間到了還沒找到
-                if timeout > 0:
-                    print(f"   ⌛ 等待超時 ({timeout}s)，未發現 {img_name}")
-                return False
-
-            # 4. 還沒超時，休息一下再試 (避免 CPU 飆高)
-            time.sleep(1.0)
-
-
+                    if found:
+                        cx, cy = pos
+                        final_x = cx + off_x
+                        final_y = cy + off_y
+                        
+                        print(f"   ✅ 發現目標！")
+                        self.adb.tap(final_x, final_y)
+                        wait.done()
+                        return True # 任務完成，跳出
+
+                # 3. 檢查是否超時
+                if wait.elapsed > timeout:
+                    # 時間到了還沒找到
+                    if timeout > 0:
+                        print(f"   ⌛ 等待超時 ({timeout}s)，未發現 {img_name}")
+                    return False
+
+                # 4. 還沒超時，休息一下再試 (間隔由排程器決定)
+                wait.sleep()
+
+
+    @traced()
     def clear_settlement(self, confirm_img, finish_condition_img, max_retry=30, finish_CONFIDENCE = 0.8):
         """
         [智慧結算 2.0] 
@@ -124,76 +316,33 @@ class GameOps:
         # --- 階段二：開始執行點擊 (您的原始邏輯) ---
 
         print(f"   -> 瘋狂點擊確認")      
-        for i in range(max_retry):
+        last_seen = time.monotonic()
+        taps = 0
+        while taps < max_retry:
             self.state.check_stop()
-            screen = self.adb.get_screenshot()
-            
-            # 點擊確認    
-            if self.click_target(confirm_img, timeout=5):
-                time.sleep(1) # 點擊後稍微快一點
-            else:
-                time.sleep(1)
+            screen, last_seen = self.next_screen(last_seen)
 
             # 檢查結束條件
             is_finished, _ = self.finder.find_text_button(screen, finish_condition_img, threshold = finish_CONFIDENCE)
             if is_finished:             
                 return True
 
+            # 點擊確認：點一下畫面就可能換掉，所以不打包連點，每一下都先看過畫面
+            # 這張截圖就看得到按鈕就直接點，看不到就跟以前一樣等它出現再點
+            found, pos = self.finder.find_and_get_pos(screen, confirm_img, threshold=0.8)
+            if found:
+                self.adb.tap(*pos)
+            else:
+                self.click_target(confirm_img, timeout=5)
+            self.scheduler.pause("settlement_tap", 1.0)
+            taps += 1
+
 
         print("⚠️ 警告：超過點擊次數上限，仍未回到首頁")
         return False
     
 
-    def wait_for_battle_result(self, win_img, lose_img, draw_img, timeout=1200, win_CONFIDENCE = config.CONFIDENCE):
-        """
-        [智慧戰鬥監測]
-        持續檢查畫面，直到出現結果。
-        - 看到 WIN -> 點擊它 -> 回傳 "win"
-        - 看到 LOSE -> 不動作 -> 回傳 "lose"
-        """
-        print(f"⚔️ 戰鬥監測中")
-        time.sleep(10)
-        start_time = time.time()
-        
-        while (elapsed := time.time() - start_time) < timeout:
-            self.state.check_stop()
-
-            print(f"     已等待{elapsed:.1f}秒", end = "\r", flush=True)
-            screen = self.adb.get_screenshot()
-            if screen is None: continue
-            
-            # --- 情況 A: 贏了 (Win) ---
-            is_win = False
-
-            with contextlib.redirect_stdout(io.StringIO()): 
-                is_win = self.click_target(img_name = win_img, timeout = 5, threshold = win_CONFIDENCE)
-
-            if is_win: # 關鍵動作：贏了就點下去！
-                print(f"🎉 偵測到勝利 ({win_img})！")                                
-                time.sleep(1.0) # 點完稍微等一下，確保遊戲接收到
-                
-                return "win"
-
-            # --- 情況 B: 輸了 (Lose) ---
-            is_lose, _ = self.finder.find_and_get_pos(screen, lose_img)
-            is_draw, _ = self.finder.find_and_get_pos(screen, draw_img)
-
-
-            if is_lose or is_draw:
-                print(f"💀 偵測到失敗 ({lose_img}) -> 僅記錄，不點擊")
-                
-                # 關鍵動作：輸了不點擊，直接回傳
-                return "lose"
-            
-
-            
-            # 都沒看到，休息一下再看
-            time.sleep(10.0)
-            
-        print("⚠️ 戰鬥監測超時")
-        return None
-    
-
+    @traced()
     def wait_for_image(self, target_img, timeout=30):
         """
         [工具] 單純等待某張圖片出現 (不做任何點擊)
@@ -201,68 +350,100 @@ class GameOps:
         :return: True (有等到) / False (超時沒等到)
         """
         print(f"   ⏳ [Ops] 等待圖片出現: {target_img} ...")
-        start_time = time.time()
+        last_seen = time.monotonic()
         
-        while time.time() - start_time < timeout:
-            # 1. 檢查緊急停止
-            self.state.check_stop()
-            
-            # 2. 截圖並找圖
-            screen = self.adb.get_screenshot()
-            found, _ = self.finder.find_and_get_pos(screen, target_img)
-            
-            if found:
-                print(f"   ✅ 看到 {target_img} 了！")
-                return True
-            
-            # 3. 稍微睡一下再檢查
-            time.sleep(0.5)
+        with self.scheduler.begin(f"wait:{target_img}", base=0.5, timeout=timeout) as wait:
+            while wait.elapsed < timeout:
+                # 1. 檢查緊急停止
+                self.state.check_stop()
+                
+                # 2. 截圖並找圖
+                screen, last_seen = self.next_screen(last_seen)
+                found, _ = self.finder.find_and_get_pos(screen, target_img)
+                
+                if found:
+                    wait.done()
+                    print(f"   ✅ 看到 {target_img} 了！")
+                    return True
+                
+                # 3. 稍微睡一下再檢查
+                wait.sleep()
             
         print(f"   ⚠️ 等待 {target_img} 超時 ({timeout}s)")
         return False
 
 
-    def navigate_back_to_lobby(self):
-        """ [技能] 從標題畫面一路點回大廳 (包含特殊事件等待) """
+    @traced()
+    def navigate_back_to_lobby(self, timeout=300):
+        """
+        [技能] 從目前的畫面一路點回難度列表 (包含特殊事件等待)
+        先判斷在哪個場景再決定怎麼走，不用每次都從標題畫面開始
+        :return: True (確認已在難度列表) / False (回不去，要重開)
+        """
         try:
-            print("      👆 [Ops] 正在嘗試從標題畫面回到大廳...")
-            
-            # 1. 檢查標題畫面
-            if not self.click_target("title_screen.png", timeout=300):
-                print("      ❌ 未偵測到標題畫面")
-                return False
-
-            # 2. 點擊進入
-            
-            time.sleep(5.0)
-
-            # === 🔥 新增：處理「只能等待」的特殊事件 ===
-            # 設定一個檢查迴圈，假設最多等 2 分鐘 (120秒)
-            wait_limit = 120 
-            start_wait = time.time()
-
-
-            
-            while time.time() - start_wait < wait_limit: #找大廳
-                print("正在尋找大廳...")
-                screenshot = self.adb.get_screenshot()
-
-                has_lobby, lobby_pos = self.finder.find_text_button(screenshot, "battle_1.png")
-
-                # === 情境：什麼問題都沒有 直接進戰鬥流程 ===
-                if has_lobby:
-                    self.adb.tap(*lobby_pos)
-                    if self.click_target("battle_2.png", timeout = 5):
-                        time.sleep(1)
-                        self.click_target("battle_3.png", timeout = 5)
-                        return True
-                     
-                # === 情境：特殊事件 ===
-                if self.handle_critical_events(screenshot):
-                    continue                
-                
-                
-            print("      ❌ 等待超時：無法回到大廳")
+            print("      👆 [Ops] 正在嘗試回到大廳...")
+            last_seen = time.monotonic()
+
+            with self.scheduler.begin("navigate", base=2.0, timeout=timeout) as wait:
+                while wait.elapsed < timeout:
+                    self.state.check_stop()
+                    screen, last_seen = self.next_screen(last_seen)
+                    guess = self.scenes.classify(screen)
+                    scene = guess.scene
+
+                    if scene == "difficulty_list":
+                        if self.on_difficulty_list(screen):
+                            wait.done()
+                            return True
+                        # 看起來像難度列表但確認不了 (多半還在關卡畫面)：當成關卡畫面往回退
+                        print(f"      ⚠️ 判斷是難度列表 ({guess})，但確認不了，當成關卡畫面")
+                        scene = "stage"
+
+                    if scene == "error_dialog":
+                        self.handle_critical_events(screen)
+                        continue
+
+                    if scene in ("stage", "package_select", "package_list"):
+                        # 關卡 / 卡包畫面：按返回一路退回難度列表
+                        print(f"      ↩️ 目前在 {scene}，按返回")
+                        if not self.click_target("back.png", timeout=3):
+                            self.adb.key_back()
+                        self.scheduler.pause("navigate_back", 2.0)
+                        continue
+
+                    # 下面兩種點進去之後都回到迴圈開頭，用點完之後的新畫面確認真的到了難度列表才算數
+                    if scene == "battle_menu":
+                        if guess.template != "battle_3.png":
+                            self.adb.tap(*guess.pos)
+                            self.scheduler.pause("battle_2_tap", 1.0)
+                        self.click_target("battle_3.png", timeout=5)
+                        self.scheduler.pause("battle_3_tap", 1.0)
+                        last_seen = time.monotonic()
+                        continue
+
+                    if scene in ("title", "lobby"):
+                        if scene == "title":
+                            self.adb.tap(*guess.pos)
+                            self.scheduler.pause("title_tap", 5.0)
+
+                        # === 🔥 處理「只能等待」的特殊事件 ===
+                        # 同時盯「大廳按鈕」與「特殊事件」，誰先出現就處理誰，最多等 2 分鐘 (120秒)
+                        if not asyncio.run(AsyncGameOps(self).enter_lobby(wait_limit=120)):
+                            print("      ❌ 等待超時：無法回到大廳")
+                            return False
+                        self.scheduler.pause("battle_3_tap", 1.0)
+                        last_seen = time.monotonic()
+                        continue
+
+                    if scene in ("battle", "result", "settlement"):
+                        # 戰鬥中 / 結算中沒有捷徑可以回去，交給上層重開
+                        print(f"      ❌ 目前在 {scene}，無法直接回大廳")
+                        return False
+
+                    # unknown / blocking (載入中、只能等待的事件)：等一下再看
+                    wait.sleep()
+
+            print("      ❌ 未偵測到可以回大廳的畫面")
             return False
 
         except Exception as e:
@@ -270,24 +451,15 @@ class GameOps:
             return False
 
 
+    @traced()
     def handle_critical_events(self, screenshot) -> bool:
+        # 所有觸發圖在同一張截圖上一次比對完
+        hits = self.finder.find_many(screenshot, {e.trigger_img: 0.5 for e in self.CRITICAL_EVENTS})
+        triggered = {hit.name for hit in hits}
         for event in self.CRITICAL_EVENTS:
-            happen_error,_ = self.finder.find_and_get_pos(screenshot, event.trigger_img, threshold=0.5)
-            if happen_error:
+            if event.trigger_img in triggered:
                 print(f"⚠️ 偵測到{event.desc}")
                 self.click_target(event.action_img)
-                time.sleep(2)
+                self.scheduler.pause("critical_event", 2.0)
                 return True
         return False
-
-
-
-
-
-
-
-
-
-
-
-
@@ -1,10 +1,143 @@
 import cv2
 import numpy as np
+from dataclasses import dataclass
+from typing import Tuple
 from . import config
+from .template_store import TemplateStore
+from .roi_manifest import RoiManifest
+from .screen_cache import ScreenChangeCache
+from .frame import Frame
+from .metrics import METRICS
+from .tracing import span
+
+@dataclass
+class MatchResult:
+    name: str
+    score: float
+    pos: Tuple[int, int]
 
 class ImageFinder:
-    def __init__(self):
-        pass
+    def __init__(self, store: TemplateStore = None, manifest: RoiManifest = None):
+        # 模板倉庫：素材只讀一次，之後都從記憶體拿
+        self.store = store if store is not None else TemplateStore()
+        if store is None and config.TEMPLATE_PRELOAD:
+            self.store.preload()
+        # 搜尋範圍表：固定位置的按鈕只搜那一塊
+        self.manifest = manifest if manifest is not None else RoiManifest()
+        # 畫面指紋：搜尋範圍內沒變化就沿用上次的比對結果
+        self.change_cache = ScreenChangeCache() if config.SCREEN_CACHE else None
+        # 直接丟 ndarray 進來時，同一張截圖沿用同一個 Frame (前處理只做一次)
+        self._last_frame = None
+
+    def frame(self, screen):
+        """ 把截圖包成 Frame；連續用同一個 ndarray 呼叫會拿到同一個 Frame """
+        if screen is None or isinstance(screen, Frame):
+            return screen
+        last = self._last_frame
+        if last is not None and last.image is screen:
+            return last
+        frame = Frame(screen)
+        self._last_frame = frame
+        return frame
+
+    def _match_full(self, haystack, template):
+        """ 全畫面比對，回傳 (最高分, 左上角) """
+        if template.shape[0] > haystack.shape[0] or template.shape[1] > haystack.shape[1]:
+            return -1.0, None
+        result = cv2.matchTemplate(haystack, template, cv2.TM_CCOEFF_NORMED)
+        _, max_val, _, max_loc = cv2.minMaxLoc(result)
+        return float(max_val), max_loc
+
+    def _match_pyramid(self, haystack, template, name, kind, scale, threshold, frame=None):
+        """
+        [金字塔比對] 先在縮小的畫面上找候選位置，再只在候選附近用原解析度細修
+        回傳格式跟 _match_full 一樣
+        :param frame: haystack 是整張畫面時傳入，縮小圖直接跟 Frame 拿 (同一張只縮一次)
+        """
+        small_t = self.store.get_scaled(name, kind, scale)
+        if small_t is None or min(small_t.shape[:2]) < 8:
+            return self._match_full(haystack, template)  # 模板縮太小會失真，直接全解析度
+
+        if frame is not None:
+            small_h = frame.scaled(scale, kind)
+        else:
+            small_h = cv2.resize(haystack, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        if small_t.shape[0] > small_h.shape[0] or small_t.shape[1] > small_h.shape[1]:
+            return self._match_full(haystack, template)
+
+        coarse = cv2.matchTemplate(small_h, small_t, cv2.TM_CCOEFF_NORMED)
+
+        th, tw = template.shape[:2]
+        pad = int(round(2 / scale)) + 2
+        best_val, best_loc = -1.0, None
+        for _ in range(3):  # 最多細修 3 個候選
+            _, val, _, loc = cv2.minMaxLoc(coarse)
+            if val < threshold - 0.2:  # 縮小圖分數會偏低，留一點空間
+                break
+
+            # 候選位置換回原解析度，四周多留 pad 像素再比一次
+            cx, cy = int(loc[0] / scale), int(loc[1] / scale)
+            x0, y0 = max(0, cx - pad), max(0, cy - pad)
+            x1 = min(haystack.shape[1], cx + tw + pad)
+            y1 = min(haystack.shape[0], cy + th + pad)
+            val, fine_loc = self._match_full(haystack[y0:y1, x0:x1], template)
+            if fine_loc is not None and val > best_val:
+                best_val, best_loc = val, (fine_loc[0] + x0, fine_loc[1] + y0)
+            if best_val >= threshold:
+                break
+
+            # 把這個候選附近塗掉，找下一個
+            sx0, sy0 = max(0, loc[0] - small_t.shape[1] // 2), max(0, loc[1] - small_t.shape[0] // 2)
+            coarse[sy0:loc[1] + small_t.shape[0] // 2 + 1, sx0:loc[0] + small_t.shape[1] // 2 + 1] = -1.0
+
+        return best_val, best_loc
+
+    def _match(self, haystack, template, name, kind, threshold, frame=None):
+        """ 依照 templates.json 的 "match" 設定 (或全域 MATCH_MODE) 選比對方式 """
+        opts = self.manifest.options(name)
+        if opts.get("match", config.MATCH_MODE) == "pyramid":
+            scale = float(opts.get("scale", config.PYRAMID_SCALE))
+            return self._match_pyramid(haystack, template, name, kind, scale, threshold, frame)
+        return self._match_full(haystack, template)
+
+    def _locate(self, frame, template, name, threshold, kind="bgr"):
+        """
+        [核心比對] 畫面沒變就沿用上次結果；否則先搜 ROI，沒中再搜全畫面
+        :param kind: 要比 Frame 的哪個版本 ("bgr" 原圖 / "bin" 二值化)
+        :return: (是否命中, 分數, 左上角)
+        """
+        haystack = frame.view(kind)
+        key = (name, kind, threshold)
+        if self.change_cache is not None:
+            cached = self.change_cache.lookup(key, haystack, frame)
+            if cached is not None:
+                METRICS.inc("ptcg_match_cache_hits_total", template=name)
+                return cached
+
+        with METRICS.timer("ptcg_match_seconds", template=name, kind=kind), \
+                span(f"match:{name}", "match", kind=kind) as sp:
+            result, searched = self._search(frame, haystack, template, name, threshold, kind)
+            sp.set(found=result[0])
+        if result[0]:
+            METRICS.inc("ptcg_match_hits_total", template=name)
+        if self.change_cache is not None:
+            self.change_cache.store(key, haystack, searched, result, frame)
+        return result
+
+    def _search(self, frame, haystack, template, name, threshold, kind):
+        """ :return: ((是否命中, 分數, 左上角), 實際搜尋的範圍 (None = 全畫面)) """
+        roi = self.manifest.rect(name, haystack.shape)
+        if roi is not None:
+            x0, y0, x1, y1 = roi
+            score, loc = self._match(haystack[y0:y1, x0:x1], template, name, kind, threshold)
+            if loc is not None and score >= threshold:
+                return (True, score, (loc[0] + x0, loc[1] + y0)), roi
+
+        score, loc = self._match(haystack, template, name, kind, threshold, frame)
+        if loc is not None and score >= threshold:
+            self.manifest.record_hit(name, loc, template.shape[:2], haystack.shape, score)
+            return (True, score, loc), None
+        return (False, score, loc), None
 
     def cv2_imread_safe(self, file_path):
         """ 
@@ -24,12 +157,13 @@ class ImageFinder:
     def find_and_get_pos(self, screen, template_name, threshold=config.CONFIDENCE):
         """ 
         主要找圖邏輯，包含完整的防呆機制 
+        :param screen: Frame (FrameBus 給的) 或截圖 ndarray
         """
         # 1. 組合完整路徑
         template_path = config.ASSETS_DIR / template_name
         
-        # 2. 呼叫上面的安全讀取法 (這行原本報錯，因為找不到上面的函式)
-        template = self.cv2_imread_safe(template_path)
+        # 2. 從模板倉庫拿 (已解碼的 BGR，不再每次讀檔)
+        template = self.store.get_bgr(template_name)
         
         # 3. 防呆檢查：圖片讀取失敗
         if template is None:
@@ -47,11 +181,10 @@ class ImageFinder:
             # print(f"⚠️ [Warning] 圖片比螢幕大: {template_name}")
             return False, None
 
-        # 6. 開始匹配
-        result = cv2.matchTemplate(screen, template, cv2.TM_CCOEFF_NORMED)
-        min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(result)
+        # 6. 開始匹配 (先搜 ROI，沒中再搜全畫面)
+        found, max_val, max_loc = self._locate(self.frame(screen), template, template_name, threshold)
         
-        if max_val >= threshold:
+        if found:
             h, w = template.shape[:2]
             center_x = max_loc[0] + w // 2
             center_y = max_loc[1] + h // 2
@@ -64,36 +197,68 @@ class ImageFinder:
         [專門找文字] 使用二值化 (Binarization) 處理
         這能有效解決「字體顏色太淡」或「背景半透明」的問題
         """
-        # 1. 讀取模板 (強制轉灰階)
-        template_path = config.ASSETS_DIR / template_name
-        if not template_path.exists():
+        # 1. 讀取模板 (灰階 + 二值化都已在倉庫裡算好)
+        template_bin = self.store.get_binary(template_name, 180)
+        if template_bin is None:
             print(f"❌ 找不到模板: {template_name}")
             return False, None
-            
-        template = cv2.imread(str(template_path), cv2.IMREAD_GRAYSCALE)
         
-        # 2. 將螢幕截圖也轉灰階
-        screen_gray = cv2.cvtColor(screen, cv2.COLOR_BGR2GRAY)
+        if screen is None:
+            print("❌ [Error] 螢幕截圖失敗 (Screen is None)，請檢查 ADB 連線")
+            return False, None
 
         # === 🔥 關鍵魔法：二值化處理 ===
-        # 設定一個切分點 (例如 180)，低於這個亮度(字體)變 255(白)，高於這個亮度(背景)變 0(黑)
+        # 設定一個切分點 (180)，低於這個亮度(字體)變 255(白)，高於這個亮度(背景)變 0(黑)
         # THRESH_BINARY_INV 代表「反向」，讓深色字體變亮，淺色背景變暗
-        _, screen_bin = cv2.threshold(screen_gray, 180, 255, cv2.THRESH_BINARY_INV)
-        _, template_bin = cv2.threshold(template, 180, 255, cv2.THRESH_BINARY_INV)
+        # 灰階 / 二值化都由 Frame 算，同一張截圖只算一次
+        frame = self.frame(screen)
 
         # (Debug用) 如果您想看處理完長怎樣，可以把這行打開存下來看
-        # cv2.imwrite(f"debug_bin_{template_name}", screen_bin)
+        # cv2.imwrite(f"debug_bin_{template_name}", frame.binary(180))
 
-        # 3. 進行匹配
-        result = cv2.matchTemplate(screen_bin, template_bin, cv2.TM_CCOEFF_NORMED)
-        min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(result)
+        # 3. 進行匹配 (先搜 ROI，沒中再搜全畫面)
+        found, max_val, max_loc = self._locate(frame, template_bin, template_name, threshold, kind="bin")
 
-        if max_val >= threshold:
+        if found:
             # 計算中心點
-            h, w = template.shape
+            h, w = template_bin.shape
             center_x = max_loc[0] + w // 2
             center_y = max_loc[1] + h // 2
             print(f"   🔍 [TextMode] 找到 {template_name} (信心度: {max_val:.2f})")
             return True, (center_x, center_y)
         else:
-            return False, None
\ No newline at end of file
+            return False, None
+
+    def find_many(self, screen, targets, text_mode=False):
+        """
+        [一次找多張] 同一張截圖上一次比對多個模板
+        :param targets: {"win.png": 0.4, "lose.png": 0.6} 或單純的檔名清單 (用預設門檻)
+        :param text_mode: True = 跟 find_text_button 一樣用二值化比對
+        :return: 有命中的 MatchResult 清單 (分數高的在前面)
+        """
+        if screen is None:
+            print("❌ [Error] 螢幕截圖失敗 (Screen is None)，請檢查 ADB 連線")
+            return []
+
+        if not isinstance(targets, dict):
+            default = 0.7 if text_mode else config.CONFIDENCE
+            targets = {name: default for name in targets}
+
+        # 截圖的前處理只做一次，所有模板共用 (由 Frame 負責)
+        frame = self.frame(screen)
+        kind = "bin" if text_mode else "bgr"
+
+        hits = []
+        for name, threshold in targets.items():
+            template = self.store.get_binary(name, 180) if text_mode else self.store.get_bgr(name)
+            if template is None:
+                print(f"❌ 找不到模板: {name}")
+                continue
+
+            found, max_val, max_loc = self._locate(frame, template, name, threshold, kind=kind)
+            if found:
+                h, w = template.shape[:2]
+                hits.append(MatchResult(name, float(max_val), (max_loc[0] + w // 2, max_loc[1] + h // 2)))
+
+        hits.sort(key=lambda m: m.score, reverse=True)
+        return hits
@@ -0,0 +1,113 @@
+# core/input_script.py
+import random
+from dataclasses import dataclass
+from typing import List
+
+# 每個動作前後各印一行 "@T 第幾個 b/e 開機秒數"，回來的輸出用它算每個動作實際花多久
+MARK = "@T"
+UPTIME = "$(cat /proc/uptime)"
+
+
+def tap_command(x, y, max_offset=5):
+    """ 點擊 = 一個很短的 swipe (位置加一點隨機偏移，比較像真人) """
+    dx = random.randint(-max_offset, max_offset)
+    dy = random.randint(-max_offset, max_offset)
+    return f"input swipe {x} {y} {x + dx} {y + dy} {10}"
+
+
+@dataclass
+class InputEvent:
+    kind: str           # "tap" / "swipe" / "key" / "wait"
+    command: str        # 裝置端指令 ("" = 只等待)
+    duration: float     # 動作本身預計花幾秒
+    gap: float = 0.0    # 做完之後再等幾秒 (在裝置端 sleep，不佔 Python 這邊的時間)
+
+
+@dataclass
+class EventTiming:
+    """ 一個動作實際的執行時間 (裝置端量的，相對於第一個動作開始) """
+    index: int
+    kind: str
+    start: float
+    duration: float
+    planned: float      # 照 duration / gap 算出來「應該」幾秒開始
+
+    @property
+    def lag(self):
+        """ 比預計晚了幾秒 (裝置太忙 / input 指令啟動慢) """
+        return self.start - self.planned
+
+
+class InputScript:
+    """
+    [批次輸入] 把一串手勢組成一個裝置端 shell 腳本，AdbController.run_script 一次送出
+    - 整串只跑一趟 adb 來回，動作之間的間隔在裝置端 sleep，不用 Python 這邊一下一下等
+    - 每個動作前後都會記下裝置開機秒數 (/proc/uptime，精度 10ms)，回傳實際執行時間
+    用法:
+        script = InputScript().swipe(500, 900, 500, 200, 500, gap=0.3).tap(450, 1450, gap=1.0)
+        timings = adb.run_script(script)
+    """
+
+    def __init__(self):
+        self.events: List[InputEvent] = []
+
+    def tap(self, x, y, gap=0.0, max_offset=5):
+        self.events.append(InputEvent("tap", tap_command(x, y, max_offset), 0.01, gap))
+        return self
+
+    def swipe(self, sx, sy, ex, ey, duration=300, gap=0.0):
+        self.events.append(InputEvent("swipe", f"input swipe {sx} {sy} {ex} {ey} {duration}",
+                                      duration / 1000, gap))
+        return self
+
+    def key(self, code, gap=0.0):
+        self.events.append(InputEvent("key", f"input keyevent {code}", 0.0, gap))
+        return self
+
+    def wait(self, seconds):
+        self.events.append(InputEvent("wait", "", 0.0, seconds))
+        return self
+
+    def __len__(self):
+        return len(self.events)
+
+    def expected_seconds(self, time_scale=1.0):
+        """ 整串預計要跑多久 (不含 input 指令本身的啟動時間) """
+        return sum(e.duration + e.gap * time_scale for e in self.events)
+
+    def render(self, time_scale=1.0):
+        """ 組成一行裝置端腳本 (間隔乘上 time_scale，跟 PollScheduler.pause 一樣) """
+        parts = []
+        for i, event in enumerate(self.events):
+            if event.command:
+                parts.append(f"echo {MARK} {i} b {UPTIME}")
+                parts.append(event.command)
+                parts.append(f"echo {MARK} {i} e {UPTIME}")
+            if event.gap > 0:
+                parts.append(f"sleep {event.gap * time_scale:.3f}")
+        return "; ".join(parts)
+
+    def parse(self, output, time_scale=1.0) -> List[EventTiming]:
+        """ 從腳本輸出算出每個動作的實際開始時間與耗時 (讀不懂的行就略過) """
+        marks = {}
+        for line in output.splitlines():
+            fields = line.split()
+            if len(fields) < 4 or fields[0] != MARK:
+                continue
+            try:
+                marks[(int(fields[1]), fields[2])] = float(fields[3])
+            except ValueError:
+                continue
+
+        timings = []
+        origin = planned_origin = None  # 都以第一個有量到的動作為 0
+        planned = 0.0
+        for i, event in enumerate(self.events):
+            begin, end = marks.get((i, "b")), marks.get((i, "e"))
+            if begin is not None and end is not None:
+                if origin is None:
+                    origin, planned_origin = begin, planned
+                timings.append(EventTiming(i, event.kind, round(begin - origin, 3),
+                                           round(end - begin, 3), round(planned - planned_origin, 3)))
+            planned += event.duration + event.gap * time_scale
+        return timings
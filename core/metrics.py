@@ -0,0 +1,228 @@
+# core/metrics.py
+import bisect
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from . import config
+
+
+# 延遲分桶 (秒)：從一次 matchTemplate (~ms) 到一整包 (~20 分)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1200, 1800)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # 最後一格 = +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class _Timer:
+    """ with METRICS.timer("name", op="x"): ...  離開時把耗時記進直方圖 """
+    __slots__ = ("registry", "name", "labels", "start")
+
+    def __init__(self, registry, name, labels):
+        self.registry = registry
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.registry.observe(self.name, time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+class MetricsRegistry:
+    """
+    [統計] 計數器 + 延遲直方圖，依名稱與標籤 (op / template / site ...) 分開
+    全部存在記憶體，由 MetricsExporter 輸出成 Prometheus 文字格式
+    """
+
+    def __init__(self):
+        self.const_labels = {}
+        self._counters = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    def inc(self, name, value=1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = Histogram()
+            hist.observe(seconds)
+
+    def timer(self, name, **labels):
+        return _Timer(self, name, labels)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    # --- 查詢 ---
+    def value(self, name, **labels):
+        """ 計數器目前的值 (沒有就是 0) """
+        with self._lock:
+            return self._counters.get(self._key(name, labels), 0)
+
+    def top(self, name, n=10, by=None):
+        """
+        某個直方圖依「總耗時」排序的前 n 名 -> [(標籤 dict, 總秒數, 次數), ...]
+        :param by: 只看這個標籤 (例如 "site")，其他標籤不同的列會加總成一列
+        """
+        with self._lock:
+            rows = [(dict(labels), h.sum, h.count) for (hname, labels), h in self._histograms.items() if hname == name]
+        if by is not None:
+            merged = {}
+            for labels, total, count in rows:
+                key = labels.get(by)
+                old_total, old_count = merged.get(key, (0.0, 0))
+                merged[key] = (old_total + total, old_count + count)
+            rows = [({by: key}, total, count) for key, (total, count) in merged.items()]
+        rows.sort(key=lambda r: r[1], reverse=True)
+        return rows[:n]
+
+    # --- 輸出 ---
+    def _fmt_labels(self, labels, extra=()):
+        items = list(self.const_labels.items()) + list(labels) + list(extra)
+        if not items:
+            return ""
+        body = ",".join(f'{k}="{_escape(v)}"' for k, v in items)
+        return "{" + body + "}"
+
+    def render(self):
+        """ Prometheus text exposition format (0.0.4) """
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(self._histograms.items(), key=lambda kv: kv[0])
+            histograms = [(k, (list(h.counts), h.sum, h.count, h.buckets)) for k, h in histograms]
+
+        lines = []
+        last = None
+        for (name, labels), value in counters:
+            if name != last:
+                lines.append(f"# TYPE {name} counter")
+                last = name
+            lines.append(f"{name}{self._fmt_labels(labels)} {value}")
+
+        last = None
+        for (name, labels), (counts, total, count, buckets) in histograms:
+            if name != last:
+                lines.append(f"# TYPE {name} histogram")
+                last = name
+            cumulative = 0
+            for bound, c in zip(list(buckets) + ["+Inf"], counts):
+                cumulative += c
+                lines.append(f"{name}_bucket{self._fmt_labels(labels, [('le', bound)])} {cumulative}")
+            lines.append(f"{name}_sum{self._fmt_labels(labels)} {total:.6f}")
+            lines.append(f"{name}_count{self._fmt_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+# 整個行程共用一份 (多開時每個子行程各自一份)
+METRICS = MetricsRegistry()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = self.server.registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # 不要每次被抓資料就印一行
+
+
+class MetricsExporter:
+    """
+    [統計輸出]
+    - port > 0 : 開一個本機 HTTP 端點 (http://127.0.0.1:port/metrics)
+    - path     : 每 interval 秒把內容寫進檔案 (先寫暫存檔再改名，不會讀到寫一半的)
+    兩個都沒設就什麼都不做
+    """
+
+    def __init__(self, registry=METRICS, port=None, path=None, interval=None):
+        self.registry = registry
+        self.port = config.METRICS_PORT if port is None else port
+        path = config.METRICS_FILE if path is None else path
+        self.path = Path(path) if path else None
+        self.interval = config.METRICS_INTERVAL if interval is None else interval
+        self._server = None
+        self._stop = threading.Event()
+        self._flusher = None
+
+    @property
+    def enabled(self):
+        return bool(self.port) or self.path is not None
+
+    def start(self):
+        if self.port:
+            try:
+                self._server = ThreadingHTTPServer(("127.0.0.1", self.port), _MetricsHandler)
+                self._server.registry = self.registry
+                self._server.daemon_threads = True
+                threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True).start()
+                print(f"📈 [Metrics] http://127.0.0.1:{self.port}/metrics")
+            except OSError as e:
+                print(f"⚠️ [Metrics] 無法開啟 port {self.port}: {e}")
+                self._server = None
+        if self.path is not None:
+            self._flusher = threading.Thread(target=self._flush_loop, name="metrics-flush", daemon=True)
+            self._flusher.start()
+            print(f"📈 [Metrics] 每 {self.interval:.0f} 秒寫入 {self.path}")
+        return self
+
+    def flush(self):
+        if self.path is None:
+            return
+        try:
+            tmp = self.path.with_name(self.path.name + ".tmp")
+            tmp.write_text(self.registry.render(), encoding="utf-8")
+            os.replace(tmp, self.path)
+        except Exception as e:
+            print(f"⚠️ [Metrics] 寫檔失敗: {e}")
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.interval):
+            self.flush()
+
+    def stop(self):
+        self._stop.set()
+        self.flush()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
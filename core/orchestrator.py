@@ -0,0 +1,187 @@
+# core/orchestrator.py
+import multiprocessing as mp
+import queue
+import time
+import traceback
+from collections import defaultdict
+from multiprocessing.managers import BaseManager
+from . import config
+from .work_queue import WorkQueue
+
+
+class QueueManager(BaseManager):
+    """ 讓所有子行程共用同一個 WorkQueue (存在主行程裡，子行程拿到的是 proxy) """
+
+
+QueueManager.register("WorkQueue", WorkQueue.open)
+
+
+class BootGate:
+    """
+    [開機名額] 所有子行程共用一個 Semaphore
+    拿到名額才能開機，開機完成後至少再等 stagger 秒才把名額還回去
+    """
+
+    def __init__(self, semaphore, stagger):
+        self.semaphore = semaphore
+        self.stagger = stagger
+        self._acquired_at = 0.0
+
+    def __enter__(self):
+        print("   🚦 [BootGate] 等待開機名額...")
+        self.semaphore.acquire()
+        self._acquired_at = time.time()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        remain = self.stagger - (time.time() - self._acquired_at)
+        if remain > 0:
+            time.sleep(remain)
+        self.semaphore.release()
+        return False
+
+
+def worker_main(instance, template_spec, boot_semaphore, events, work_queue=None):
+    """ [子行程] 一台裝置一個行程，跑完整的 GameBot.routine_main """
+    # 先套用這台裝置的設定，再 import 會讀 config 的模組
+    config.apply_instance(instance)
+
+    from .bot_logic import GameBot
+    from .image_finder import ImageFinder
+    from .template_store import TemplateStore
+
+    store = TemplateStore()
+    if template_spec:
+        store.attach_shared(template_spec)
+    finder = ImageFinder(store=store)
+
+    device = config.DEVICE_ID
+    events.put({"kind": "started", "device": device, "time": time.time()})
+    try:
+        bot = GameBot(finder=finder, events=events)
+        bot.adb.boot_gate = BootGate(boot_semaphore, config.BOOT_STAGGER)
+        bot.routine_main(work_queue=work_queue)
+        events.put({"kind": "finished", "device": device, "time": time.time()})
+    except KeyboardInterrupt:
+        events.put({"kind": "stopped", "device": device, "time": time.time()})
+    except Exception as e:
+        traceback.print_exc()
+        events.put({"kind": "crashed", "device": device, "time": time.time(), "error": str(e)})
+
+
+class Supervisor:
+    """
+    [多開主控台] 每台裝置開一個子行程 (吃滿多核心)
+    - 模板只在主行程讀一次，放進共享記憶體給所有子行程唯讀使用
+    - 開機排隊 (BootGate)，避免同時重開模擬器
+    - (難度, 包) 的工作放在共用佇列，誰有空誰領；某台掛掉，它手上的工作會還給別台
+    - 收集各台回報，定期印出總產能 (包/小時)
+    """
+
+    def __init__(self, instances, report_interval=300):
+        self.instances = instances
+        self.report_interval = report_interval
+        self.started_at = time.time()
+        self.done = defaultdict(int)
+        self.recoveries = defaultdict(int)
+        self.durations = defaultdict(list)
+        self.work_queue = None
+
+    def _share_templates(self):
+        from .template_store import TemplateStore
+
+        store = TemplateStore(max_bytes=float("inf"))
+        store.preload()
+        return store.export_shared()
+
+    def _handle(self, event):
+        device = event["device"]
+        kind = event["kind"]
+        if kind == "package_done":
+            self.done[device] += 1
+            self.durations[device].append(event.get("duration", 0.0))
+            print(f"📦 [{device}] 完成 難度{event['diff_index'] + 1} 第{event['package_n']}包 "
+                  f"({event.get('duration', 0.0) / 60:.1f} 分)")
+        elif kind == "recovery":
+            self.recoveries[device] += 1
+        elif kind in ("crashed", "finished", "stopped", "started"):
+            print(f"🛰️ [{device}] {kind} {event.get('error', '')}")
+            if kind in ("crashed", "stopped") and self.work_queue is not None:
+                self.work_queue.release_owner(str(device))
+
+    def print_summary(self):
+        hours = max((time.time() - self.started_at) / 3600, 1e-6)
+        total = sum(self.done.values())
+        print("\n📊 ========== 多開產能 ==========")
+        for inst in self.instances:
+            device = inst.get("device_ID")
+            n = self.done[device]
+            avg = sum(self.durations[device]) / n / 60 if n else 0.0
+            print(f"   {device}: {n} 包 | {n / hours:.2f} 包/小時 | 平均 {avg:.1f} 分/包 | 救援 {self.recoveries[device]} 次")
+        print(f"   合計: {total} 包 | {total / hours:.2f} 包/小時 ({len(self.instances)} 台)")
+        if self.work_queue is not None:
+            try:
+                print(f"   工作佇列: {self.work_queue.stats()}")
+            except Exception:
+                pass # 佇列管理行程已經關掉
+        print("==================================\n")
+
+    def run(self):
+        ctx = mp.get_context("spawn")  # Windows 只能 spawn，統一行為
+        spec, blocks = self._share_templates()
+        boot_semaphore = ctx.BoundedSemaphore(max(1, config.MAX_PARALLEL_BOOTS))
+        events = ctx.Queue()
+
+        manager = QueueManager(ctx=ctx)
+        manager.start()
+        self.work_queue = manager.WorkQueue(
+            config.PROGRESS_DB,
+            difficulty_count=len(config.DIFFICULTY_LIST),
+            total_packages=config.TOTAL_PACKAGES,
+            legacy_file=config.WORK_QUEUE_FILE,
+        )
+        print(f"📋 [Supervisor] 工作佇列: {self.work_queue.stats()}")
+
+        workers = []
+        try:
+            for inst in self.instances:
+                p = ctx.Process(target=worker_main, args=(inst, spec, boot_semaphore, events, self.work_queue),
+                                name=f"bot-{inst.get('device_ID')}")
+                p.start()
+                workers.append(p)
+                print(f"🚀 [Supervisor] 已啟動 {inst.get('device_ID')} (pid={p.pid})")
+                time.sleep(2.0)  # 錯開啟動，避免大家同時 preload / 連 ADB
+
+            last_report = time.time()
+            released = set()
+            while any(p.is_alive() for p in workers):
+                try:
+                    self._handle(events.get(timeout=1.0))
+                except queue.Empty:
+                    pass
+                # 行程直接死掉 (沒來得及回報) 也要把它的工作還回去
+                for p, inst in zip(workers, self.instances):
+                    if p.exitcode not in (0, None) and p.pid not in released:
+                        released.add(p.pid)
+                        self.work_queue.release_owner(str(inst.get("device_ID")))
+                if time.time() - last_report >= self.report_interval:
+                    self.print_summary()
+                    last_report = time.time()
+
+            # 收掉還沒處理的回報
+            while True:
+                try:
+                    self._handle(events.get_nowait())
+                except queue.Empty:
+                    break
+        finally:
+            for p in workers:
+                if p.is_alive():
+                    p.terminate()
+                p.join(timeout=5)
+            for shm in blocks:
+                shm.close()
+                shm.unlink()
+            self.print_summary()
+            self.work_queue = None
+            manager.shutdown()
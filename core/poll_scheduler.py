@@ -0,0 +1,186 @@
+# core/poll_scheduler.py
+import json
+import os
+import statistics
+import threading
+import time
+from collections import deque
+from . import config
+from .progress_store import resolve_path
+from .metrics import METRICS
+from .tracing import span
+
+
+class WaitHandle:
+    """
+    一次等待 (由 PollScheduler.begin 產生)
+    用法:
+        with scheduler.begin("click:win.png", base=1.0, timeout=timeout) as w:
+            while w.elapsed < timeout:
+                if 找到了:
+                    w.done()
+                    break
+                w.sleep()
+    有給 timeout 的話，最後一次只睡到期限為止，不會因為間隔拉長而睡過頭
+    """
+
+    def __init__(self, scheduler, name, base, timeout=None):
+        self.scheduler = scheduler
+        self.name = name
+        self.base = base
+        self.timeout = timeout
+        self.start = time.monotonic()
+        self.polls = 0
+        self.slept = 0.0
+        self.finished = False
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.start
+
+    @property
+    def remaining(self):
+        """ 離期限還有幾秒 (沒給 timeout 就是 None) """
+        return None if self.timeout is None else max(0.0, self.timeout - self.elapsed)
+
+    def next_interval(self):
+        return self.scheduler.interval_for(self.name, self.elapsed, self.base)
+
+    def sleep(self):
+        """ 睡到下一次該檢查的時間 (最多睡到期限) """
+        self.polls += 1
+        seconds = self.next_interval() * config.TIME_SCALE
+        if self.timeout is not None:
+            seconds = min(seconds, self.remaining)
+        self.slept += seconds
+        with span(f"poll:{self.name}", "sleep"):
+            time.sleep(seconds)
+
+    def done(self, success=True):
+        """ 等到了 (success=True 才會列入歷史，用來預測下次要等多久) """
+        if self.finished:
+            return
+        self.finished = True
+        self.scheduler.record(self, success)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.done(success=False)
+        return False
+
+
+class PollScheduler:
+    """
+    [自適應輪詢] 取代到處寫死的 time.sleep
+    - 記住每個等待點 (用名字區分) 過去實際等了多久
+    - 離預期時間還很遠 -> 睡久一點；接近預期時間 -> 密集檢查；超過預期 -> 慢慢放寬
+    - 整個行程的 CPU 使用率超過 cpu_budget 時，自動把間隔拉長
+    - trace=True 會印出每次等待的名稱、耗時與輪詢次數
+    """
+
+    HISTORY_SIZE = 30
+
+    def __init__(self, history_file=None, min_interval=0.2, max_interval=10.0,
+                 cpu_budget=None, trace=None):
+        self.history_file = resolve_path(history_file or config.WAIT_HISTORY_FILE)
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.cpu_budget = config.CPU_BUDGET if cpu_budget is None else cpu_budget
+        self.trace = config.WAIT_TRACE if trace is None else trace
+        self._history = {}
+        self._lock = threading.Lock()
+        self._cpu_mark = (time.monotonic(), time.process_time())
+        self._cpu_ratio = 0.0
+        self._load()
+
+    # --- 歷史紀錄 ---
+    def _load(self):
+        if not self.history_file.exists():
+            return
+        try:
+            data = json.loads(self.history_file.read_text(encoding="utf-8"))
+            for name, values in data.items():
+                self._history[name] = deque(values, maxlen=self.HISTORY_SIZE)
+        except Exception as e:
+            print(f"⚠️ 讀取等待紀錄失敗: {e} (忽略)")
+
+    def _save(self):
+        try:
+            data = {name: list(values) for name, values in self._history.items()}
+            tmp = self.history_file.with_name(self.history_file.name + ".tmp")
+            tmp.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+            os.replace(tmp, self.history_file)
+        except Exception as e:
+            print(f"⚠️ 儲存等待紀錄失敗: {e}")
+
+    def expected(self, name):
+        """ 這個等待點通常要等幾秒 (中位數)；沒有紀錄回傳 None """
+        values = self._history.get(name)
+        if not values:
+            return None
+        return statistics.median(values)
+
+    def record(self, handle, success):
+        duration = handle.elapsed
+        result = "hit" if success else "miss"
+        METRICS.observe("ptcg_wait_seconds", duration, site=handle.name, result=result)
+        METRICS.inc("ptcg_wait_polls_total", handle.polls, site=handle.name)
+        METRICS.inc("ptcg_wait_slept_seconds_total", handle.slept, site=handle.name)
+        with self._lock:
+            if success:
+                self._history.setdefault(handle.name, deque(maxlen=self.HISTORY_SIZE)).append(round(duration, 2))
+                self._save()
+        if self.trace:
+            exp = self.expected(handle.name)
+            exp_txt = f"{exp:.1f}s" if exp is not None else "--"
+            mark = "✅" if success else "⌛"
+            print(f"   ⏱️ [Wait] {mark} {handle.name}: {duration:.1f}s "
+                  f"(預期 {exp_txt}, 輪詢 {handle.polls} 次, 睡 {handle.slept:.1f}s)")
+
+    # --- CPU 預算 ---
+    def _cpu_factor(self):
+        """ CPU 用太兇時回傳 >1 的倍數，把間隔拉長 """
+        if not self.cpu_budget:
+            return 1.0
+        now_wall, now_cpu = time.monotonic(), time.process_time()
+        mark_wall, mark_cpu = self._cpu_mark
+        if now_wall - mark_wall >= 5.0:
+            # 每 5 秒更新一次 CPU 使用率 (單位: 一顆核心的幾成)
+            self._cpu_ratio = (now_cpu - mark_cpu) / (now_wall - mark_wall)
+            self._cpu_mark = (now_wall, now_cpu)
+        if self._cpu_ratio <= self.cpu_budget:
+            return 1.0
+        return self._cpu_ratio / self.cpu_budget
+
+    # --- 排程 ---
+    def interval_for(self, name, elapsed, base):
+        """ 根據歷史決定下一次要睡多久 """
+        exp = self.expected(name)
+        if exp is None or exp <= 0:
+            interval = base
+        elif elapsed < exp * 0.7:
+            # 離預期還早：睡到「預期時間的 7 成」的一半，最少 base
+            interval = max(base, (exp * 0.7 - elapsed) / 2)
+        elif elapsed < exp * 1.5:
+            # 接近預期：密集檢查
+            interval = max(self.min_interval, base / 2)
+        else:
+            # 比平常久很多：慢慢放寬
+            interval = base * (1 + (elapsed - exp * 1.5) / max(exp, 1.0))
+
+        interval *= self._cpu_factor()
+        return min(self.max_interval, max(self.min_interval, interval))
+
+    def begin(self, name, base=1.0, timeout=None):
+        """ :param timeout: 呼叫者最多等幾秒，sleep() 不會睡超過它 """
+        return WaitHandle(self, name, base, timeout)
+
+    def pause(self, name, seconds):
+        """ 固定時間的停頓 (動畫 / 系統反應時間)，統一從這裡睡才能被追蹤 """
+        with span(f"sleep:{name}", "sleep"):
+            time.sleep(seconds * config.TIME_SCALE)
+        METRICS.observe("ptcg_pause_seconds", seconds, site=name)
+        if self.trace:
+            print(f"   ⏱️ [Pause] {name}: {seconds:.1f}s")
@@ -0,0 +1,172 @@
+# core/progress_store.py
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from . import config
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS units (
+    diff_index    INTEGER NOT NULL,
+    package_n     INTEGER NOT NULL,
+    priority      INTEGER NOT NULL DEFAULT 0,
+    status        TEXT    NOT NULL DEFAULT 'pending',
+    attempts      INTEGER NOT NULL DEFAULT 0,
+    owner         TEXT,
+    lease_expires REAL    NOT NULL DEFAULT 0,
+    last_error    TEXT,
+    duration      REAL,
+    updated_at    REAL    NOT NULL DEFAULT 0,
+    PRIMARY KEY (diff_index, package_n)
+);
+CREATE TABLE IF NOT EXISTS journal (
+    id         INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts         REAL NOT NULL,
+    device     TEXT,
+    diff_index INTEGER,
+    package_n  INTEGER,
+    event      TEXT NOT NULL,
+    detail     TEXT
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+UNIT_FIELDS = ("diff_index", "package_n", "priority", "status", "attempts",
+               "owner", "lease_expires", "last_error", "duration")
+
+
+def resolve_path(path):
+    """ 相對路徑一律放在專案根目錄，不跟著啟動時的工作目錄跑 """
+    path = Path(path)
+    return path if path.is_absolute() else config.ROOT_DIR / path
+
+
+class ProgressStore:
+    """
+    [進度資料庫] SQLite (WAL 模式) 取代 bot_state.json
+    - units  : 每個 (難度, 包) 的狀態 / 嘗試次數 / 耗時
+    - journal: 只會往後加的事件紀錄 (領取、完成、失敗...)，出事時可以回頭查
+    - meta   : 其他零碎的鍵值 (例如每台裝置的最後進度)
+    每次寫入都是一個交易，寫到一半當機也不會壞檔；多個行程同時寫也沒問題 (WAL + busy timeout)
+    """
+
+    def __init__(self, path=None, timeout=30.0):
+        self.path = resolve_path(path or config.PROGRESS_DB)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(str(self.path), timeout=timeout,
+                                     isolation_level=None, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._conn.execute(f"PRAGMA busy_timeout={int(timeout * 1000)}")
+        self._conn.executescript(SCHEMA)
+
+    def _tx(self):
+        return _Transaction(self._conn, self._lock)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # --- 工作單位 ---
+    def load_units(self):
+        """ :return: [dict, ...] 依 (難度, 包) 排序 """
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(UNIT_FIELDS)} FROM units ORDER BY diff_index, package_n").fetchall()
+        return [dict(row) for row in rows]
+
+    def save_unit(self, unit, event=None, device=None, detail=None):
+        """ 更新一個工作單位；有給 event 的話同一個交易裡順便寫一筆 journal """
+        values = [unit[f] for f in UNIT_FIELDS]
+        now = time.time()
+        with self._tx() as cur:
+            cur.execute(
+                f"INSERT OR REPLACE INTO units ({', '.join(UNIT_FIELDS)}, updated_at) "
+                f"VALUES ({', '.join('?' * len(UNIT_FIELDS))}, ?)", values + [now])
+            if event:
+                cur.execute(
+                    "INSERT INTO journal (ts, device, diff_index, package_n, event, detail) VALUES (?, ?, ?, ?, ?, ?)",
+                    (now, device, unit["diff_index"], unit["package_n"], event, detail))
+
+    def save_units(self, units, event=None):
+        """ 一次寫入很多個 (建立 / 重置佇列用) """
+        now = time.time()
+        with self._tx() as cur:
+            cur.executemany(
+                f"INSERT OR REPLACE INTO units ({', '.join(UNIT_FIELDS)}, updated_at) "
+                f"VALUES ({', '.join('?' * len(UNIT_FIELDS))}, ?)",
+                [[u[f] for f in UNIT_FIELDS] + [now] for u in units])
+            if event:
+                cur.execute("INSERT INTO journal (ts, event, detail) VALUES (?, ?, ?)",
+                            (now, event, f"{len(units)} units"))
+
+    # --- 事件紀錄 ---
+    def log(self, event, device=None, diff_index=None, package_n=None, detail=None):
+        with self._tx() as cur:
+            cur.execute(
+                "INSERT INTO journal (ts, device, diff_index, package_n, event, detail) VALUES (?, ?, ?, ?, ?, ?)",
+                (time.time(), device, diff_index, package_n, event, detail))
+
+    def journal(self, limit=50, device=None):
+        """ 最近的事件 (新的在前) """
+        sql = "SELECT * FROM journal"
+        args = []
+        if device is not None:
+            sql += " WHERE device = ?"
+            args.append(device)
+        sql += " ORDER BY id DESC LIMIT ?"
+        args.append(limit)
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(sql, args).fetchall()]
+
+    # --- 鍵值 ---
+    def get_meta(self, key, default=None):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(row["value"]) if row else default
+
+    def set_meta(self, key, value):
+        with self._tx() as cur:
+            cur.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                        (key, json.dumps(value, ensure_ascii=False)))
+
+    # --- 舊檔轉換 ---
+    @staticmethod
+    def retire_file(path):
+        """ 舊的 JSON 檔轉進資料庫後改名保留 (不刪，出問題還能手動救) """
+        path = Path(path)
+        try:
+            os.replace(path, path.with_name(path.name + ".migrated"))
+        except OSError as e:
+            print(f"⚠️ 舊存檔改名失敗 ({path.name}): {e}")
+
+
+class _Transaction:
+    """ BEGIN IMMEDIATE ... COMMIT；出錯自動 ROLLBACK """
+
+    def __init__(self, conn, lock):
+        self.conn = conn
+        self.lock = lock
+
+    def __enter__(self):
+        self.lock.acquire()
+        try:
+            self.conn.execute("BEGIN IMMEDIATE")
+        except Exception:
+            self.lock.release()
+            raise
+        return self.conn.cursor()
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        finally:
+            self.lock.release()
+        return False
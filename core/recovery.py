@@ -0,0 +1,170 @@
+# core/recovery.py
+import time
+from dataclasses import dataclass
+from typing import Callable
+
+from .metrics import METRICS
+from .tracing import span
+
+# 開 APP 之後看到這些畫面就代表遊戲起來了 (不用固定等 30 秒)
+READY_SCENES = ("title", "lobby", "blocking", "error_dialog")
+
+# 已經可以直接導航回難度列表的畫面
+NAVIGABLE_SCENES = ("title", "lobby", "battle_menu", "difficulty_list", "stage", "package_select", "package_list")
+
+
+@dataclass
+class RecoveryTier:
+    """ 救援的一個等級：applies(guess) 決定這次要不要試，run(guess) 回傳是否已回到難度列表 """
+    name: str
+    applies: Callable
+    run: Callable
+
+
+class RecoveryEngine:
+    """
+    [分級救援] 先看現在在哪個畫面，從最便宜的方法開始試，不行才升級
+        1. dismiss           關掉彈窗 / 點完卡住的結算 / 等只能等待的事件
+        2. back              按返回退回認得的畫面
+        3. navigate          從目前畫面直接導航回難度列表
+        4. restart_app       重開 APP (看到認得的畫面就往下走，不固定等)
+        5. restart_emulator  重開模擬器 (最後一招)
+    前三級會依當下畫面挑著試；每一級花多久、有沒有成功都記在 ptcg_recovery_tier_seconds
+    一級說成功之後還要再拍一張確認真的在難度列表 (也就是真的離開出錯的畫面了) 才算數
+    """
+
+    def __init__(self, ops, boot_timeout=90, navigate_timeout=60):
+        self.ops = ops
+        self.adb = ops.adb
+        self.scheduler = ops.scheduler
+        self.boot_timeout = boot_timeout
+        self.navigate_timeout = navigate_timeout
+        self.soft_tiers = [
+            RecoveryTier("dismiss", self._dismiss_applies, self._dismiss),
+            RecoveryTier("back", self._back_applies, self._back),
+            RecoveryTier("navigate", self._navigate_applies, self._navigate),
+        ]
+        self.restart_app_tier = RecoveryTier("restart_app", lambda g: True, self._restart_app)
+        self.restart_emulator_tier = RecoveryTier("restart_emulator", lambda g: True, self._restart_emulator)
+
+    # --- 流程 ---
+    def plan(self, max_retries):
+        """ 要依序嘗試的等級 (前三級會在執行時再看畫面決定要不要跳過) """
+        restarts = [self.restart_app_tier] * max(0, max_retries - 1)
+        return self.soft_tiers + restarts + [self.restart_emulator_tier]
+
+    def recover(self, max_retries=5):
+        """
+        :param max_retries: 重開 APP / 模擬器的總次數上限 (跟以前一樣，最後一次是重開模擬器)
+        :return: True；全部都失敗就丟出 Exception
+        """
+        print(f"\n🚑 啟動分級救援 (最多重開 {max_retries} 次)")
+        recover_start = time.monotonic()
+        METRICS.inc("ptcg_recoveries_total")
+
+        for step, tier in enumerate(self.plan(max_retries), 1):
+            self.ops.state.check_stop()
+            guess = self.ops.where_am_i()
+            if not tier.applies(guess):
+                continue
+
+            print(f"   🔄 [救援 {step}] {tier.name} (目前畫面: {guess.scene})")
+            tier_start = time.monotonic()
+            try:
+                with span(f"recover:{tier.name}", "recovery", scene=guess.scene):
+                    ok = tier.run(guess) and self._confirmed()
+            except Exception as e:
+                # 捕捉所有「預期外」的錯誤 (例如截圖失敗、記憶體不足...)，直接升級
+                print(f"      ⚠️ [異常] {tier.name} 發生未預期錯誤: {e}")
+                ok = False
+
+            spent = time.monotonic() - tier_start
+            METRICS.observe("ptcg_recovery_tier_seconds", spent, tier=tier.name, result="ok" if ok else "failed")
+            if ok:
+                total = time.monotonic() - recover_start
+                METRICS.observe("ptcg_recovery_seconds", total, result="ok", tier=tier.name)
+                print(f"   ✨ [救援成功] {tier.name} 有效 (這一級 {spent:.1f}s，總共 {total:.1f}s)")
+                return True
+            print(f"      ❌ {tier.name} 無效 ({spent:.1f}s)，升級下一招")
+
+        total = time.monotonic() - recover_start
+        METRICS.observe("ptcg_recovery_seconds", total, result="failed", tier="none")
+        print(f"💀 [救援失敗] 所有方法都試過了 ({total:.1f}s)，程式終止。")
+        raise Exception("Fatal Error: Game Recovery Failed")
+
+    def _confirmed(self):
+        """ 拍一張新的畫面確認真的回到難度列表 (只看場景判斷會把關卡畫面當成難度列表) """
+        screen, _ = self.ops.next_screen()
+        if self.ops.on_difficulty_list(screen):
+            return True
+        print("      ⚠️ 說回到難度列表了，但畫面確認不是，不算成功")
+        return False
+
+    # --- 1. dismiss ---
+    @staticmethod
+    def _dismiss_applies(guess):
+        return guess.scene in ("error_dialog", "blocking", "result", "settlement")
+
+    def _dismiss(self, guess):
+        for _ in range(10):
+            self.ops.state.check_stop()
+            screen, _ = self.ops.next_screen()
+            guess = self.ops.scenes.classify(screen)
+            if guess.scene == "error_dialog":
+                self.ops.handle_critical_events(screen)
+            elif guess.scene == "blocking":
+                # 只能等待的事件：等它自己結束
+                self.ops.wait_for_scene(NAVIGABLE_SCENES + ("error_dialog",), timeout=120, name="blocking")
+            elif guess.scene == "settlement" or guess.template == "win.png":
+                # 卡住的結算 / 勝利畫面：點掉它
+                self.adb.tap(*guess.pos)
+                self.scheduler.pause("recover_dismiss", 1.0)
+            elif guess.scene == "result":
+                # 輸了 / 平手的畫面會自己跳到結算，等一下
+                self.ops.wait_for_scene(("settlement",) + NAVIGABLE_SCENES, timeout=15, name="result_hold")
+            else:
+                break
+
+        if guess.scene not in NAVIGABLE_SCENES:
+            return False
+        return self.ops.navigate_back_to_lobby(timeout=self.navigate_timeout)
+
+    # --- 2. back ---
+    @staticmethod
+    def _back_applies(guess):
+        return guess.scene == "unknown"
+
+    def _back(self, guess):
+        for _ in range(3):
+            if guess.scene in NAVIGABLE_SCENES:
+                break
+            self.adb.key_back()
+            self.scheduler.pause("recover_back", 1.5)
+            guess = self.ops.where_am_i()
+        if guess.scene not in NAVIGABLE_SCENES:
+            return False
+        return self.ops.navigate_back_to_lobby(timeout=self.navigate_timeout)
+
+    # --- 3. navigate ---
+    @staticmethod
+    def _navigate_applies(guess):
+        return guess.scene in NAVIGABLE_SCENES
+
+    def _navigate(self, guess):
+        return self.ops.navigate_back_to_lobby(timeout=self.navigate_timeout)
+
+    # --- 4 / 5. 重開 ---
+    def _wait_ready(self):
+        print(f"      ⏳ 等待遊戲載入 (最多 {self.boot_timeout} 秒)...")
+        return self.ops.wait_for_scene(READY_SCENES, timeout=self.boot_timeout, name="app_boot")
+
+    def _restart_app(self, guess):
+        self.adb.restart_app()
+        self._wait_ready()
+        return self.ops.navigate_back_to_lobby()
+
+    def _restart_emulator(self, guess):
+        self.adb.restart_emulator()
+        self.adb.restart_app()
+        self._wait_ready()
+        return self.ops.navigate_back_to_lobby()
@@ -0,0 +1,109 @@
+# core/roi_manifest.py
+import json
+import os
+import threading
+from pathlib import Path
+from . import config
+from .progress_store import resolve_path
+
+
+class RoiManifest:
+    """
+    [搜尋範圍表] 記錄每張模板「通常出現在畫面哪裡」
+    - assets/templates.json 手動宣告：
+        "roi": [x, y, w, h]  (用畫面比例 0~1 表示，解析度換了也能用)
+        "roi": "auto"        (從過去命中的位置自動學)
+    - 學到的範圍存在 config.ROI_HISTORY_FILE，下次啟動直接沿用
+      範圍只會變大不會縮，所以只收分數夠高 (config.ROI_LEARN_CONFIDENCE) 的命中
+    比對時先只搜這塊，沒找到才退回全畫面
+    """
+
+    def __init__(self, manifest_path=None, history_path=None, margin=0.03):
+        self.manifest_path = Path(manifest_path or config.ASSETS_DIR / "templates.json")
+        self.history_path = resolve_path(history_path or config.ROI_HISTORY_FILE)
+        self.margin = margin  # 學到的範圍四周再多留一點 (畫面比例)
+        self._lock = threading.Lock()
+        self.templates = self._load_json(self.manifest_path)
+        self.learned = self._load_json(self.history_path)
+
+    @staticmethod
+    def _load_json(path):
+        if not path.exists():
+            return {}
+        try:
+            return json.loads(path.read_text(encoding="utf-8"))
+        except Exception as e:
+            print(f"⚠️ 讀取 {path.name} 失敗: {e} (忽略)")
+            return {}
+
+    def options(self, name):
+        """ 這張模板在 templates.json 裡的設定 (沒寫就是空 dict) """
+        return self.templates.get(name, {})
+
+    def rect(self, name, screen_shape):
+        """
+        :return: 要搜尋的像素範圍 (x0, y0, x1, y1)；None = 直接搜全畫面
+        """
+        roi = self.options(name).get("roi")
+        if roi is None:
+            return None
+        if roi == "auto":
+            roi = self.learned.get(name)
+            if roi is None:
+                return None  # 還沒學到，先搜全畫面
+
+        sh, sw = screen_shape[:2]
+        x, y, w, h = roi
+        x0 = max(0, int(x * sw))
+        y0 = max(0, int(y * sh))
+        x1 = min(sw, int((x + w) * sw + 0.5))
+        y1 = min(sh, int((y + h) * sh + 0.5))
+        if x1 <= x0 or y1 <= y0:
+            return None
+        return x0, y0, x1, y1
+
+    def record_hit(self, name, top_left, size, screen_shape, score=1.0):
+        """ 命中一次就把位置併進學到的範圍 (只有 "auto" 的模板、而且分數夠高才會學) """
+        if self.options(name).get("roi") != "auto":
+            return
+        if score < config.ROI_LEARN_CONFIDENCE:
+            return  # 勉強過門檻的命中可能是誤判，一次就會把範圍永久撐大
+
+        sh, sw = screen_shape[:2]
+        th, tw = size
+        m = self.margin
+        hit = [
+            max(0.0, top_left[0] / sw - m),
+            max(0.0, top_left[1] / sh - m),
+            min(1.0, (top_left[0] + tw) / sw + m),
+            min(1.0, (top_left[1] + th) / sh + m),
+        ]
+
+        with self._lock:
+            old = self.learned.get(name)
+            if old is not None:
+                ox, oy, ow, oh = old
+                if ox <= hit[0] and oy <= hit[1] and ox + ow >= hit[2] and oy + oh >= hit[3]:
+                    return  # 已經涵蓋在範圍內，不用更新
+                hit = [min(ox, hit[0]), min(oy, hit[1]), max(ox + ow, hit[2]), max(oy + oh, hit[3])]
+
+            self.learned[name] = [round(hit[0], 4), round(hit[1], 4),
+                                  round(hit[2] - hit[0], 4), round(hit[3] - hit[1], 4)]
+            self._save()
+
+    def forget(self, name=None):
+        """ 版面改了就把學到的範圍清掉 """
+        with self._lock:
+            if name is None:
+                self.learned.clear()
+            else:
+                self.learned.pop(name, None)
+            self._save()
+
+    def _save(self):
+        try:
+            tmp = self.history_path.with_name(self.history_path.name + ".tmp")
+            tmp.write_text(json.dumps(self.learned, indent=4, ensure_ascii=False), encoding="utf-8")
+            os.replace(tmp, self.history_path)
+        except Exception as e:
+            print(f"⚠️ 儲存搜尋範圍失敗: {e}")
@@ -0,0 +1,121 @@
+# core/scene_classifier.py
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Tuple
+
+import cv2
+from . import config
+from .metrics import METRICS
+from .tracing import span
+
+UNKNOWN = "unknown"
+
+# 疊在其他畫面上面的彈窗：只要出現就以它為準 (底下的畫面還看得到，但現在點不到)
+OVERLAY_SCENES = ("error_dialog", "blocking")
+
+# 有些畫面會順便露出別的畫面的東西 (關卡畫面上方也有難度標題 diff_x)：
+# 左邊的場景過門檻時，右邊的場景就算分數比較高也不選
+OUTRANKS = {"stage": ("difficulty_list",)}
+
+# 模板縮小後短邊少於這個像素數就不準了，這張不列入判斷
+MIN_TEMPLATE_PX = 6
+
+
+@dataclass
+class SceneGuess:
+    """ 一次場景判斷的結果 """
+    scene: str
+    confidence: float
+    template: Optional[str] = None          # 分數最高的那張模板
+    pos: Optional[Tuple[int, int]] = None   # 它在原解析度畫面上的中心點
+    scores: Dict[str, float] = field(default_factory=dict)  # 每個場景的最高分
+
+    @property
+    def known(self):
+        return self.scene != UNKNOWN
+
+    def __str__(self):
+        return f"{self.scene} ({self.confidence:.2f}, {self.template or '-'})"
+
+
+class SceneClassifier:
+    """
+    [場景判斷] 一次回答「我現在在哪個畫面」
+    - assets/templates.json 裡有寫 "scene" 的模板才會參與 (例如 "title_screen.png": {"scene": "title"})
+    - 截圖只縮小一次 (Frame 快取)，所有場景模板都在同一張小圖上比 (模板的縮小版由 TemplateStore 快取)
+    - 每個場景取最高分；彈窗 (OVERLAY_SCENES) 優先，再來是 OUTRANKS 的規則，其餘取分數最高的，低於門檻就是 "unknown"
+    比逐一呼叫 find_and_get_pos 便宜很多，適合救援 / 導航一開始先判斷該走哪條路
+    """
+
+    def __init__(self, finder, scale=None, threshold=None):
+        self.finder = finder
+        self.store = finder.store
+        self.manifest = finder.manifest
+        self.scale = float(scale if scale is not None else config.SCENE_SCALE)
+        self.threshold = float(threshold if threshold is not None else config.SCENE_THRESHOLD)
+        self.scenes = {}  # {場景: [模板, ...]}
+        for name, opts in sorted(self.manifest.templates.items()):
+            scene = opts.get("scene")
+            if scene:
+                self.scenes.setdefault(scene, []).append(name)
+
+    def _templates(self):
+        for scene, names in self.scenes.items():
+            for name in names:
+                small = self.store.get_scaled(name, "bgr", self.scale)
+                if small is None or min(small.shape[:2]) < MIN_TEMPLATE_PX:
+                    continue
+                yield scene, name, small
+
+    def _score(self, small_screen, name, template):
+        """ :return: (分數, 縮小圖上的左上角)；有學到的搜尋範圍就只搜那一塊 """
+        x0 = y0 = 0
+        haystack = small_screen
+        roi = self.manifest.rect(name, small_screen.shape)
+        if roi is not None:
+            rx0, ry0, rx1, ry1 = roi
+            if ry1 - ry0 >= template.shape[0] and rx1 - rx0 >= template.shape[1]:
+                x0, y0 = rx0, ry0
+                haystack = small_screen[ry0:ry1, rx0:rx1]
+        if template.shape[0] > haystack.shape[0] or template.shape[1] > haystack.shape[1]:
+            return -1.0, None
+        result = cv2.matchTemplate(haystack, template, cv2.TM_CCOEFF_NORMED)
+        _, max_val, _, max_loc = cv2.minMaxLoc(result)
+        return float(max_val), (max_loc[0] + x0, max_loc[1] + y0)
+
+    def classify(self, screen) -> SceneGuess:
+        """ 判斷這張截圖是哪個場景 (screen 是 None 就回傳 unknown) """
+        if screen is None:
+            return SceneGuess(UNKNOWN, 0.0)
+
+        with METRICS.timer("ptcg_scene_seconds"), span("classify", "match") as sp:
+            small = self.finder.frame(screen).scaled(self.scale)
+            best = {}  # {場景: (分數, 模板, 左上角, 模板大小)}
+            for scene, name, template in self._templates():
+                score, loc = self._score(small, name, template)
+                if loc is not None and score > best.get(scene, (-1.0,))[0]:
+                    best[scene] = (score, name, loc, template.shape[:2])
+
+            guess = self._decide(best)
+            sp.set(scene=guess.scene, confidence=round(guess.confidence, 3))
+        METRICS.inc("ptcg_scene_total", scene=guess.scene)
+        return guess
+
+    def _decide(self, best):
+        scores = {scene: round(v[0], 4) for scene, v in best.items()}
+        picked = None
+        for scene in OVERLAY_SCENES:
+            if scene in best and best[scene][0] >= self.threshold:
+                picked = scene
+                break
+        if picked is None and best:
+            passed = {s for s in best if best[s][0] >= self.threshold}
+            hidden = {low for high in passed for low in OUTRANKS.get(high, ())}
+            picked = max((s for s in best if s not in hidden), key=lambda s: best[s][0], default=None)
+
+        if picked is None or best[picked][0] < self.threshold:
+            top = best[picked][0] if picked is not None else 0.0
+            return SceneGuess(UNKNOWN, max(0.0, top), scores=scores)
+
+        score, name, loc, (th, tw) = best[picked]
+        center = (int((loc[0] + tw / 2) / self.scale), int((loc[1] + th / 2) / self.scale))
+        return SceneGuess(picked, score, name, center, scores)
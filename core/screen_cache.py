@@ -0,0 +1,72 @@
+# core/screen_cache.py
+import threading
+
+import cv2
+import numpy as np
+from . import config
+
+
+class ScreenChangeCache:
+    """
+    [畫面沒變就不重比] 每張截圖先縮成很小的灰階縮圖當指紋
+    某張模板上次比對完之後，如果它搜尋的那一塊縮圖幾乎沒變，就直接沿用上次的結果
+    等待畫面 (戰鬥中、讀取中) 常常連續好幾張都一樣，這樣幾乎不花 CPU
+    """
+
+    def __init__(self, scale=1 / 16, tolerance=None):
+        self.scale = scale
+        self.tolerance = config.SCREEN_DIFF_TOLERANCE if tolerance is None else tolerance
+        self._last_image = None
+        self._last_thumb = None
+        self._results = {}
+        self._lock = threading.Lock()
+
+    def thumb(self, haystack, frame=None):
+        """
+        這張畫面的指紋縮圖 (同一張畫面只算一次)
+        :param frame: haystack 來自哪個 Frame；有給就直接用它的灰階縮圖 (原圖 / 二值化版本共用一份)
+        """
+        if frame is not None:
+            return frame.thumb(self.scale)
+        with self._lock:
+            if haystack is self._last_image:
+                return self._last_thumb
+            gray = haystack if haystack.ndim == 2 else cv2.cvtColor(haystack, cv2.COLOR_BGR2GRAY)
+            thumb = cv2.resize(gray, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+            # 轉成 int16 之後相減才不會溢位
+            thumb = thumb.astype(np.int16)
+            self._last_image, self._last_thumb = haystack, thumb
+            return thumb
+
+    def _crop(self, thumb, rect):
+        if rect is None:
+            return thumb
+        x0, y0, x1, y1 = rect
+        tx0, ty0 = int(x0 * self.scale), int(y0 * self.scale)
+        tx1, ty1 = int(np.ceil(x1 * self.scale)) + 1, int(np.ceil(y1 * self.scale)) + 1
+        return thumb[ty0:ty1, tx0:tx1]
+
+    def lookup(self, key, haystack, frame=None):
+        """ 上次的結果還能用就回傳它，不然回傳 None """
+        cached = self._results.get(key)
+        if cached is None:
+            return None
+        rect, shape, old_crop, result = cached
+        if shape != haystack.shape:
+            return None
+        crop = self._crop(self.thumb(haystack, frame), rect)
+        if crop.shape != old_crop.shape:
+            return None
+        if crop.size and np.abs(crop - old_crop).max() > self.tolerance:
+            return None
+        return result
+
+    def store(self, key, haystack, rect, result, frame=None):
+        """ :param rect: 這次比對實際搜尋的範圍 (x0, y0, x1, y1)；None = 全畫面 """
+        crop = self._crop(self.thumb(haystack, frame), rect)
+        self._results[key] = (rect, haystack.shape, crop, result)
+
+    def clear(self):
+        with self._lock:
+            self._results.clear()
+            self._last_image = self._last_thumb = None
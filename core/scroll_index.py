@@ -0,0 +1,61 @@
+# core/scroll_index.py
+import json
+import os
+import threading
+import time
+from . import config
+from .progress_store import resolve_path
+
+
+class ScrollIndex:
+    """
+    [捲動位置表] 記住每個目標 (卡包 / 難度) 上次是在清單往下捲多少像素時找到的
+    - 下次直接一次捲到那裡確認，不用一頁一頁找
+    - 確認失敗 (版面改了、清單變長) 就把紀錄丟掉，回到逐頁掃描再重新學
+    - 存在 config.SCROLL_INDEX_FILE，下次啟動直接沿用
+        {"package": {"A12.png": {"offset": 1200, "hits": 5, "updated": 1700000000}}}
+    """
+
+    def __init__(self, path=None):
+        self.path = resolve_path(path or config.SCROLL_INDEX_FILE)
+        self._lock = threading.Lock()
+        self._data = self._load()
+
+    def _load(self):
+        if not self.path.exists():
+            return {}
+        try:
+            return json.loads(self.path.read_text(encoding="utf-8"))
+        except Exception as e:
+            print(f"⚠️ 讀取 {self.path.name} 失敗: {e} (忽略)")
+            return {}
+
+    def _save(self):
+        try:
+            tmp = self.path.with_name(self.path.name + ".tmp")
+            tmp.write_text(json.dumps(self._data, indent=4, ensure_ascii=False), encoding="utf-8")
+            os.replace(tmp, self.path)
+        except Exception as e:
+            print(f"⚠️ 儲存捲動位置表失敗: {e}")
+
+    def offset(self, list_name, item):
+        """ 上次找到 item 時往下捲了幾像素；沒有紀錄回傳 None """
+        entry = self._data.get(list_name, {}).get(item)
+        return None if entry is None else int(entry["offset"])
+
+    def record(self, list_name, item, offset):
+        with self._lock:
+            items = self._data.setdefault(list_name, {})
+            old = items.get(item)
+            hits = old["hits"] + 1 if old is not None and old["offset"] == offset else 1
+            items[item] = {"offset": int(offset), "hits": hits, "updated": int(time.time())}
+            self._save()
+
+    def forget(self, list_name, item=None):
+        """ 版面改了就把紀錄清掉 (item=None = 整個清單) """
+        with self._lock:
+            if item is None:
+                self._data.pop(list_name, None)
+            else:
+                self._data.get(list_name, {}).pop(item, None)
+            self._save()
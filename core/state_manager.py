@@ -1,29 +1,47 @@
 # core/state_manager.py
 import json
-from pathlib import Path
 from . import config
+from .progress_store import ProgressStore, resolve_path
 
 class StateManager:
-    def __init__(self):
-        self.file_path = Path(config.STATE_FILE)
+    """
+    每台裝置的「最後完成到哪」
+    存在進度資料庫 (config.PROGRESS_DB) 的 meta 表，寫入是交易式的，不會寫一半壞掉
+    第一次執行時會把舊的 bot_state.json 轉進來
+    """
+
+    DEFAULT = {"diff_index": 0, "package_n": 0}
+
+    def __init__(self, store=None):
+        self.store = store if store is not None else ProgressStore()
+        self.key = f"state:{config.DEVICE_ID}"
+        self.file_path = resolve_path(config.STATE_FILE) # 舊存檔 (只用來轉換)
+        self._migrate()
+
+    def _migrate(self):
+        if self.store.get_meta(self.key) is not None or not self.file_path.exists():
+            return
+        try:
+            state = json.loads(self.file_path.read_text(encoding="utf-8"))
+            state = {"diff_index": int(state["diff_index"]), "package_n": int(state["package_n"])}
+        except Exception:
+            print(f"⚠️ 舊存檔 {self.file_path.name} 損毀，無法轉換 (從頭開始)")
+            return
+        self.store.set_meta(self.key, state)
+        self.store.log("migrate_state", device=str(config.DEVICE_ID), detail=json.dumps(state))
+        self.store.retire_file(self.file_path)
+        print(f"📦 已把 {self.file_path.name} 轉進進度資料庫: {state}")
 
     def load_state(self):
         """ 讀取進度，如果沒有存檔就回傳預設值 (從第0個難度, 第1關開始) """
-        if not self.file_path.exists():
-            return {"diff_index": 0, "package_n": 0}
-        
         try:
-            with open(self.file_path, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except Exception:
-            print("⚠️ 存檔損毀，重置進度")
-            return {"diff_index": 0, "package_n": 0}
+            return self.store.get_meta(self.key, dict(self.DEFAULT))
+        except Exception as e:
+            print(f"⚠️ 讀取進度失敗 ({e})，重置進度")
+            return dict(self.DEFAULT)
 
     def save_state(self, diff_index, package_n):
         """ 儲存當前進度 """
-        data = {"diff_index": diff_index, "package_n": package_n}
-        with open(self.file_path, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=4)
+        self.store.set_meta(self.key, {"diff_index": diff_index, "package_n": package_n})
 
-        print(f"💾 [存檔成功] 檔案位置: {self.file_path.resolve()}")
-        # print(f"💾 進度已儲存: 難度[{diff_index+1}] - 關卡[{package_n}]")
\ No newline at end of file
+        print(f"💾 [存檔成功] 難度[{diff_index+1}] - 關卡[{package_n}] ({self.store.path.name})")
@@ -0,0 +1,246 @@
+# core/template_store.py
+import os
+import time
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Optional
+
+import cv2
+import numpy as np
+from . import config
+
+
+@dataclass
+class TemplateEntry:
+    """ 一張模板圖在記憶體中的樣子 (BGR / 灰階 / 各門檻的二值化) """
+    name: str
+    path: Path
+    mtime: float
+    bgr: np.ndarray
+    gray: np.ndarray
+    binaries: Dict[int, np.ndarray] = field(default_factory=dict)
+    scaled: Dict[tuple, np.ndarray] = field(default_factory=dict)
+    checked_at: float = 0.0
+
+    @property
+    def nbytes(self):
+        return (self.bgr.nbytes + self.gray.nbytes
+                + sum(b.nbytes for b in self.binaries.values())
+                + sum(b.nbytes for b in self.scaled.values()))
+
+    def binary(self, thresh=180):
+        """ 二值化版本 (跟 find_text_button 一樣用 THRESH_BINARY_INV)，每個門檻只算一次 """
+        img = self.binaries.get(thresh)
+        if img is None:
+            _, img = cv2.threshold(self.gray, thresh, 255, cv2.THRESH_BINARY_INV)
+            self.binaries[thresh] = img
+        return img
+
+    def downscaled(self, kind, scale):
+        """ 縮小版 (金字塔比對用)，kind = "bgr" 或 "bin" """
+        key = (kind, scale)
+        img = self.scaled.get(key)
+        if img is None:
+            src = self.bgr if kind == "bgr" else self.binary()
+            img = cv2.resize(src, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+            self.scaled[key] = img
+        return img
+
+
+class TemplateStore:
+    """
+    [模板倉庫] 素材圖只讀一次、解碼一次
+    - 第一次用到 (或 preload 時) 才從硬碟讀取
+    - 超過容量上限時，最久沒用到的先丟掉 (LRU)
+    - 每隔 check_interval 秒檢查一次檔案修改時間，圖被換掉會自動重讀
+    """
+
+    def __init__(self, assets_dir=None, max_bytes=None, check_interval=2.0):
+        self.assets_dir = Path(assets_dir or config.ASSETS_DIR)
+        self.max_bytes = max_bytes if max_bytes is not None else config.TEMPLATE_CACHE_MB * 1024 * 1024
+        self.check_interval = check_interval
+        self._entries: "OrderedDict[str, TemplateEntry]" = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.RLock()
+        self._shared_blocks = []  # 子行程掛上的共享記憶體
+
+    # --- 讀檔 ---
+    @staticmethod
+    def _read(path):
+        """ 解決 Windows 路徑含有中文無法讀取的問題 (np.fromfile + imdecode) """
+        try:
+            img_array = np.fromfile(str(path), dtype=np.uint8)
+            return cv2.imdecode(img_array, cv2.IMREAD_COLOR)
+        except Exception as e:
+            print(f"⚠️ 讀取圖片失敗: {path} | 錯誤: {e}")
+            return None
+
+    def _resolve(self, name):
+        """
+        模板檔名 -> 實際路徑
+        找不到一模一樣的檔名時忽略大小寫再找一次 (Windows 不分大小寫，Linux 會分：程式要 diff_2.png，檔案是 diff_2.PNG)
+        """
+        path = self.assets_dir / name
+        if path.exists():
+            return path
+        lowered = name.lower()
+        try:
+            for candidate in self.assets_dir.iterdir():
+                if candidate.name.lower() == lowered:
+                    return candidate
+        except OSError:
+            pass
+        return path
+
+    def _load(self, name):
+        path = self._resolve(name)
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            return None
+
+        bgr = self._read(path)
+        if bgr is None:
+            return None
+        gray = cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY)
+        return TemplateEntry(name=name, path=path, mtime=mtime, bgr=bgr, gray=gray,
+                             checked_at=time.monotonic())
+
+    def _is_stale(self, entry):
+        now = time.monotonic()
+        if now - entry.checked_at < self.check_interval:
+            return False
+        entry.checked_at = now
+        try:
+            return os.stat(entry.path).st_mtime != entry.mtime
+        except OSError:
+            return True
+
+    # --- 容量管理 ---
+    def _put(self, entry):
+        old = self._entries.pop(entry.name, None)
+        if old is not None:
+            self._total_bytes -= old.nbytes
+        self._entries[entry.name] = entry
+        self._total_bytes += entry.nbytes
+        self._evict()
+
+    def _evict(self):
+        # 至少留一張 (就算單張超過上限也要能用)
+        while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+            _, old = self._entries.popitem(last=False)
+            self._total_bytes -= old.nbytes
+
+    # --- 對外介面 ---
+    def get(self, name) -> Optional[TemplateEntry]:
+        """ 取得模板 (快取命中就直接回傳，否則讀檔) """
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is not None and not self._is_stale(entry):
+                self._entries.move_to_end(name)
+                return entry
+
+            entry = self._load(name)
+            if entry is None:
+                self.invalidate(name)
+                return None
+            self._put(entry)
+            return entry
+
+    def get_bgr(self, name):
+        entry = self.get(name)
+        return None if entry is None else entry.bgr
+
+    def get_gray(self, name):
+        entry = self.get(name)
+        return None if entry is None else entry.gray
+
+    def get_binary(self, name, thresh=180):
+        with self._lock:
+            entry = self.get(name)
+            if entry is None:
+                return None
+            before = entry.nbytes
+            img = entry.binary(thresh)
+            self._total_bytes += entry.nbytes - before
+            self._evict()
+            return img
+
+    def get_scaled(self, name, kind, scale):
+        with self._lock:
+            entry = self.get(name)
+            if entry is None:
+                return None
+            before = entry.nbytes
+            img = entry.downscaled(kind, scale)
+            self._total_bytes += entry.nbytes - before
+            self._evict()
+            return img
+
+    def invalidate(self, name=None):
+        """ 丟掉指定模板 (name=None 代表全部清空) """
+        with self._lock:
+            if name is None:
+                self._entries.clear()
+                self._total_bytes = 0
+                return
+            old = self._entries.pop(name, None)
+            if old is not None:
+                self._total_bytes -= old.nbytes
+
+    def preload(self):
+        """ [啟動用] 把 assets 資料夾裡所有 png 一次讀進來 """
+        count = 0
+        for path in sorted(self.assets_dir.iterdir()):
+            if path.suffix.lower() != ".png":
+                continue
+            if self.get(path.name) is not None:
+                count += 1
+        print(f"🗂️ [TemplateStore] 已預載 {count} 張模板 ({self._total_bytes / 1024 / 1024:.1f} MB)")
+        return count
+
+    # --- 多行程共用 ---
+    def export_shared(self):
+        """
+        [主行程用] 把目前快取裡的模板搬進共享記憶體，給子行程唯讀使用
+        :return: (spec, blocks) spec 傳給子行程；blocks 要留著 (關掉就失效)
+        """
+        from multiprocessing import shared_memory
+
+        spec, blocks = {}, []
+        with self._lock:
+            for name, entry in self._entries.items():
+                arrays = {}
+                for kind, arr in (("bgr", entry.bgr), ("gray", entry.gray)):
+                    shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+                    np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)[...] = arr
+                    blocks.append(shm)
+                    arrays[kind] = (shm.name, arr.shape, arr.dtype.str)
+                spec[name] = {"mtime": entry.mtime, "arrays": arrays}
+        return spec, blocks
+
+    def attach_shared(self, spec):
+        """ [子行程用] 直接掛上主行程的共享記憶體，不用再讀檔解碼 """
+        from multiprocessing import shared_memory
+
+        with self._lock:
+            for name, info in spec.items():
+                views = {}
+                for kind, (shm_name, shape, dtype) in info["arrays"].items():
+                    shm = shared_memory.SharedMemory(name=shm_name)
+                    self._shared_blocks.append(shm)  # 留著參照，不然記憶體會被回收
+                    view = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+                    view.flags.writeable = False
+                    views[kind] = view
+                self._put(TemplateEntry(name=name, path=self.assets_dir / name, mtime=info["mtime"],
+                                        bgr=views["bgr"], gray=views["gray"],
+                                        checked_at=time.monotonic()))
+        print(f"🗂️ [TemplateStore] 已掛上共用模板 {len(spec)} 張")
+
+    def __contains__(self, name):
+        return name in self._entries
+
+    def __len__(self):
+        return len(self._entries)
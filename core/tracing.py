@@ -0,0 +1,180 @@
+# core/tracing.py
+import atexit
+import functools
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+
+class _NullSpan:
+    """ 追蹤關閉時用的空 span (什麼都不做，也不配置新物件) """
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **args):
+        pass
+
+
+NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("tracer", "name", "cat", "args", "start")
+
+    def __init__(self, tracer, name, cat, args):
+        self.tracer = tracer
+        self.name = name
+        self.cat = cat
+        self.args = args
+
+    def set(self, **args):
+        """ 執行到一半才知道的資訊 (例如有沒有找到) 也可以補進去 """
+        self.args.update(args)
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter_ns()
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        self.tracer._complete(self.name, self.cat, self.start, end, self.args)
+        return False
+
+
+class Tracer:
+    """
+    [時間軸追蹤] 把巢狀的 span 寫成 Chrome trace (JSON Array 格式)
+    用 chrome://tracing 或 https://ui.perfetto.dev 打開就能看到每一步花多久
+    - 關閉時 span() 直接回傳共用的空物件，幾乎沒有成本
+    - 事件先放記憶體，滿 flush_every 筆或每 flush_interval 秒寫一次檔 (出錯蒐證時也會馬上寫)；
+      檔案一開始就寫好 "["，就算程式被砍掉沒寫到結尾的 "]"，檢視器也讀得出來，最多只少最後幾秒
+    """
+
+    def __init__(self, flush_every=2000, flush_interval=2.0):
+        self.enabled = False
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.path = None
+        self._file = None
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._t0 = 0
+        self._pid = os.getpid()
+        self._named_threads = set()
+        self._first = True
+        self._stop = threading.Event()
+        self._flusher = None
+
+    def start(self, path):
+        if self.enabled:
+            return
+        self.path = Path(path)
+        self._file = open(self.path, "w", encoding="utf-8")
+        self._file.write("[\n")
+        self._first = True
+        self._t0 = time.perf_counter_ns()
+        self._pid = os.getpid()
+        self._named_threads.clear()
+        self._buffer.append({"ph": "M", "name": "process_name", "pid": self._pid, "tid": 0,
+                             "args": {"name": f"bot {self.path.stem}"}})
+        self.enabled = True
+        self._stop.clear()
+        self._flusher = threading.Thread(target=self._flush_loop, name="trace-flush", daemon=True)
+        self._flusher.start()
+        atexit.register(self.stop)
+        print(f"🧵 [Trace] 記錄時間軸 -> {self.path}")
+
+    def span(self, name, cat="bot", **args):
+        if not self.enabled:
+            return NULL_SPAN
+        return _Span(self, name, cat, args)
+
+    def instant(self, name, cat="bot", **args):
+        """ 單一時間點的事件 (例如偵測到勝利) """
+        if not self.enabled:
+            return
+        self._emit({"ph": "i", "s": "t", "name": name, "cat": cat,
+                    "ts": (time.perf_counter_ns() - self._t0) / 1000, "args": args})
+
+    def _complete(self, name, cat, start, end, args):
+        self._emit({"ph": "X", "name": name, "cat": cat,
+                    "ts": (start - self._t0) / 1000, "dur": (end - start) / 1000, "args": args})
+
+    def _emit(self, event):
+        thread = threading.current_thread()
+        event["pid"] = self._pid
+        event["tid"] = thread.ident
+        with self._lock:
+            if not self.enabled:
+                return
+            if thread.ident not in self._named_threads:
+                self._named_threads.add(thread.ident)
+                self._buffer.append({"ph": "M", "name": "thread_name", "pid": self._pid,
+                                     "tid": thread.ident, "args": {"name": thread.name}})
+            self._buffer.append(event)
+            if len(self._buffer) >= self.flush_every:
+                self._flush_locked()
+
+    def _flush_locked(self):
+        if self._file is None or not self._buffer:
+            return
+        parts = []
+        for event in self._buffer:
+            parts.append(("" if self._first else ",\n") + json.dumps(event, ensure_ascii=False, default=str))
+            self._first = False
+        self._buffer.clear()
+        self._file.write("".join(parts))
+        self._file.flush()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def stop(self):
+        self._stop.set()
+        with self._lock:
+            if not self.enabled:
+                return
+            self._flush_locked()
+            self.enabled = False
+            self._file.write("\n]\n")
+            self._file.close()
+            self._file = None
+        print(f"🧵 [Trace] 時間軸已寫入 {self.path}")
+
+
+# 整個行程共用一份
+TRACER = Tracer()
+
+
+def span(name, cat="bot", **args):
+    """ with span("click:win.png"): ... """
+    return TRACER.span(name, cat, **args)
+
+
+def traced(name=None, cat="bot"):
+    """ 裝飾器：整個函式包成一個 span (關閉時只多一個 if) """
+    def decorator(fn):
+        label = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not TRACER.enabled:
+                return fn(*args, **kwargs)
+            with _Span(TRACER, label, cat, {}):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,214 @@
+# core/work_queue.py
+import json
+import threading
+import time
+from dataclasses import dataclass, asdict
+from typing import Optional
+from .progress_store import ProgressStore, resolve_path
+
+
+@dataclass
+class WorkUnit:
+    """ 一個工作單位 = 某個難度的某一包 """
+    diff_index: int
+    package_n: int
+    priority: int = 0
+    status: str = "pending"        # pending / leased / done / failed
+    attempts: int = 0
+    owner: Optional[str] = None    # 目前由哪台裝置負責
+    lease_expires: float = 0.0
+    last_error: Optional[str] = None
+    duration: Optional[float] = None
+
+    @property
+    def key(self):
+        return f"{self.diff_index}:{self.package_n}"
+
+
+class WorkQueue:
+    """
+    [工作佇列] 把「4 難度 x 15 包」拆成獨立的工作單位
+    - lease()   : 裝置領一個工作 (同一難度優先，減少切換難度的次數)
+    - complete(): 做完回報
+    - fail()    : 失敗回報，次數未滿 max_attempts 會放回佇列重試
+    - 領了太久沒回報 (lease 過期) 或裝置掛掉 (release_owner)，工作會自動還回去給別台做
+    有給 store (ProgressStore) 的話，每次狀態改變都會寫進資料庫並記一筆 journal
+    """
+
+    def __init__(self, units=None, store=None, lease_seconds=3600, max_attempts=5):
+        self.units = {u.key: u for u in (units or [])}
+        self.store = store
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._lock = threading.RLock()
+
+    # --- 建立 ---
+    @classmethod
+    def build(cls, difficulty_count, total_packages, done_before=None, **kwargs):
+        """
+        :param done_before: (diff_index, package_n)，這個位置 (含) 以前的都算做完 (相容舊存檔)
+        """
+        units = []
+        for d in range(difficulty_count):
+            for n in range(1, total_packages + 1):
+                unit = WorkUnit(diff_index=d, package_n=n)
+                if done_before is not None and (d, n) <= tuple(done_before):
+                    unit.status = "done"
+                units.append(unit)
+        return cls(units, **kwargs)
+
+    @classmethod
+    def open(cls, db_path=None, difficulty_count=0, total_packages=0, done_before=None,
+             legacy_file=None, **kwargs):
+        """
+        從進度資料庫開啟佇列
+        - 資料庫是空的：有舊的 work_queue.json 就轉進來，沒有就用 done_before 新建
+        - 上次結束時還「領著」的工作 (當機、強制關閉) 一律放回佇列
+        """
+        store = ProgressStore(db_path)
+        rows = store.load_units()
+        if rows:
+            queue = cls([WorkUnit(**row) for row in rows], store=store, **kwargs)
+        else:
+            queue = cls._migrate(store, legacy_file, difficulty_count, total_packages, done_before, **kwargs)
+
+        with queue._lock:
+            # 設定改大 (難度 / 包數變多) 時補上新的工作
+            for d in range(difficulty_count):
+                for n in range(1, total_packages + 1):
+                    if f"{d}:{n}" not in queue.units:
+                        unit = WorkUnit(diff_index=d, package_n=n)
+                        queue.units[unit.key] = unit
+                        queue._save(unit, "added")
+            for unit in queue.units.values():
+                if unit.status == "leased":
+                    stale_owner = unit.owner
+                    unit.status, unit.owner = "pending", None
+                    queue._save(unit, "lease_recovered", stale_owner)
+        return queue
+
+    @classmethod
+    def _migrate(cls, store, legacy_file, difficulty_count, total_packages, done_before, **kwargs):
+        legacy = resolve_path(legacy_file) if legacy_file else None
+        if legacy is not None and legacy.exists():
+            try:
+                data = json.loads(legacy.read_text(encoding="utf-8"))
+                queue = cls([WorkUnit(**u) for u in data["units"]], store=store, **kwargs)
+                store.save_units([asdict(u) for u in queue.units.values()], event="migrate")
+                store.retire_file(legacy)
+                print(f"📋 [WorkQueue] 已把 {legacy.name} 轉進進度資料庫")
+                return queue
+            except Exception as e:
+                print(f"⚠️ 舊工作佇列檔無法轉換 ({e})，重新建立")
+
+        queue = cls.build(difficulty_count, total_packages, done_before, store=store, **kwargs)
+        store.save_units([asdict(u) for u in queue.units.values()], event="build")
+        return queue
+
+    def _save(self, unit, event=None, owner=None, detail=None):
+        if self.store is None:
+            return
+        try:
+            self.store.save_unit(asdict(unit), event=event, device=owner, detail=detail)
+        except Exception as e:
+            print(f"⚠️ 工作佇列存檔失敗: {e}")
+
+    # --- 租約 ---
+    def _expire_leases(self):
+        now = time.time()
+        for unit in self.units.values():
+            if unit.status == "leased" and unit.lease_expires < now:
+                print(f"⏰ [WorkQueue] {unit.key} 租約過期 ({unit.owner})，放回佇列")
+                stale_owner = unit.owner
+                unit.status, unit.owner = "pending", None
+                self._save(unit, "lease_expired", stale_owner)
+
+    def lease(self, owner, prefer_diff=None) -> Optional[WorkUnit]:
+        """
+        領一個工作 (沒工作了回傳 None)
+        挑選順序: 優先度高 -> 跟現在同難度 -> 難度小 -> 包號小
+        """
+        with self._lock:
+            self._expire_leases()
+            candidates = [u for u in self.units.values() if u.status == "pending"]
+            if not candidates:
+                return None
+            unit = min(candidates, key=lambda u: (-u.priority, u.diff_index != prefer_diff,
+                                                  u.diff_index, u.package_n))
+            unit.status = "leased"
+            unit.owner = owner
+            unit.lease_expires = time.time() + self.lease_seconds
+            self._save(unit, "lease", owner)
+            return WorkUnit(**asdict(unit))
+
+    def renew(self, key, owner):
+        """ 還在做，延長租約 """
+        with self._lock:
+            unit = self.units.get(key)
+            if unit is not None and unit.status == "leased" and unit.owner == owner:
+                unit.lease_expires = time.time() + self.lease_seconds
+                self._save(unit)
+                return True
+            return False
+
+    def complete(self, key, owner, duration=None):
+        with self._lock:
+            unit = self.units[key]
+            unit.status = "done"
+            unit.owner = owner
+            unit.duration = duration
+            self._save(unit, "done", owner, f"{duration:.1f}s" if duration is not None else None)
+
+    def fail(self, key, owner, error=""):
+        """ 失敗：次數沒滿就放回佇列 (優先度 +1，盡快重試)，滿了就標記 failed 跳過 """
+        with self._lock:
+            unit = self.units[key]
+            unit.attempts += 1
+            unit.last_error = str(error)[:200]
+            unit.owner = None
+            if unit.attempts >= self.max_attempts:
+                unit.status = "failed"
+                print(f"💀 [WorkQueue] {unit.key} 已失敗 {unit.attempts} 次，放棄")
+            else:
+                unit.status = "pending"
+                unit.priority += 1
+            self._save(unit, "fail" if unit.status == "pending" else "failed", owner, unit.last_error)
+
+    def release_owner(self, owner):
+        """ 裝置掛掉時，把它手上的工作全部放回佇列 """
+        with self._lock:
+            released = 0
+            for unit in self.units.values():
+                if unit.status == "leased" and unit.owner == owner:
+                    unit.status, unit.owner = "pending", None
+                    self._save(unit, "released", owner)
+                    released += 1
+            if released:
+                print(f"♻️ [WorkQueue] {owner} 的 {released} 個工作已放回佇列")
+            return released
+
+    # --- 查詢 ---
+    def stats(self):
+        with self._lock:
+            counts = {"pending": 0, "leased": 0, "done": 0, "failed": 0}
+            for unit in self.units.values():
+                counts[unit.status] += 1
+            return counts
+
+    def failed_units(self):
+        """ 已經放棄的工作 (失敗次數達到 max_attempts) """
+        with self._lock:
+            return [u for u in self.units.values() if u.status == "failed"]
+
+    def remaining(self):
+        stats = self.stats()
+        return stats["pending"] + stats["leased"]
+
+    def reset(self):
+        """ 全部做完後重置，下一輪從頭開始 """
+        with self._lock:
+            for unit in self.units.values():
+                unit.status, unit.owner, unit.attempts, unit.priority = "pending", None, 0, 0
+                unit.last_error, unit.duration = None, None
+            if self.store is not None:
+                self.store.save_units([asdict(u) for u in self.units.values()], event="reset")
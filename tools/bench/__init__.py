@@ -0,0 +1,21 @@
+"""
+[比對效能 / 準確度量測]
+離線 (Linux 也行，不需要模擬器) 量 ImageFinder 各種比對方式的速度與準確度
+
+語料 (corpus) = 一個資料夾，裡面有截圖 + labels.json：
+    {
+      "lobby_clean.png": {
+        "scene": "lobby",
+        "hits": {"battle_1.png": [450, 1530]},   # 應該找到的模板 -> 中心點
+        "text": ["battle_1.png"],                # 也要用 find_text_button 量的模板
+        "ignore": []                             # 畫面上本來就有、找到不算誤判的模板
+      }
+    }
+沒列在 hits / ignore 的模板都視為「不該出現」，找到就算誤判
+
+用法:
+    python -m tools.bench.corpus                 # 依 scenes.json 合成一份語料 (tools/bench/corpus/synthetic)
+    python -m tools.bench.record --scene lobby   # 從實機截圖加進語料 (預先標好，要人工確認)
+    python -m tools.bench.run                    # 跑量測
+    python -m tools.bench.classify               # 檢查真實截圖的場景判斷
+"""
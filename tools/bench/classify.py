@@ -0,0 +1,62 @@
+# tools/bench/classify.py
+"""
+[場景判斷檢查] 用已知場景的真實截圖跑 SceneClassifier，判斷錯了就回傳 1
+
+    python -m tools.bench.classify                   # assets 裡的真實截圖 + 已確認的錄製語料
+    python -m tools.bench.classify --include-unverified
+
+錄製語料 (tools.bench.record) 的 scene 名稱要跟 templates.json 的 "scene" 一樣才會列入
+"""
+import argparse
+import contextlib
+import io
+import sys
+
+from .corpus import CORPUS_DIR, Corpus, imread
+
+from core import config  # noqa: E402  (corpus 已經把專案根目錄放進 sys.path)
+from core.image_finder import ImageFinder
+from core.scene_classifier import SceneClassifier
+
+# assets 裡本來就是整張畫面的截圖 -> 應該判斷成的場景
+KNOWN_CAPTURES = {
+    "unclear.png": "stage",  # 關卡畫面：上方也看得到難度標題，不能被判成 difficulty_list
+}
+
+
+def cases(include_unverified=False, scenes=()):
+    """ :return: [(名稱, 截圖路徑, 應該的場景)] """
+    items = [(name, config.ASSETS_DIR / name, scene) for name, scene in KNOWN_CAPTURES.items()]
+    recorded = Corpus.discover(CORPUS_DIR).select(include_unverified=include_unverified)
+    for path, label in recorded.frames:
+        if label.get("variant") == "device" and label.get("scene") in scenes:
+            items.append((path.name, path, label["scene"]))
+    return items
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SceneClassifier 判斷結果檢查")
+    parser.add_argument("--include-unverified", action="store_true", help="連還沒人工確認的錄製畫面也算")
+    args = parser.parse_args()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        classifier = SceneClassifier(ImageFinder())
+
+    wrong = 0
+    items = cases(args.include_unverified, classifier.scenes)
+    for name, path, expected in items:
+        screen = imread(path)
+        if screen is None:
+            print(f"⚠️ 讀不到 {path}，略過")
+            continue
+        guess = classifier.classify(screen)
+        ok = guess.scene == expected
+        wrong += not ok
+        print(f"{'✅' if ok else '❌'} {name:<40} 應該 {expected:<16} 判斷 {guess}")
+
+    print(f"\n{len(items) - wrong} / {len(items)} 張判斷正確")
+    return 1 if wrong else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,187 @@
+# tools/bench/corpus.py
+"""
+[語料] 讀寫 labels.json，以及依 scenes.json 合成測試畫面
+
+合成方式：把 assets 裡的模板貼到背景截圖上 (位置已知 = 標準答案)，
+再做幾種干擾 (雜訊 / 變暗 / 模糊 / JPEG 壓縮)，用來抓比對方式改壞的情況
+真實截圖請用 tools.bench.record 加進語料
+"""
+import argparse
+import json
+import os
+import sys
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+ROOT_DIR = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT_DIR))
+
+from core import config  # noqa: E402
+
+BENCH_DIR = Path(__file__).resolve().parent
+SCENES_FILE = BENCH_DIR / "scenes.json"
+CORPUS_DIR = BENCH_DIR / "corpus"
+SYNTHETIC_DIR = CORPUS_DIR / "synthetic"
+LABELS_NAME = "labels.json"
+
+
+def imread(path):
+    """ 跟 ImageFinder.cv2_imread_safe 一樣，支援中文路徑 """
+    data = np.fromfile(str(path), dtype=np.uint8)
+    return cv2.imdecode(data, cv2.IMREAD_COLOR)
+
+
+def imwrite(path, image):
+    ok, buf = cv2.imencode(Path(path).suffix or ".png", image)
+    if not ok:
+        raise IOError(f"編碼失敗: {path}")
+    buf.tofile(str(path))
+
+
+class Corpus:
+    """ 一個語料資料夾 (截圖 + labels.json)；可以指定多個資料夾合併成一份 """
+
+    def __init__(self, *dirs):
+        self.frames = []  # [(path, label dict)]
+        for d in dirs:
+            d = Path(d)
+            labels_path = d / LABELS_NAME
+            if not labels_path.exists():
+                continue
+            labels = json.loads(labels_path.read_text(encoding="utf-8"))
+            for name, label in sorted(labels.items()):
+                label.setdefault("hits", {})
+                label.setdefault("text", [])
+                label.setdefault("ignore", [])
+                self.frames.append((d / name, label))
+
+    @classmethod
+    def discover(cls, root=CORPUS_DIR):
+        """ root 底下所有含 labels.json 的資料夾 """
+        root = Path(root)
+        dirs = [p.parent for p in sorted(root.rglob(LABELS_NAME))]
+        return cls(*dirs)
+
+    def select(self, variants=(), scenes=(), include_unverified=False):
+        """ 只留下指定的干擾版本 / 場景 (空的 = 不篩選)；還沒人工確認的錄製畫面預設不算 """
+        picked = Corpus()
+        picked.frames = [(path, label) for path, label in self.frames
+                         if (not variants or label.get("variant", "clean") in variants)
+                         and (not scenes or label.get("scene") in scenes)
+                         and (include_unverified or label.get("verified", True))]
+        return picked
+
+    def __len__(self):
+        return len(self.frames)
+
+    def __iter__(self):
+        for path, label in self.frames:
+            image = imread(path)
+            if image is None:
+                print(f"⚠️ 讀不到 {path}，略過")
+                continue
+            yield path, image, label
+
+    def templates(self):
+        """ 語料裡出現過的所有模板名稱 """
+        names = set()
+        for _, label in self.frames:
+            names.update(label["hits"])
+            names.update(label["text"])
+        return sorted(names)
+
+
+def load_labels(directory):
+    path = Path(directory) / LABELS_NAME
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def save_labels(directory, labels):
+    path = Path(directory) / LABELS_NAME
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(labels, indent=2, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+# --- 合成 ---
+def _paste(canvas, template, center):
+    h, w = template.shape[:2]
+    x0 = int(center[0] - w // 2)
+    y0 = int(center[1] - h // 2)
+    if x0 < 0 or y0 < 0 or x0 + w > canvas.shape[1] or y0 + h > canvas.shape[0]:
+        raise ValueError(f"貼圖超出畫面: 中心 {center}, 大小 {w}x{h}")
+    canvas[y0:y0 + h, x0:x0 + w] = template
+    # 回傳實際的中心點 (跟 ImageFinder 的算法一樣: 左上 + w//2)
+    return [x0 + w // 2, y0 + h // 2]
+
+
+def _variant(image, kind, rng):
+    if kind == "clean":
+        return image
+    if kind == "noise":
+        noise = rng.normal(0, 6, image.shape)
+        return np.clip(image.astype(np.float32) + noise, 0, 255).astype(np.uint8)
+    if kind == "dim":
+        return cv2.convertScaleAbs(image, alpha=0.8, beta=0)
+    if kind == "blur":
+        return cv2.GaussianBlur(image, (3, 3), 0)
+    if kind == "jpeg":
+        _, buf = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, 70])
+        return cv2.imdecode(buf, cv2.IMREAD_COLOR)
+    raise ValueError(f"不認得的干擾方式: {kind}")
+
+
+def synthesize(scenes_file=SCENES_FILE, out_dir=SYNTHETIC_DIR, seed=0):
+    """ 依 scenes.json 產生合成語料，回傳張數 """
+    spec = json.loads(Path(scenes_file).read_text(encoding="utf-8"))
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(seed)
+
+    background = imread(config.ASSETS_DIR / spec["background"])
+    if background is None:
+        raise FileNotFoundError(f"找不到背景圖: {spec['background']}")
+
+    labels = {}
+    for scene, scene_spec in spec["scenes"].items():
+        canvas = background.copy()
+        hits = {}
+        for name, center in scene_spec.get("place", {}).items():
+            template = imread(config.ASSETS_DIR / name)
+            if template is None:
+                print(f"⚠️ 找不到模板 {name}，場景 {scene} 略過這張")
+                continue
+            hits[name] = _paste(canvas, template, center)
+
+        for variant in spec.get("variants", ["clean"]):
+            file_name = f"{scene}_{variant}.png"
+            imwrite(out_dir / file_name, _variant(canvas, variant, rng))
+            labels[file_name] = {
+                "scene": scene,
+                "variant": variant,
+                "hits": hits,
+                "text": scene_spec.get("text", []),
+                "ignore": scene_spec.get("ignore", []),
+            }
+
+    save_labels(out_dir, labels)
+    return len(labels)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="依 scenes.json 合成比對用的測試語料")
+    parser.add_argument("--scenes", default=str(SCENES_FILE))
+    parser.add_argument("--out", default=str(SYNTHETIC_DIR))
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    count = synthesize(args.scenes, args.out, args.seed)
+    print(f"✅ 已產生 {count} 張合成畫面 -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
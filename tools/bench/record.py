@@ -0,0 +1,83 @@
+# tools/bench/record.py
+"""
+[錄製語料] 從實機 / 模擬器截圖，加進 tools/bench/corpus/recorded
+
+    python -m tools.bench.record --scene lobby                 # 截一張
+    python -m tools.bench.record --scene battle --count 5 --interval 2
+
+每張截圖會先用目前的 ImageFinder 把 scenes.json 裡所有模板掃一遍，
+命中的先寫進 labels.json 的 hits，並標記 "verified": false
+請人工打開圖確認 (刪掉誤判 / 補上漏掉的)，確認後把 verified 改成 true
+"""
+import argparse
+import contextlib
+import io
+import json
+import time
+from pathlib import Path
+
+from .corpus import CORPUS_DIR, SCENES_FILE, imwrite, load_labels, save_labels
+
+from core import config  # noqa: E402
+from core.adb_controller import AdbController
+from core.image_finder import ImageFinder
+
+RECORDED_DIR = CORPUS_DIR / "recorded"
+
+
+def all_templates():
+    spec = json.loads(SCENES_FILE.read_text(encoding="utf-8"))
+    names = set()
+    for scene in spec["scenes"].values():
+        names.update(scene.get("place", {}))
+    return sorted(names)
+
+
+def prelabel(finder, screen, templates):
+    """ 用目前的比對結果先猜一份標籤 (只是草稿) """
+    hits = {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        for name in templates:
+            found, pos = finder.find_and_get_pos(screen, name)
+            if found:
+                hits[name] = [int(pos[0]), int(pos[1])]
+    return hits
+
+
+def main():
+    parser = argparse.ArgumentParser(description="從裝置截圖加進比對語料")
+    parser.add_argument("--scene", required=True, help="場景名稱 (lobby / battle / win ...)")
+    parser.add_argument("--count", type=int, default=1)
+    parser.add_argument("--interval", type=float, default=1.0)
+    parser.add_argument("--out", default=str(RECORDED_DIR))
+    args = parser.parse_args()
+
+    out_dir = Path(args.out)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    labels = load_labels(out_dir)
+
+    adb = AdbController(config.ADB_PATH, config.DEVICE_ID, config.target_app_package)
+    finder = ImageFinder()
+    finder.change_cache = None
+    templates = all_templates()
+
+    for i in range(args.count):
+        screen = adb.get_screenshot()
+        if screen is None:
+            print("❌ 截圖失敗，略過")
+        else:
+            file_name = f"{args.scene}_{time.strftime('%Y%m%d_%H%M%S')}_{i}.png"
+            imwrite(out_dir / file_name, screen)
+            hits = prelabel(finder, screen, templates)
+            labels[file_name] = {"scene": args.scene, "variant": "device", "hits": hits,
+                                 "text": [], "ignore": [], "verified": False}
+            save_labels(out_dir, labels)
+            print(f"📸 {file_name}: 預先標記 {sorted(hits) or '(無)'}")
+        if i + 1 < args.count:
+            time.sleep(args.interval)
+
+    print(f"✅ 完成，請檢查 {out_dir / 'labels.json'} 並把 verified 改成 true")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+# tools/bench/run.py
+"""
+[量測] 在語料上跑 ImageFinder，報告每張模板的延遲 / precision / recall
+
+    python -m tools.bench.run                                   # 預設: full + pyramid，門檻 0.8
+    python -m tools.bench.run --modes full,pyramid,manifest --thresholds 0.6,0.7,0.8,0.9
+    python -m tools.bench.run --variants clean --json out.json  # 只跑乾淨畫面，結果存檔
+    python -m tools.bench.run --baseline out.json               # 跟上次的結果比較
+
+模式:
+    full     = 全部原解析度比對
+    pyramid  = 全部金字塔比對
+    manifest = 照 assets/templates.json 每張模板自己的設定
+ROI:
+    off      = 一律搜全畫面
+    learned  = 用目前學到的 roi_history.json (唯讀，量測時不會改到它)
+"""
+import argparse
+import contextlib
+import io
+import json
+import statistics
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+from .corpus import Corpus, CORPUS_DIR, SYNTHETIC_DIR, synthesize
+
+from core import config  # noqa: E402  (corpus 已經把專案根目錄放進 sys.path)
+from core.image_finder import ImageFinder
+from core.roi_manifest import RoiManifest
+from core.template_store import TemplateStore
+
+
+class BenchManifest(RoiManifest):
+    """ 量測用的搜尋範圍表：可以關掉 ROI / 蓋掉比對方式，而且不會寫回 roi_history.json """
+
+    def __init__(self, mode, roi):
+        super().__init__()
+        self.mode = mode
+        self.use_roi = roi == "learned"
+
+    def options(self, name):
+        opts = dict(super().options(name))
+        if self.mode != "manifest":
+            opts.pop("match", None)
+        if not self.use_roi:
+            opts.pop("roi", None)
+        return opts
+
+    def record_hit(self, name, top_left, size, screen_shape, score=1.0):
+        pass
+
+    def _save(self):
+        pass
+
+
+def make_finder(store, mode, roi):
+    config.MATCH_MODE = "full" if mode == "manifest" else mode
+    finder = ImageFinder(store=store, manifest=BenchManifest(mode, roi))
+    finder.change_cache = None  # 每次都真的比對，不然量到的是快取
+    return finder
+
+
+class Tally:
+    __slots__ = ("times", "tp", "fp", "fn", "tn")
+
+    def __init__(self):
+        self.times = []
+        self.tp = self.fp = self.fn = self.tn = 0
+
+    def add(self, other):
+        self.times.extend(other.times)
+        self.tp += other.tp
+        self.fp += other.fp
+        self.fn += other.fn
+        self.tn += other.tn
+
+    @property
+    def precision(self):
+        return self.tp / (self.tp + self.fp) if self.tp + self.fp else 1.0
+
+    @property
+    def recall(self):
+        return self.tp / (self.tp + self.fn) if self.tp + self.fn else 1.0
+
+    @property
+    def f1(self):
+        p, r = self.precision, self.recall
+        return 2 * p * r / (p + r) if p + r else 0.0
+
+    def summary(self):
+        times = sorted(self.times)
+        mean = statistics.fmean(times) * 1000 if times else 0.0
+        p95 = times[min(len(times) - 1, int(len(times) * 0.95))] * 1000 if times else 0.0
+        return {"calls": len(times), "mean_ms": round(mean, 3), "p95_ms": round(p95, 3),
+                "tp": self.tp, "fp": self.fp, "fn": self.fn, "tn": self.tn,
+                "precision": round(self.precision, 4), "recall": round(self.recall, 4), "f1": round(self.f1, 4)}
+
+
+def _judge(tally, found, pos, expected, ignored, tolerance):
+    if expected is not None:
+        if found and abs(pos[0] - expected[0]) <= tolerance and abs(pos[1] - expected[1]) <= tolerance:
+            tally.tp += 1
+        else:
+            tally.fn += 1
+            if found:
+                tally.fp += 1  # 找到了但位置不對
+    elif found:
+        if not ignored:
+            tally.fp += 1
+    else:
+        tally.tn += 1
+
+
+def run_config(corpus, store, mode, roi, threshold, repeat, tolerance, text_templates):
+    """ :return: {(method, template): Tally} """
+    finder = make_finder(store, mode, roi)
+    results = defaultdict(Tally)
+    templates = corpus.templates()
+
+    for path, screen, label in corpus:
+        for name in templates:
+            expected = label["hits"].get(name)
+            ignored = name in label["ignore"]
+
+            tally = results[("find_and_get_pos", name)]
+            for _ in range(repeat):
+                t0 = time.perf_counter()
+                found, pos = finder.find_and_get_pos(screen, name, threshold=threshold)
+                tally.times.append(time.perf_counter() - t0)
+            _judge(tally, found, pos, expected, ignored, tolerance)
+
+            if name in text_templates:
+                tally = results[("find_text_button", name)]
+                for _ in range(repeat):
+                    t0 = time.perf_counter()
+                    found, pos = finder.find_text_button(screen, name, threshold=threshold)
+                    tally.times.append(time.perf_counter() - t0)
+                _judge(tally, found, pos, expected, ignored, tolerance)
+    return results
+
+
+def print_table(title, results):
+    print(f"\n=== {title} ===")
+    print(f"{'method':<17} {'template':<26} {'calls':>6} {'mean ms':>9} {'p95 ms':>9} {'prec':>6} {'recall':>6}")
+    total = Tally()
+    for (method, name), tally in sorted(results.items()):
+        s = tally.summary()
+        total.add(tally)
+        print(f"{method:<17} {name:<26} {s['calls']:>6} {s['mean_ms']:>9.2f} {s['p95_ms']:>9.2f} "
+              f"{s['precision']:>6.2f} {s['recall']:>6.2f}")
+    s = total.summary()
+    print(f"{'TOTAL':<44} {s['calls']:>6} {s['mean_ms']:>9.2f} {s['p95_ms']:>9.2f} "
+          f"{s['precision']:>6.2f} {s['recall']:>6.2f}  (TP {s['tp']} FP {s['fp']} FN {s['fn']})")
+    return s
+
+
+def compare(report, baseline_path):
+    baseline = json.loads(Path(baseline_path).read_text(encoding="utf-8"))
+    print(f"\n=== 跟 {baseline_path} 比較 ===")
+    for key, now in report["configs"].items():
+        old = baseline.get("configs", {}).get(key)
+        if old is None:
+            print(f"   {key}: (基準沒有這組)")
+            continue
+        a, b = old["total"], now["total"]
+        speed = (a["mean_ms"] / b["mean_ms"]) if b["mean_ms"] else float("inf")
+        mark = "⚠️" if b["f1"] < a["f1"] else "  "
+        print(f"{mark} {key}: mean {a['mean_ms']:.2f} -> {b['mean_ms']:.2f} ms (x{speed:.2f}) | "
+              f"F1 {a['f1']:.3f} -> {b['f1']:.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ImageFinder 速度 / 準確度量測")
+    parser.add_argument("--corpus", action="append", help="語料資料夾 (可重複)，預設: tools/bench/corpus 底下全部")
+    parser.add_argument("--modes", default="full,pyramid")
+    parser.add_argument("--roi", default="off", help="off / learned (可用逗號分隔兩個都跑)")
+    parser.add_argument("--thresholds", default=str(config.CONFIDENCE))
+    parser.add_argument("--variants", default="", help="只跑這些干擾版本 (例如 clean,noise)")
+    parser.add_argument("--scenes", default="", help="只跑這些場景")
+    parser.add_argument("--repeat", type=int, default=1, help="每次呼叫重複幾次 (計時更穩)")
+    parser.add_argument("--tolerance", type=int, default=10, help="位置誤差容許 (像素)")
+    parser.add_argument("--json", help="結果存成 JSON")
+    parser.add_argument("--baseline", help="跟之前存的 JSON 比較")
+    parser.add_argument("--detail", action="store_true", help="印出每張模板的明細")
+    parser.add_argument("--include-unverified", action="store_true", help="連還沒人工確認的錄製畫面也算")
+    args = parser.parse_args()
+
+    if args.corpus:
+        corpus = Corpus(*args.corpus)
+    else:
+        if not (SYNTHETIC_DIR / "labels.json").exists():
+            print("ℹ️ 還沒有合成語料，先產生一份...")
+            synthesize()
+        corpus = Corpus.discover(CORPUS_DIR)
+    if not len(corpus):
+        print("❌ 語料是空的")
+        return 1
+
+    variants = set(filter(None, args.variants.split(",")))
+    scenes = set(filter(None, args.scenes.split(",")))
+    corpus = corpus.select(variants, scenes, args.include_unverified)
+    text_templates = {name for _, label in corpus.frames for name in label["text"]}
+    print(f"📚 語料: {len(corpus)} 張畫面, {len(corpus.templates())} 張模板")
+
+    store = TemplateStore(max_bytes=float("inf"))
+    store.preload()
+
+    report = {"frames": len(corpus), "configs": {}}
+    for mode in args.modes.split(","):
+        for roi in args.roi.split(","):
+            for threshold in (float(t) for t in args.thresholds.split(",")):
+                key = f"{mode}/roi={roi}/th={threshold}"
+                print(f"⏳ {key} ...", file=sys.stderr)
+                with contextlib.redirect_stdout(io.StringIO()):  # ImageFinder 內部的 print 先吞掉
+                    results = run_config(corpus, store, mode, roi, threshold,
+                                         args.repeat, args.tolerance, text_templates)
+                if args.detail:
+                    total = print_table(key, results)
+                else:
+                    total = Tally()
+                    for tally in results.values():
+                        total.add(tally)
+                    total = total.summary()
+                    print(f"{key:<32} mean {total['mean_ms']:8.2f} ms | p95 {total['p95_ms']:8.2f} ms | "
+                          f"precision {total['precision']:.3f} | recall {total['recall']:.3f}")
+                report["configs"][key] = {
+                    "total": total,
+                    "templates": {f"{m}:{n}": t.summary() for (m, n), t in sorted(results.items())},
+                }
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=1, ensure_ascii=False), encoding="utf-8")
+        print(f"💾 結果已存到 {args.json}")
+    if args.baseline:
+        compare(report, args.baseline)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
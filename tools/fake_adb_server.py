@@ -0,0 +1,253 @@
+# tools/fake_adb_server.py
+"""
+[假 ADB server] 在本機開一個講 ADB 協定的 socket server，背後接一台假的裝置
+用途：
+- 不開模擬器也能測 core/adb_client.py 的協定實作 (回歸測試 / 跑效能)
+- 模擬裝置 (tools/sim_device.py 的場景狀態機) 也是掛在這上面
+
+直接執行這個檔案會跑一輪簡單的效能量測：
+    python -m tools.fake_adb_server
+"""
+import os
+import socket
+import socketserver
+import struct
+import threading
+import time
+
+
+class FakeDevice:
+    """
+    [假裝置] 預設行為很單純：
+    - screencap 回傳一張全黑的 raw framebuffer (RGBA_8888)
+    - input / am / monkey 只記錄下來
+    - 檔案存在 self.files (路徑 -> bytes)
+    想要更像真的，就繼承它覆寫 shell() / exec_out()
+    """
+
+    def __init__(self, serial="emulator-5554", width=900, height=1600):
+        self.serial = serial
+        self.width = width
+        self.height = height
+        self.files = {}
+        self.commands = []
+        self.online = True
+        self._lock = threading.Lock()
+
+    # --- 給子類別覆寫 ---
+    def raw_frame(self):
+        """ screencap (不加 -p) 的完整輸出：16 bytes 標頭 + RGBA 像素 """
+        header = struct.pack("<IIII", self.width, self.height, 1, 0)
+        return header + bytes(self.width * self.height * 4)
+
+    def shell(self, command):
+        """ 一般 shell 指令，回傳要印出來的字串 """
+        with self._lock:
+            self.commands.append(command)
+        name = command.split()[0] if command.split() else ""
+        if name == "echo":
+            # 批次輸入會用 $(cat /proc/uptime) 記時間，這裡用本機的 monotonic 代替
+            text = command[len("echo"):].strip().replace("$(cat /proc/uptime)", f"{time.monotonic():.2f} 0.00")
+            return text + "\n"
+        if name == "sleep":
+            time.sleep(float(command.split()[1]))
+            return ""
+        if name == "rm":
+            for path in command.split()[1:]:
+                self.files.pop(path, None)
+        return ""
+
+    def exec_out(self, command):
+        """ exec-out 指令，回傳原始 bytes """
+        if command.strip() == "screencap":
+            return self.raw_frame()
+        return self.shell(command).encode("utf-8")
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    def setup(self):
+        with self.server.clients_lock:
+            self.server.clients.add(self.request)
+
+    def finish(self):
+        with self.server.clients_lock:
+            self.server.clients.discard(self.request)
+
+    # --- 收送工具 ---
+    def _read_exact(self, size):
+        buf = bytearray()
+        while len(buf) < size:
+            chunk = self.request.recv(size - len(buf))
+            if not chunk:
+                raise ConnectionError
+            buf += chunk
+        return bytes(buf)
+
+    def _read_request(self):
+        length = int(self._read_exact(4), 16)
+        return self._read_exact(length).decode("utf-8")
+
+    def _okay(self, payload=None):
+        if payload is None:
+            self.request.sendall(b"OKAY")
+        else:
+            data = payload.encode("utf-8")
+            self.request.sendall(b"OKAY" + b"%04x" % len(data) + data)
+
+    def _fail(self, message):
+        data = message.encode("utf-8")
+        self.request.sendall(b"FAIL" + b"%04x" % len(data) + data)
+
+    # --- 主流程 ---
+    def handle(self):
+        device = self.server.device
+        try:
+            while True:
+                req = self._read_request()
+                if req == "host:version":
+                    return self._okay("0029")
+                if req == "host:devices":
+                    return self._okay(f"{device.serial}\tdevice\n")
+                if req.startswith("host:connect:"):
+                    return self._okay(f"connected to {req[len('host:connect:'):]}")
+                if req.endswith(":features"):
+                    return self._okay("")  # 不宣告 shell_v2，客戶端會用舊版 shell 協定
+                if req.startswith("host:transport") or req.startswith("host:tport"):
+                    if not device.online:
+                        return self._fail("device offline")
+                    self._okay()
+                    if req.startswith("host:tport"):
+                        self.request.sendall(struct.pack("<Q", 1))
+                    continue
+                if req.startswith("shell:"):
+                    self._okay()
+                    return self._shell(device, req[len("shell:"):])
+                if req.startswith("exec:"):
+                    self._okay()
+                    return self.request.sendall(device.exec_out(req[len("exec:"):]))
+                if req == "sync:":
+                    self._okay()
+                    return self._sync(device)
+                return self._fail(f"unknown service: {req}")
+        except (ConnectionError, OSError, ValueError):
+            return
+
+    def _shell(self, device, command):
+        if command:
+            self.request.sendall(device.shell(command).encode("utf-8"))
+            return
+
+        # 互動式 shell：一行一行讀，用 ; 切開，printf '\n%s %d\n' xxx $? 是結束標記，要回 exit code
+        reader = self.request.makefile("rb")
+        for raw in iter(reader.readline, b""):
+            line = raw.decode("utf-8", errors="ignore").strip()
+            out = []
+            for part in (p.strip() for p in line.split(";")):
+                if not part:
+                    continue
+                if part.startswith("printf ") and part.endswith("$?"):
+                    out.append(f"\n{part[:-2].split()[-1]} 0\n")
+                else:
+                    out.append(device.shell(part))
+            self.request.sendall("".join(out).encode("utf-8"))
+
+    def _sync(self, device):
+        while True:
+            header = self._read_exact(8)
+            cmd, length = header[:4], struct.unpack("<I", header[4:])[0]
+            if cmd == b"QUIT":
+                return
+            if cmd == b"RECV":
+                path = self._read_exact(length).decode("utf-8")
+                data = device.files.get(path)
+                if data is None:
+                    msg = b"No such file or directory"
+                    self.request.sendall(b"FAIL" + struct.pack("<I", len(msg)) + msg)
+                    continue
+                for i in range(0, len(data), 64 * 1024):
+                    chunk = data[i:i + 64 * 1024]
+                    self.request.sendall(b"DATA" + struct.pack("<I", len(chunk)) + chunk)
+                self.request.sendall(b"DONE" + struct.pack("<I", 0))
+            elif cmd == b"SEND":
+                path = self._read_exact(length).decode("utf-8").rsplit(",", 1)[0]
+                body = bytearray()
+                while True:
+                    sub = self._read_exact(8)
+                    sub_cmd, sub_len = sub[:4], struct.unpack("<I", sub[4:])[0]
+                    if sub_cmd == b"DONE":
+                        break
+                    body += self._read_exact(sub_len)
+                device.files[path] = bytes(body)
+                self.request.sendall(b"OKAY" + struct.pack("<I", 0))
+            else:
+                return
+
+
+class FakeAdbServer(socketserver.ThreadingTCPServer):
+    """ 用法: server = FakeAdbServer(FakeDevice()); server.start(); ... server.stop() """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, device=None, host="127.0.0.1", port=0):
+        super().__init__((host, port), _Handler)
+        self.device = device or FakeDevice()
+        self.clients = set()
+        self.clients_lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def drop_connections(self):
+        """ 模擬斷線：把目前所有連線直接切掉 """
+        with self.clients_lock:
+            clients = list(self.clients)
+        for sock in clients:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        return len(clients)
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def _bench():
+    """ 簡單量一下協定層本身的開銷 (沒有真的裝置，所以只算 Python 這邊) """
+    from core.adb_client import AdbClient
+
+    device = FakeDevice()
+    device.files["/sdcard/big.bin"] = os.urandom(8 * 1024 * 1024)
+    server = FakeAdbServer(device).start()
+    client = AdbClient(serial=device.serial, port=server.port)
+
+    def timeit(label, fn, n):
+        start = time.perf_counter()
+        for _ in range(n):
+            fn()
+        cost = (time.perf_counter() - start) / n * 1000
+        print(f"   {label:<28} {cost:8.3f} ms/次  (n={n})")
+
+    print(f"🧪 Fake ADB server @ 127.0.0.1:{server.port}")
+    session = client.shell_session()
+    timeit("shell (每次新連線)", lambda: client.shell("input tap 1 1"), 200)
+    timeit("shell (長駐 session)", lambda: session.run("input tap 1 1"), 200)
+    timeit("exec-out screencap (raw)", lambda: client.exec_out("screencap"), 20)
+    timeit("sync pull 8MB", lambda: client.pull("/sdcard/big.bin"), 10)
+    timeit("sync push 8MB", lambda: client.push(device.files["/sdcard/big.bin"], "/sdcard/up.bin"), 10)
+
+    session.close()
+    client.close()
+    server.stop()
+
+
+if __name__ == "__main__":
+    _bench()
@@ -0,0 +1,479 @@
+# tools/sim_device.py
+"""
+[模擬裝置] 假的 PTCG Pocket：掛在 FakeAdbServer 上，畫面由場景狀態機決定
+- 畫面 = 背景截圖 + assets 模板貼在固定位置 (ImageFinder 看得懂)
+- 收到的點擊 / 滑動 / am / monkey 會推動場景切換
+- 讀取、戰鬥等時間可以設定，並用 time_scale 壓縮
+- 可以注入錯誤：UI_error 視窗、續戰視窗、畫面凍結、斷線、閃退、開場卡住的事件
+
+直接執行會用模擬裝置跑完整的 routine_main，最後印出產能：
+    python -m tools.sim_device --difficulties 4 --packages 15 --missions 3 --time-scale 0.02
+    python -m tools.sim_device --faults ui_error=0.002,freeze=0.001,disconnect=0.0005,crash=0.0002
+"""
+import argparse
+import math
+import random
+import struct
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT_DIR))
+
+from core import config  # noqa: E402
+from tools.fake_adb_server import FakeAdbServer, FakeDevice  # noqa: E402
+
+
+# 每個場景畫面上有哪些模板 (中心點，900x1600)
+LAYOUT = {
+    "home": {},
+    "splash": {},
+    "title": {"title_screen.png": (450, 800)},
+    "blocking": {"blocking_event.png": (450, 700)},
+    "lobby": {"battle_1.png": (450, 1530)},
+    "battle_menu": {"battle_2.png": (450, 700), "battle_3.png": (450, 1100)},
+    "difficulty_list": {"diff_1.png": (450, 400), "diff_2.PNG": (450, 650),
+                        "diff_3.PNG": (450, 900), "diff_4.png": (450, 1150)},
+    "stage": {"change.png": (450, 1300), "back.png": (60, 1540)},
+    "pack_select": {"A.png": (450, 500), "B.png": (450, 800)},
+    "battle_setup": {"Auto_off.png": (800, 1100)},
+    "battle_ready": {"Auto_on.png": (800, 1100)},
+    "battle": {},
+    "win": {"win.png": (450, 600)},
+    "lose": {"lose.png": (450, 600)},
+    "draw": {"draw.png": (450, 600)},
+    "settlement": {"fin_1.png": (450, 1450)},
+    "settlement_done": {"fin_2.png": (450, 1300)},
+    "win_fin": {"win_fin.png": (450, 900)},
+}
+
+# 卡包列表 (往上滑一次換下一頁)
+PACKAGE_PAGES = [
+    {"A1.png": (240, 400), "A2.png": (660, 400), "A3.png": (240, 700), "A4.png": (660, 700)},
+    {"A5.png": (240, 400), "A6.png": (660, 400), "A7.png": (240, 700), "A8.png": (660, 700),
+     "A9.png": (240, 1000), "A10.png": (660, 1000)},
+    {"A11.png": (240, 400), "A12.png": (660, 400), "A13.png": (240, 700),
+     "A14.png": (660, 1000), "A15.png": (240, 1000)},
+]
+
+# 按返回鍵會退到哪 (沒列的畫面按了沒反應)
+BACK_TARGETS = {
+    "battle_menu": "lobby",
+    "difficulty_list": "battle_menu",
+    "stage": "difficulty_list",
+    "pack_select": "stage",
+    "package_list": "pack_select",
+}
+
+# 蓋在畫面最上層的對話框 (點 cancel 才會關)
+OVERLAYS = {
+    "ui_error": {"UI_error.png": (450, 800), "UI_error_cancel.png": (450, 1000)},
+    "resume_battle": {"resume_battle.png": (450, 800), "resume_battle_cancel.png": (450, 1000)},
+}
+
+
+@dataclass
+class SimTiming:
+    """ 遊戲內的時間 (秒)，實際等待 = 這裡的秒數 x time_scale """
+    app_boot: float = 25.0
+    lobby_load: float = 6.0
+    blocking: float = 20.0
+    battle: float = 180.0
+    result_hold: float = 2.0
+    freeze: float = 30.0
+    disconnect: float = 15.0
+
+
+@dataclass
+class SimFaults:
+    """ 錯誤注入：rate 是「每遊戲秒」發生的機率，chance 是「每次機會」的機率 """
+    ui_error: float = 0.0       # 戰鬥中跳出 UI_error (rate)
+    freeze: float = 0.0         # 畫面凍結 (rate)
+    disconnect: float = 0.0     # ADB 斷線 (rate)
+    crash: float = 0.0          # 遊戲閃退回桌面 (rate)
+    resume_battle: float = 0.0  # 進大廳時跳出續戰視窗 (chance)
+    blocking: float = 0.0       # 點標題後卡在事件畫面 (chance)
+
+    @classmethod
+    def parse(cls, text):
+        faults = cls()
+        for item in filter(None, (text or "").split(",")):
+            key, value = item.split("=")
+            if not hasattr(faults, key.strip()):
+                raise ValueError(f"不認得的錯誤類型: {key}")
+            setattr(faults, key.strip(), float(value))
+        return faults
+
+
+@dataclass
+class SimStats:
+    taps: int = 0
+    swipes: int = 0
+    frames: int = 0
+    packages_selected: int = 0
+    missions_cleared: int = 0
+    battles: dict = field(default_factory=lambda: {"win": 0, "lose": 0, "draw": 0})
+    faults: dict = field(default_factory=dict)
+    app_restarts: int = 0
+
+
+class SimDevice(FakeDevice):
+    """
+    [模擬裝置] 場景狀態機
+    時間驅動的切換 (讀取完成、戰鬥結束) 在每次被截圖 / 收到指令時才結算，不需要背景執行緒
+    """
+
+    def __init__(self, serial="emulator-5554", missions=3, time_scale=0.02, win_rate=0.9,
+                 timing=None, faults=None, start_scene="difficulty_list", seed=None):
+        super().__init__(serial=serial)
+        self.package = config.target_app_package
+        self.missions = missions
+        self.time_scale = time_scale
+        self.win_rate = win_rate
+        self.timing = timing or SimTiming()
+        self.faults = faults or SimFaults()
+        self.rng = random.Random(seed)
+        self.stats = SimStats()
+        self.server = None  # 斷線時要切連線，由 attach() 設定
+
+        self.scene = start_scene
+        self.deadline = None      # 時間到要切到哪個場景: (時間, 場景)
+        self.overlay = None
+        self.page = 0
+        self.missions_left = 0
+        self.last_result = None
+        self.settle_taps = 0
+        self.frozen_until = 0.0
+        self.frozen_frame = None
+        self.offline_until = 0.0
+        self._last_tick = time.monotonic()
+
+        self._templates = {}
+        self._frames = {}
+        bg = self._load("unclear.png")
+        self._bg_mission = bg              # 還有未完成任務的關卡畫面
+        self._bg_plain = 255 - bg          # 其他畫面 (反相，保證跟 unclear.png 對不上)
+
+    @property
+    def online(self):
+        """ 斷線時連線會被拒絕，_tick 跑不到，所以直接看時間有沒有過 """
+        return time.monotonic() >= self.offline_until
+
+    @online.setter
+    def online(self, value):
+        if value:
+            self.offline_until = 0.0
+
+    def attach(self, server):
+        self.server = server
+        return self
+
+    # --- 時間 ---
+    def _game_seconds(self, real):
+        return real / self.time_scale if self.time_scale else real
+
+    def _after(self, game_seconds, scene):
+        self.deadline = (time.monotonic() + game_seconds * self.time_scale, scene)
+
+    def _fault(self, name, rate, dt):
+        if rate <= 0 or dt <= 0:
+            return False
+        if self.rng.random() < 1 - math.exp(-rate * dt):
+            self.stats.faults[name] = self.stats.faults.get(name, 0) + 1
+            print(f"   💥 [Sim] 注入錯誤: {name} (場景 {self.scene})")
+            return True
+        return False
+
+    def _tick(self):
+        now = time.monotonic()
+        dt = self._game_seconds(now - self._last_tick)
+        self._last_tick = now
+
+        if self.deadline is not None and now >= self.deadline[0]:
+            target = self.deadline[1]
+            self.deadline = None
+            self._enter(target)
+
+        # 隨機錯誤 (App 沒開的時候不會發生)
+        if self.scene not in ("home", "splash"):
+            if self.scene == "battle" and self.overlay is None and self._fault("ui_error", self.faults.ui_error, dt):
+                self.overlay = "ui_error"
+            if now >= self.frozen_until and self._fault("freeze", self.faults.freeze, dt):
+                self.frozen_until = now + self.timing.freeze * self.time_scale
+                self.frozen_frame = None
+            if self._fault("crash", self.faults.crash, dt):
+                self._goto("home")
+        if now >= self.offline_until and self._fault("disconnect", self.faults.disconnect, dt):
+            self.offline_until = now + self.timing.disconnect * self.time_scale
+            if self.server is not None:
+                self.server.drop_connections()
+
+    # --- 場景切換 ---
+    def _goto(self, scene):
+        self.deadline = None
+        self.overlay = None
+        self._enter(scene)
+
+    def _enter(self, scene):
+        self.scene = scene
+        if scene == "lobby" and self.rng.random() < self.faults.resume_battle:
+            self.stats.faults["resume_battle"] = self.stats.faults.get("resume_battle", 0) + 1
+            self.overlay = "resume_battle"
+        elif scene == "battle":
+            self._after(self.timing.battle * self.rng.uniform(0.7, 1.3), "_result")
+        elif scene == "_result":
+            roll = self.rng.random()
+            # 沒贏的話 3/4 輸、1/4 平手
+            lose_edge = self.win_rate + (1 - self.win_rate) * 0.75
+            result = "win" if roll < self.win_rate else ("lose" if roll < lose_edge else "draw")
+            self.last_result = result
+            self.stats.battles[result] += 1
+            self.scene = result
+            if result != "win":
+                self._after(self.timing.result_hold, "settlement")
+        elif scene == "settlement":
+            self.settle_taps = 0
+
+    def _layout(self):
+        if self.scene == "package_list":
+            return PACKAGE_PAGES[self.page]
+        return LAYOUT.get(self.scene, {})
+
+    def _hit(self, x, y, layout):
+        for name, (cx, cy) in layout.items():
+            template = self._load(name)
+            h, w = template.shape[:2]
+            if abs(x - cx) <= w // 2 and abs(y - cy) <= h // 2:
+                return name
+        return None
+
+    def _on_tap(self, x, y):
+        self.stats.taps += 1
+        if self.overlay is not None:
+            # 對話框開著的時候只有 cancel 有用
+            if self._hit(x, y, OVERLAYS[self.overlay]) in ("UI_error_cancel.png", "resume_battle_cancel.png"):
+                self.overlay = None
+            return
+
+        hit = self._hit(x, y, self._layout())
+        scene = self.scene
+        if scene == "title" and hit:
+            if self.rng.random() < self.faults.blocking:
+                self.stats.faults["blocking"] = self.stats.faults.get("blocking", 0) + 1
+                self._goto("blocking")
+                self._after(self.timing.blocking, "lobby")
+            else:
+                self._goto("splash")
+                self._after(self.timing.lobby_load, "lobby")
+        elif scene == "lobby" and hit:
+            self._goto("battle_menu")
+        elif scene == "battle_menu" and hit == "battle_3.png":
+            self._goto("difficulty_list")
+        elif scene == "difficulty_list" and hit:
+            self.missions_left = 0
+            self._goto("stage")
+        elif scene == "stage":
+            if hit == "change.png":
+                self._goto("pack_select")
+            elif hit == "back.png":
+                self._goto("difficulty_list")
+            elif self.missions_left > 0:
+                self._goto("battle_setup")
+        elif scene == "pack_select" and hit:
+            self.page = 0
+            self._goto("package_list")
+        elif scene == "package_list" and hit:
+            self.stats.packages_selected += 1
+            self.missions_left = self.missions
+            self._goto("stage")
+        elif scene == "battle_setup" and hit:
+            self._goto("battle_ready")
+        elif scene == "battle_ready":
+            self._goto("battle")
+        elif scene == "win" and hit:
+            self._goto("settlement")
+        elif scene == "settlement" and hit:
+            self.settle_taps += 1
+            if self.settle_taps >= 2:
+                self._goto("settlement_done")
+        elif scene == "settlement_done" and hit:
+            self._goto("win_fin" if self.last_result == "win" else "stage")
+        elif scene == "win_fin" and hit:
+            self.missions_left = max(0, self.missions_left - 1)
+            self.stats.missions_cleared += 1
+            self._goto("stage")
+
+    def _on_back(self):
+        """ Android 返回鍵：對話框開著就關掉，不然退回上一層 """
+        if self.overlay is not None:
+            self.overlay = None
+        elif self.scene in BACK_TARGETS:
+            self._goto(BACK_TARGETS[self.scene])
+
+    def _on_swipe(self, sx, sy, ex, ey):
+        self.stats.swipes += 1
+        if self.scene == "package_list" and self.overlay is None:
+            # 每拖 400 像素換一頁 (慢速拖曳沒有慣性)
+            pages = max(1, round(abs(ey - sy) / 400))
+            if ey < sy:
+                self.page = min(len(PACKAGE_PAGES) - 1, self.page + pages)
+            else:
+                self.page = max(0, self.page - pages)
+
+    # --- 畫面 ---
+    def _load(self, name):
+        template = self._templates.get(name)
+        if template is None:
+            data = np.fromfile(str(config.ASSETS_DIR / name), dtype=np.uint8)
+            template = cv2.imdecode(data, cv2.IMREAD_COLOR)
+            if template is None:
+                raise FileNotFoundError(f"[Sim] 找不到素材: {name}")
+            self._templates[name] = template
+        return template
+
+    def render(self):
+        """ 目前場景的 BGR 畫面 (同一個狀態只合成一次) """
+        layout = self._layout()
+        mission_bg = self.scene == "stage" and self.missions_left > 0
+        key = (self.scene, self.page, mission_bg, self.overlay)
+        frame = self._frames.get(key)
+        if frame is None:
+            frame = (self._bg_mission if mission_bg else self._bg_plain).copy()
+            for items in (layout, OVERLAYS.get(self.overlay, {})):
+                for name, (cx, cy) in items.items():
+                    template = self._load(name)
+                    h, w = template.shape[:2]
+                    x0, y0 = cx - w // 2, cy - h // 2
+                    frame[y0:y0 + h, x0:x0 + w] = template
+            self._frames[key] = frame
+        return frame
+
+    def _current_frame(self):
+        with self._lock:
+            self._tick()
+            self.stats.frames += 1
+            if time.monotonic() < self.frozen_until:
+                if self.frozen_frame is None:
+                    self.frozen_frame = self.render()
+                return self.frozen_frame
+            return self.render()
+
+    def raw_frame(self):
+        frame = self._current_frame()
+        h, w = frame.shape[:2]
+        rgba = cv2.cvtColor(frame, cv2.COLOR_BGR2RGBA)
+        return struct.pack("<IIII", w, h, 1, 0) + rgba.tobytes()
+
+    def exec_out(self, command):
+        command = command.strip()
+        if command == "screencap -p":
+            ok, buf = cv2.imencode(".png", self._current_frame())
+            return buf.tobytes() if ok else b""
+        return super().exec_out(command)
+
+    # --- 指令 ---
+    def shell(self, command):
+        words = command.split()
+        if not words:
+            return ""
+        with self._lock:
+            self._tick()
+            if words[:2] == ["input", "tap"] and len(words) >= 4:
+                self._on_tap(int(float(words[2])), int(float(words[3])))
+            elif words[:2] == ["input", "swipe"] and len(words) >= 6:
+                sx, sy, ex, ey = (int(float(v)) for v in words[2:6])
+                if abs(ex - sx) + abs(ey - sy) < 30:
+                    self._on_tap(sx, sy)  # 點擊是用很短的 swipe 做的
+                else:
+                    self._on_swipe(sx, sy, ex, ey)
+            elif words[:2] == ["input", "keyevent"] and len(words) >= 3 and words[2] in ("4", "KEYCODE_BACK"):
+                self._on_back()
+            elif words[:2] == ["am", "force-stop"]:
+                self._goto("home")
+            elif words[0] == "monkey" and self.package in words:
+                self.stats.app_restarts += 1
+                self._goto("splash")
+                self._after(self.timing.app_boot, "title")
+
+        if words[0] == "screenrecord":
+            # 錄影：照 --time-limit 等一下 (壓縮過)，檔案內容是假的
+            limit = float(words[words.index("--time-limit") + 1]) if "--time-limit" in words else 10.0
+            time.sleep(limit * self.time_scale)
+            self.files[words[-1]] = b"\x00\x00\x00\x18ftypmp42" + bytes(1024)
+            return ""
+        return super().shell(command)
+
+
+def run_simulation(args):
+    """ 設定好 config 之後，用模擬裝置跑一次完整的 routine_main """
+    device = SimDevice(missions=args.missions, time_scale=args.time_scale, win_rate=args.win_rate,
+                       faults=SimFaults.parse(args.faults), seed=args.seed)
+    device.timing.battle = args.battle_time
+    server = FakeAdbServer(device).start()
+    device.attach(server)
+
+    work_dir = Path(args.work_dir or tempfile.mkdtemp(prefix="ptcg_sim_"))
+    work_dir.mkdir(parents=True, exist_ok=True)
+    config.ADB_BACKEND = "socket"
+    config.ADB_SERVER_PORT = server.port
+    config.DEVICE_ID = device.serial
+    config.CAPTURE_MODE = "raw"
+    config.TIME_SCALE = args.time_scale
+    config.TOTAL_PACKAGES = args.packages
+    config.DIFFICULTY_LIST = config.DIFFICULTY_LIST[:args.difficulties]
+    config.PROGRESS_DB = str(work_dir / "progress.db")
+    config.STATE_FILE = str(work_dir / "bot_state.json")
+    config.WORK_QUEUE_FILE = str(work_dir / "work_queue.json")
+    config.WAIT_HISTORY_FILE = str(work_dir / "wait_history.json")
+    config.ROI_HISTORY_FILE = str(work_dir / "roi_history.json")
+    config.SCROLL_INDEX_FILE = str(work_dir / "scroll_index.json")
+    print(f"🧪 [Sim] 模擬裝置 {device.serial} @ port {server.port} | 工作目錄 {work_dir}")
+
+    from core.bot_logic import GameBot
+    from core.metrics import METRICS
+
+    bot = GameBot()
+    bot.reporter.save_dir = work_dir / "crash_reports"
+    bot.reporter.save_dir.mkdir(exist_ok=True)
+
+    start = time.time()
+    try:
+        bot.routine_main()
+    finally:
+        elapsed = time.time() - start
+        bot.frames.stop()
+        server.stop()
+        stats = device.stats
+        hours = elapsed / 3600
+        print("\n🧪 ========== 模擬結果 ==========")
+        print(f"   實際耗時: {elapsed / 60:.1f} 分 (time_scale={args.time_scale})")
+        done = METRICS.value("ptcg_packages_total", result="done")
+        print(f"   完成 {done:.0f} 包 (選包 {stats.packages_selected} 次) | 通關任務 {stats.missions_cleared} | 戰鬥 {stats.battles}")
+        print(f"   產能: {done / hours:.1f} 包/小時 (壓縮後的實際時間)")
+        print(f"   點擊 {stats.taps} | 滑動 {stats.swipes} | 截圖 {stats.frames} | 重開 App {stats.app_restarts}")
+        print(f"   注入錯誤: {stats.faults or '無'}")
+        print("================================\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="用模擬裝置跑完整流程，量產能")
+    parser.add_argument("--difficulties", type=int, default=4)
+    parser.add_argument("--packages", type=int, default=15)
+    parser.add_argument("--missions", type=int, default=3, help="每包有幾個未完成任務")
+    parser.add_argument("--time-scale", type=float, default=0.02, help="所有等待乘上這個倍數")
+    parser.add_argument("--battle-time", type=float, default=180.0, help="一場戰鬥幾秒 (遊戲時間)")
+    parser.add_argument("--win-rate", type=float, default=0.9)
+    parser.add_argument("--faults", default="", help="例如 ui_error=0.002,freeze=0.001,disconnect=0.0005")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--work-dir", default=None, help="進度 / 紀錄檔放哪 (預設暫存資料夾)")
+    run_simulation(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()